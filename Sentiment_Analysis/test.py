@@ -83,15 +83,16 @@ def classify_sentiment_batch(texts):
 
     for i in range(0, len(texts), BATCH_SIZE):
         batch = texts[i:i+BATCH_SIZE]  # Get batch of titles
-        
-        # Remove very short or empty titles
-        batch = [text for text in batch if len(text.strip()) > 3]
-        if not batch:
-            sentiments.extend(["unknown"] * len(batch))
+        labels = ["unknown"] * len(batch)
+
+        # Skip very short or empty titles (they stay "unknown", keeping one label per text)
+        keep = [j for j, text in enumerate(batch) if len(text.strip()) > 3]
+        if not keep:
+            sentiments.extend(labels)
             continue
 
         # Tokenize batch
-        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=128)
+        inputs = tokenizer([batch[j] for j in keep], return_tensors="pt", padding=True, truncation=True, max_length=128)
 
         inputs = {key: val.to(device) for key, val in inputs.items()}  # Move to GPU if available
         
@@ -101,7 +102,9 @@ def classify_sentiment_batch(texts):
             predictions = torch.argmax(logits, dim=-1).tolist()
         
         # Map predictions to sentiment labels
-        sentiments.extend([sentiment_map[pred] for pred in predictions])
+        for j, pred in zip(keep, predictions):
+            labels[j] = sentiment_map[pred]
+        sentiments.extend(labels)
     
     return sentiments
 
@@ -114,11 +117,19 @@ def analyze_sentiment():
     if "Title" not in news_df.columns:
         raise ValueError("The CSV file does not contain a 'Title' column.")
 
+    # Reuse labels from the previous run; only articles not seen before are classified
+    news_df["Sentiment"] = None
+    if os.path.exists(FINAL_CSV):
+        previous = pd.read_csv(FINAL_CSV).drop_duplicates(["Link", "Title"]).set_index(["Link", "Title"])["Sentiment"]
+        news_df["Sentiment"] = pd.MultiIndex.from_frame(news_df[["Link", "Title"]]).map(previous)
+    new_rows = news_df["Sentiment"].isna()
+    print(f"Classifying {int(new_rows.sum())} new of {len(news_df)} articles")
+
     # Filter out empty or invalid titles
-    valid_titles = news_df["Title"].fillna("").tolist()
+    valid_titles = news_df.loc[new_rows, "Title"].fillna("").tolist()
 
-    # Run sentiment analysis on all titles in batches
-    news_df["Sentiment"] = classify_sentiment_batch(valid_titles)
+    # Run sentiment analysis on the new titles in batches
+    news_df.loc[new_rows, "Sentiment"] = classify_sentiment_batch(valid_titles)
 
     # Save updated results to a new CSV file
     news_df.to_csv(FINAL_CSV, index=False, encoding='utf-8')
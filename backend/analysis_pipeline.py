@@ -0,0 +1,265 @@
+# backend/analysis_pipeline.py
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from flask import current_app
+from sqlalchemy import update
+from config import ANALYSIS_JOB_TIMEOUT
+from database import db
+from models import AnalysisJob
+from metrics_cache import get_trade_metrics, load_cluster_state, save_cluster_state
+from trade_queries import list_user_tickers, load_trade_frame
+from modules.trade_analysis import TradeClusterer, analyze_trade_patterns
+from modules.market_data import get_price_history
+from modules.valuation import value_open_positions
+from modules.options_analytics import OPTION_TRADE_COLUMNS, options_analytics
+from modules.sentiment import get_sentiment_batch
+from modules.article_store import get_article_store, sentiment_model_id
+from modules.context_builder import build_context
+from modules.recommendation import cache_key, generate_trade_recommendation
+from modules.ensemble import create_final_recommendation
+
+NO_TRADES_RESPONSE = {
+    "message": "No trades to analyze.",
+    "trade_patterns": {},
+    "profit_by_ticker": [],
+}
+
+
+def prepare_analysis(user_id: int, retriever, on_stage=None):
+    """
+    Everything /analyze does before the model call. Clustering, market data
+    and sentiment don't depend on each other, so they run concurrently once
+    the round-trips are loaded. `on_stage(name, seconds, partial_result)` is
+    called from this thread as each stage finishes.
+
+    Returns None when the user has no round-trips or open lots, otherwise a
+    dict with the pattern analysis, profit by ticker, market summary, prompt
+    context and recommendation cache key.
+    """
+    report = on_stage or (lambda name, seconds, partial: None)
+
+    # 1) Incrementally maintained round-trips (only trades since the last watermark are matched)
+    started = time.perf_counter()
+    trade_metrics, open_positions = get_trade_metrics(user_id)
+    tickers = list_user_tickers(user_id)
+    option_trades = load_trade_frame(user_id, columns=OPTION_TRADE_COLUMNS, options_only=True)
+    clusterer = TradeClusterer.from_state(load_cluster_state(user_id))
+    report("trade_metrics", time.perf_counter() - started,
+           {"round_trips": len(trade_metrics), "open_lots": len(open_positions)})
+    if trade_metrics.empty and open_positions.empty:
+        return None
+
+    # 2) Independent stages; none of them touches the database session
+    stages = {
+        "patterns": lambda: _pattern_stage(trade_metrics, clusterer),
+        "market": lambda: _market_stage(tickers),
+        "sentiment": lambda: _sentiment_stage(tickers, retriever),
+        "valuation": lambda: _valuation_stage(open_positions),
+        "options": lambda: _options_stage(option_trades, open_positions),
+    }
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        futures = {executor.submit(_timed, stage): name for name, stage in stages.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            seconds, results[name] = future.result()
+            partial = results[name][0] if name == "patterns" else results[name]
+            report(name, seconds, partial)
+
+    pattern_analysis, profit_by_ticker = results["patterns"]
+    if clusterer.centroids is not None:
+        # Next analysis starts from these centroids
+        save_cluster_state(user_id, clusterer.to_state())
+    market_data_summary = results["market"]
+    aggregated_sentiment = results["sentiment"]
+
+    # 3) Token-budgeted context (aggregates, top tickers, outliers) for the model
+    started = time.perf_counter()
+    context_summary, context_str, context_tokens = build_context(
+        trade_metrics, pattern_analysis, market_data_summary, aggregated_sentiment, open_positions
+    )
+    report("context", time.perf_counter() - started, {"tokens": context_tokens})
+
+    return {
+        "pattern_analysis": pattern_analysis,
+        "profit_by_ticker": profit_by_ticker,
+        "market_summary": {
+            "market": market_data_summary,
+            "sentiment": aggregated_sentiment,
+            "open_positions": results["valuation"],
+            "options": results["options"],
+        },
+        "context_str": context_str,
+        "context_tokens": context_tokens,
+        # Same summary (with rounded prices and sentiment) -> same advice, served from the on-disk cache
+        "rec_key": cache_key(context_summary),
+    }
+
+
+def _timed(stage):
+    started = time.perf_counter()
+    result = stage()
+    return time.perf_counter() - started, result
+
+
+def _pattern_stage(trade_metrics, clusterer):
+    # Analyze trade patterns (clusters, etc.) and total profit by ticker for charts
+    pattern_analysis = analyze_trade_patterns(trade_metrics, clusterer)
+    if "Ticker" in trade_metrics.columns and "Profit" in trade_metrics.columns:
+        profit_summary = trade_metrics.groupby("Ticker")["Profit"].sum()
+        # A list of dicts like [{ticker: 'AAPL', total_profit: 123.45}, ...]
+        profit_by_ticker = [
+            {"ticker": ticker, "total_profit": float(profit)} for ticker, profit in profit_summary.items()
+        ]
+    else:
+        profit_by_ticker = []
+    return pattern_analysis, profit_by_ticker
+
+
+def _market_stage(tickers):
+    # Last 180 days in one batched lookup; repeated requests are served from the local store
+    end_date = datetime.datetime.today().strftime("%Y-%m-%d")
+    start_date = (datetime.datetime.today() - datetime.timedelta(days=180)).strftime("%Y-%m-%d")
+    price_history = get_price_history(tickers, start_date, end_date)
+    closes = price_history.groupby("ticker")["close"]
+    recent_close = closes.last()
+    data_points = closes.size()
+    return {
+        ticker: {
+            "recent_close": float(recent_close[ticker]) if ticker in recent_close.index else None,
+            "data_points": int(data_points.get(ticker, 0)),
+        }
+        for ticker in tickers
+    }
+
+
+def _valuation_stage(open_positions):
+    # Totals only; lot rows and equity curves are served by GET /valuation
+    valuation = value_open_positions_at_market(open_positions)
+    return {"portfolio": valuation["portfolio"], "per_ticker": valuation["per_ticker"]}
+
+
+def value_open_positions_at_market(open_positions, by_ticker: bool = False) -> dict:
+    """
+    Mark the open lots to market with daily closes from the first open date
+    to today, loaded for every held ticker in one price store lookup.
+    """
+    if open_positions.empty:
+        return value_open_positions(open_positions, None)
+    start_date = open_positions["OpenDate"].min().strftime("%Y-%m-%d")
+    end_date = datetime.datetime.today().strftime("%Y-%m-%d")
+    price_history = get_price_history(sorted(open_positions["Ticker"].unique()), start_date, end_date)
+    return value_open_positions(open_positions, price_history, by_ticker=by_ticker)
+
+
+def _options_stage(option_trades, open_positions):
+    # Summary and exposure rollups; per-trade greeks are served by GET /options/analytics
+    analytics = options_analytics_at_market(option_trades, open_positions)
+    return {key: analytics[key] for key in ("summary", "exposure_by_expiration", "exposure_by_ticker")}
+
+
+def options_analytics_at_market(option_trades, open_positions, include_trades: bool = False) -> dict:
+    """
+    Implied volatility and greeks of every option trade plus the open option
+    book's exposure, with underlying closes from the first option trade to
+    today loaded in one price store lookup.
+    """
+    if option_trades.empty:
+        return options_analytics(option_trades, open_positions, None, include_trades=include_trades)
+    start_date = option_trades["activity_date"].min().strftime("%Y-%m-%d")
+    end_date = datetime.datetime.today().strftime("%Y-%m-%d")
+    price_history = get_price_history(sorted(option_trades["ticker"].dropna().unique()), start_date, end_date)
+    return options_analytics(option_trades, open_positions, price_history, include_trades=include_trades)
+
+
+def _sentiment_stage(tickers, retriever):
+    # Scores kept in the article store by the news refresh; tickers without
+    # stored articles fall back to scoring retrieved documents
+    aggregated_sentiment = get_article_store().sentiment_by_ticker(tickers, sentiment_model_id())
+    missing = [ticker for ticker in tickers if ticker not in aggregated_sentiment]
+    retrieved = {
+        ticker: [doc.get("Content", "") for doc in docs]
+        for ticker, docs in (retriever.retrieve(missing, top_k=3) if missing else {}).items()
+    }
+
+    # Score every retrieved document in one batched (and cached) call
+    all_contents = [content for contents in retrieved.values() for content in contents]
+    all_scores = get_sentiment_batch(all_contents) if all_contents else []
+    offset = 0
+    for ticker, contents in retrieved.items():
+        sentiments = all_scores[offset:offset + len(contents)]
+        offset += len(contents)
+        aggregated_sentiment[ticker] = float(np.mean(sentiments)) if sentiments else 0.0
+    return aggregated_sentiment
+
+
+def run_analysis_job(job_id: str, retriever) -> None:
+    """
+    Claim a queued AnalysisJob and run it, recording each stage's timing and
+    partial result on the row as it finishes so clients can poll it. The
+    claim is a conditional UPDATE, so a job is only ever run once even when
+    several processes pick it up. Must run inside an application context.
+    """
+    claimed = db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+        .values(status="running", started_at=datetime.datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return
+
+    job = db.session.get(AnalysisJob, job_id)
+    dumps = current_app.json.dumps
+    stages = {}
+
+    def on_stage(name, seconds, partial):
+        stages[name] = {"status": "completed", "seconds": round(seconds, 3), "result": partial}
+        job.stages = dumps(stages)
+        db.session.commit()
+
+    try:
+        prepared = prepare_analysis(job.user_id, retriever, on_stage)
+        if prepared is None:
+            result = NO_TRADES_RESPONSE
+        else:
+            started = time.perf_counter()
+            ai_rec = generate_trade_recommendation(prepared["context_str"], prepared["rec_key"])
+            on_stage("recommendation", time.perf_counter() - started, {"personalized_advice": ai_rec})
+            result = create_final_recommendation(prepared["pattern_analysis"], prepared["market_summary"], ai_rec)
+            result["profit_by_ticker"] = prepared["profit_by_ticker"]
+        job.result = dumps(result)
+        job.status = "completed"
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.datetime.utcnow()
+        db.session.commit()
+
+
+def requeue_stale_analysis_jobs(timeout: int = ANALYSIS_JOB_TIMEOUT) -> int:
+    """
+    Put jobs claimed more than `timeout` seconds ago and still running back in
+    the queue; their worker went away (a restart or a crash) without finishing
+    them. Returns the number of jobs requeued.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=timeout)
+    requeued = db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.status == "running", AnalysisJob.started_at < cutoff)
+        .values(status="queued", started_at=None, stages="{}")
+    ).rowcount
+    db.session.commit()
+    return requeued
+
+
+def queued_analysis_jobs() -> list:
+    """Ids of jobs waiting to be claimed, oldest first."""
+    rows = db.session.execute(
+        db.select(AnalysisJob.id).where(AnalysisJob.status == "queued").order_by(AnalysisJob.created_at)
+    )
+    return [job_id for job_id, in rows]
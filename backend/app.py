@@ -1,25 +1,41 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-from config import SQLALCHEMY_DATABASE_URI, SECRET_KEY
+from config import (SQLALCHEMY_DATABASE_URI, SECRET_KEY, ANALYSIS_WORKERS, GZIP_MIN_BYTES,
+                    ROUND_TRIP_PAGE_SIZE, ROUND_TRIP_MAX_PAGE_SIZE)
 from database import db
-from models import User, Trade
+from json_provider import OrjsonProvider
+from models import UploadJob, AnalysisJob
 from auth_routes import auth_bp
+from trade_store import bulk_insert_trades, rehash_trades, stream_trades_from_file, upgrade_trades_table
+from trade_queries import load_trade_frame, user_has_trades
+from metrics_cache import (
+    get_open_positions, get_trade_metrics, load_cluster_state, load_round_trips, refresh_trade_metrics,
+    reset_trade_metrics_tables,
+)
+from analysis_pipeline import (
+    NO_TRADES_RESPONSE, options_analytics_at_market, prepare_analysis, queued_analysis_jobs,
+    requeue_stale_analysis_jobs, run_analysis_job, value_open_positions_at_market,
+)
 from modules.trade_ingestion import parse_robinhood_csv
-from modules.preprocessing import calculate_trade_metrics
-from modules.trade_analysis import analyze_trade_patterns
-from modules.market_data import get_stock_data, get_news_data
-from modules.recommendation import generate_trade_recommendation
+from modules.trade_analysis import TradeClusterer, trade_features
+from modules.portfolio_analytics import ANALYTICS_PERIODS, portfolio_analytics
+from modules.options_analytics import OPTION_TRADE_COLUMNS
+from modules.recommendation import clean_recommendation, generate_trade_recommendation, stream_trade_recommendation
+from modules.recommendation_cache import get_recommendation_cache
 from modules.ensemble import create_final_recommendation
 from modules.vector_store import VectorStore
-from modules.sentiment import get_sentiment
-import numpy as np
-import pandas as pd
-import datetime
+from modules.retrieval import Retriever
+import gzip
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SECRET_KEY"] = SECRET_KEY
+app.json = OrjsonProvider(app)
 
 
 db.init_app(app)
@@ -30,9 +46,17 @@ app.register_blueprint(auth_bp, url_prefix="/auth")
 with app.app_context():
     db.create_all()
 
+# Background workers for streaming uploads (?mode=stream)
+upload_executor = ThreadPoolExecutor(max_workers=2)
+
 # Initialize vector store (or load an existing index)
 vector_store = VectorStore()
 # Optionally load: vector_store.load_index("faiss_index")
+# Fills the vector store from the article store's embeddings and serves per-ticker queries
+retriever = Retriever(vector_store)
+
+# Background workers for analysis jobs (?mode=async)
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
 
 @app.route("/upload_trades", methods=["POST"])
 def upload_trades():
@@ -41,38 +65,65 @@ def upload_trades():
     if "file" not in request.files:
         return jsonify({"message": "No file provided"}), 400
     file = request.files["file"]
+    user_id = session["user_id"]
+
+    if request.args.get("mode") == "stream":
+        return start_streaming_upload(user_id, file)
+
     contents = file.read()
     try:
         parsed_df = parse_robinhood_csv(contents)
     except Exception as e:
         return jsonify({"message": f"Error parsing CSV: {str(e)}"}), 400
-    user_id = session["user_id"]
-    for _, row in parsed_df.iterrows():
-        activity_date = row.get("activity_date")
-        process_date = row.get("process_date")
-        settle_date = row.get("settle_date")
-        if pd.isna(activity_date): activity_date = None
-        if pd.isna(process_date): process_date = None
-        if pd.isna(settle_date): settle_date = None
-        trade = Trade(
-            user_id=user_id,
-            activity_date=row.get("activity_date"),
-            process_date=row.get("process_date"),
-            settle_date=row.get("settle_date"),
-            instrument=row.get("instrument"),
-            description=row.get("description"),
-            trade_code=row.get("trade_code"),
-            quantity=row.get("quantity"),
-            price=row.get("price"),
-            amount=row.get("amount"),
-            parsed_action=row.get("parsed_action"),
-            option_type=row.get("option_type"),
-            strike_price=row.get("strike_price"),
-            option_expiration=row.get("option_expiration")
-        )
-        db.session.add(trade)
+    stats = bulk_insert_trades(user_id, parsed_df)
+    return jsonify({"message": "Trade data uploaded successfully.", **stats})
+
+def start_streaming_upload(user_id, file):
+    # Spool the upload to disk in fixed-size blocks, then ingest it chunk by chunk in the background
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "wb") as spool:
+        file.save(spool)
+
+    # Workers get the plain id, never this request's ORM instance (expired by commit, bound to this session)
+    job_id = uuid.uuid4().hex
+    db.session.add(UploadJob(id=job_id, user_id=user_id))
     db.session.commit()
-    return jsonify({"message": "Trade data uploaded successfully."})
+
+    def run():
+        with app.app_context():
+            stream_trades_from_file(job_id, path)
+    upload_executor.submit(run)
+
+    return jsonify({
+        "message": "Upload accepted for streaming ingestion.",
+        "upload_id": job_id,
+        "status_url": f"/upload_trades/{job_id}",
+    }), 202
+
+@app.cli.command("rehash-trades")
+def rehash_trades_command():
+    """Recompute stored trades' row_hash after a change to the hashing scheme."""
+    print(f"Rehashed {rehash_trades()} trades")
+
+@app.cli.command("upgrade-trades")
+def upgrade_trades_command():
+    """Add row hashes and the dedupe/date indexes to a trades table created by an older version."""
+    print(f"Rehashed {upgrade_trades_table()} trades; row_hash and trade indexes are up to date")
+
+@app.cli.command("reset-trade-metrics")
+def reset_trade_metrics_command():
+    """Recreate the cached round-trip tables after a change to their columns."""
+    reset_trade_metrics_tables()
+    print("Round-trips will be rebuilt on each user's next analysis")
+
+@app.route("/upload_trades/<upload_id>", methods=["GET"])
+def upload_progress(upload_id):
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    job = db.session.get(UploadJob, upload_id)
+    if job is None or job.user_id != session["user_id"]:
+        return jsonify({"message": "Upload not found"}), 404
+    return jsonify(job.to_dict())
 
 @app.route("/analyze", methods=["POST"])
 def analyze_trades():
@@ -80,102 +131,193 @@ def analyze_trades():
         return jsonify({"message": "Unauthorized"}), 401
 
     user_id = session["user_id"]
-    trades = Trade.query.filter_by(user_id=user_id).all()
-    if not trades:
+    if not user_has_trades(user_id):
         return jsonify({"message": "No trade data found. Please upload CSV first."}), 400
-    
-    # 1) Convert trades to a DataFrame
-    trade_list = []
-    for t in trades:
-        trade_list.append({
-            "activity_date": t.activity_date,
-            "parsed_action": t.parsed_action,
-            "price": t.price,
-            "quantity": t.quantity,
-            "ticker": t.instrument  # i.e. 'AAPL', 'TSLA', etc.
-        })
-    trade_df = pd.DataFrame(trade_list)
-
-    # 2) If no data, return early
-    if trade_df.empty:
-        return jsonify({
-            "message": "No trades to analyze.",
-            "trade_patterns": {},
-            "profit_by_ticker": [],
-        })
-
-    # 3) Calculate trade metrics (Duration, Profit, Ticker, etc.)
-    trade_metrics = calculate_trade_metrics(trade_df)
-    
-    # 4) Analyze trade patterns (clusters, etc.)
-    pattern_analysis = analyze_trade_patterns(trade_metrics)
-
-    # 5) Summarize total profit by ticker for charts, etc.
-    if "Ticker" in trade_metrics.columns and "Profit" in trade_metrics.columns:
-        profit_summary = (
-            trade_metrics.groupby("Ticker")["Profit"].sum().reset_index()
-        )
-        # Convert to a list of dicts like [{ticker: 'AAPL', total_profit: 123.45}, ...]
-        profit_by_ticker = []
-        for _, row in profit_summary.iterrows():
-            profit_by_ticker.append({
-                "ticker": row["Ticker"],
-                "total_profit": float(row["Profit"])
-            })
-    else:
-        profit_by_ticker = []
 
-    # 6) Optionally fetch market data (e.g. last 180 days)
-    tickers = trade_df["ticker"].dropna().unique()
-    end_date = datetime.datetime.today().strftime("%Y-%m-%d")
-    start_date = (datetime.datetime.today() - datetime.timedelta(days=180)).strftime("%Y-%m-%d")
+    if request.args.get("mode") == "async":
+        return start_analysis_job(user_id)
 
-    market_data_summary = {}
-    for ticker in tickers:
-        try:
-            stock_data = get_stock_data(ticker, start_date, end_date)
-            if not stock_data.empty:
-                recent_close = float(stock_data["Close"].iloc[-1])
-            else:
-                recent_close = None
-            market_data_summary[ticker] = {
-                "recent_close": recent_close,
-                "data_points": len(stock_data)
-            }
-        except Exception as e:
-            market_data_summary[ticker] = {"error": str(e)}
-
-    # 7) Sentiment / RAG approach
-    aggregated_sentiment = {}
-    for ticker in tickers:
-        # e.g. random embedding for demonstration
-        query_embedding = np.random.randn(vector_store.index.d).astype(np.float32)
-        retrieved_docs = vector_store.search(query_embedding, top_k=3)
-        sentiments = []
-        for doc in retrieved_docs:
-            content = doc.get("content", "")
-            sscore = get_sentiment(content)
-            sentiments.append(sscore)
-        aggregated_sentiment[ticker] = float(np.mean(sentiments)) if sentiments else 0.0
-
-    # 8) Build context + generate AI recommendation
-    context_str = (
-        f"Trade patterns: {pattern_analysis}. "
-        f"Market data: {market_data_summary}. "
-        f"Aggregated sentiment scores: {aggregated_sentiment}."
-    )
-    ai_rec = generate_trade_recommendation(context_str)
+    prepared = prepare_analysis(user_id, retriever)
+    if prepared is None:
+        return jsonify(NO_TRADES_RESPONSE)
+    app.logger.info("LLM context: %d estimated tokens", prepared["context_tokens"])
+
+    pattern_analysis = prepared["pattern_analysis"]
+    market_summary = prepared["market_summary"]
+    profit_by_ticker = prepared["profit_by_ticker"]
+    if request.args.get("stream") == "1":
+        return stream_analysis(pattern_analysis, market_summary, profit_by_ticker,
+                               prepared["context_str"], prepared["rec_key"])
+
+    ai_rec = generate_trade_recommendation(prepared["context_str"], prepared["rec_key"])
     final_rec = create_final_recommendation(
         pattern_analysis,
-        {"market": market_data_summary, "sentiment": aggregated_sentiment},
+        market_summary,
         ai_rec
     )
 
-    # 9) Attach the profit_by_ticker array to final_rec
+    # Attach the profit_by_ticker array to final_rec
     final_rec["profit_by_ticker"] = profit_by_ticker
 
     return jsonify(final_rec)
 
+def start_analysis_job(user_id):
+    # The job row is the queue entry; a worker claims it and records per-stage progress on it
+    job_id = uuid.uuid4().hex
+    db.session.add(AnalysisJob(id=job_id, user_id=user_id))
+    db.session.commit()
+    submit_analysis_job(job_id)
+    return jsonify({
+        "message": "Analysis queued.",
+        "analysis_id": job_id,
+        "status_url": f"/analyze/{job_id}",
+    }), 202
+
+def submit_analysis_job(job_id):
+    def run():
+        with app.app_context():
+            run_analysis_job(job_id, retriever)
+    analysis_executor.submit(run)
+
+def resume_analysis_jobs():
+    """
+    Requeue jobs whose worker died mid-run and submit every queued job to
+    this process's pool; a job another process claims first is skipped.
+    """
+    with app.app_context():
+        requeued = requeue_stale_analysis_jobs()
+        job_ids = queued_analysis_jobs()
+    for job_id in job_ids:
+        submit_analysis_job(job_id)
+    return requeued, len(job_ids)
+
+@app.cli.command("resume-analysis-jobs")
+def resume_analysis_jobs_command():
+    """Run analysis jobs left queued or stuck running by a restart, then exit."""
+    requeued, submitted = resume_analysis_jobs()
+    analysis_executor.shutdown(wait=True)
+    print(f"Requeued {requeued} stale jobs; ran {submitted} queued jobs")
+
+@app.route("/analyze/<analysis_id>", methods=["GET"])
+def analysis_status(analysis_id):
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    job = db.session.get(AnalysisJob, analysis_id)
+    if job is None or job.user_id != session["user_id"]:
+        return jsonify({"message": "Analysis not found"}), 404
+    return jsonify(job.to_dict())
+
+def stream_analysis(pattern_analysis, market_summary, profit_by_ticker, context_str, rec_key=None):
+    """
+    NDJSON response: the analysis first, then the advice as the model generates
+    it ({"type": "advice", "delta": ...}), then {"type": "done"} with the full text.
+    """
+    analysis = create_final_recommendation(pattern_analysis, market_summary, None)
+    analysis.pop("personalized_advice")
+    analysis["profit_by_ticker"] = profit_by_ticker
+
+    def generate():
+        yield app.json.dumps({"type": "analysis", **analysis}) + "\n"
+        parts = []
+        try:
+            for delta in stream_trade_recommendation(context_str, rec_key):
+                parts.append(delta)
+                yield app.json.dumps({"type": "advice", "delta": delta}) + "\n"
+        except Exception as e:
+            yield app.json.dumps({"type": "error", "message": f"Error: {e}"}) + "\n"
+            return
+        yield app.json.dumps({"type": "done", "personalized_advice": clean_recommendation("".join(parts))}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/round_trips", methods=["GET"])
+def list_round_trips():
+    """
+    Trade-level rows, which /analyze no longer returns, one keyset page at a
+    time: pass the previous page's `next_cursor` as `cursor`. `format=columns`
+    returns one array per field instead of one object per row.
+    """
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    user_id = session["user_id"]
+    cursor = request.args.get("cursor", type=int)
+    limit = min(max(request.args.get("limit", ROUND_TRIP_PAGE_SIZE, type=int), 1), ROUND_TRIP_MAX_PAGE_SIZE)
+
+    if cursor is None:
+        # First page: fold in trades uploaded since the last analysis; later pages page through the same rows
+        refresh_trade_metrics(user_id)
+    page = load_round_trips(user_id, after_trade_id=cursor, limit=limit)
+    # Cluster labels from the user's last fitted model; -1 before the first analysis
+    page["Cluster"] = -1
+    clusterer = TradeClusterer.from_state(load_cluster_state(user_id))
+    if not page.empty and clusterer.mean is not None:
+        features, valid = trade_features(page)
+        page.loc[valid, "Cluster"] = clusterer.predict(features[valid])
+
+    next_cursor = int(page["TradeID"].iloc[-1]) if len(page) == limit else None
+    if request.args.get("format") == "columns":
+        body = {"columns": {col: page[col].tolist() for col in page.columns}}
+    else:
+        body = {"round_trips": page.to_dict(orient="records")}
+    return jsonify({**body, "count": len(page), "next_cursor": next_cursor})
+
+@app.route("/analytics/portfolio", methods=["GET"])
+def portfolio_analytics_view():
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    period = request.args.get("period", "M").upper()
+    if period not in ANALYTICS_PERIODS:
+        return jsonify({"message": f"period must be one of {', '.join(ANALYTICS_PERIODS)}"}), 400
+    round_trips, _ = get_trade_metrics(session["user_id"])
+    return jsonify(portfolio_analytics(round_trips, period=period))
+
+@app.route("/valuation", methods=["GET"])
+def open_position_valuation():
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    open_positions = get_open_positions(session["user_id"])
+    by_ticker = request.args.get("by_ticker") == "1"
+    return jsonify(value_open_positions_at_market(open_positions, by_ticker=by_ticker))
+
+@app.route("/options/analytics", methods=["GET"])
+def option_analytics_view():
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    user_id = session["user_id"]
+    open_positions = get_open_positions(user_id)
+    option_trades = load_trade_frame(user_id, columns=OPTION_TRADE_COLUMNS, options_only=True)
+    include_trades = request.args.get("trades") == "1"
+    return jsonify(options_analytics_at_market(option_trades, open_positions, include_trades=include_trades))
+
+@app.after_request
+def gzip_response(response):
+    # Compress sizeable JSON bodies for clients that accept it; streamed responses pass through
+    if (
+        GZIP_MIN_BYTES <= 0
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype != "application/json"
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    # Caches must not serve a gzipped body to a client that didn't ask for one, or the reverse
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in request.headers.get("Accept-Encoding", "").lower():
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@app.route("/recommendation_cache/stats", methods=["GET"])
+def recommendation_cache_stats():
+    if "user_id" not in session:
+        return jsonify({"message": "Unauthorized"}), 401
+    return jsonify(get_recommendation_cache().stats())
 
 if __name__ == "__main__":
+    # Jobs left behind by the last run are picked up when the server starts
+    resume_analysis_jobs()
     app.run(host="0.0.0.0", port=8000, debug=True)
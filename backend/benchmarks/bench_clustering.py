@@ -0,0 +1,55 @@
+# backend/benchmarks/bench_clustering.py
+"""
+Cold (silhouette-chosen k) and warm-started (previous centroids) clustering
+of synthetic round-trips, against the original KMeans(n_clusters=2) on raw
+Duration/Profit for reference.
+
+    cd backend && python -m benchmarks.bench_clustering --round-trips 1000000
+"""
+import argparse
+import time
+import numpy as np
+
+from modules.trade_analysis import TradeClusterer, trade_features
+from benchmarks.synthetic import make_round_trips
+
+
+def main():
+    from sklearn.cluster import KMeans
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--round-trips", type=int, default=1_000_000)
+    parser.add_argument("--legacy-round-trips", type=int, default=100_000)
+    args = parser.parse_args()
+
+    KMeans(n_clusters=2, n_init=1).fit(np.random.default_rng(0).random((100, 2)))  # import/JIT warm-up
+    n = 1000
+    while n <= args.round_trips:
+        round_trips = make_round_trips(n)
+        start = time.perf_counter()
+        features, valid = trade_features(round_trips)
+        feature_s = time.perf_counter() - start
+
+        clusterer = TradeClusterer()
+        start = time.perf_counter()
+        labels = clusterer.fit_predict(features[valid])
+        cold_s = time.perf_counter() - start
+
+        warm = TradeClusterer.from_state(clusterer.to_state())
+        start = time.perf_counter()
+        warm_labels = warm.fit_predict(features[valid])
+        warm_s = time.perf_counter() - start
+
+        line = (f"{n:>9,} round-trips: features {feature_s * 1000:6.1f} ms, cold {cold_s * 1000:7.1f} ms "
+                f"(k={clusterer.k}, silhouette {clusterer.silhouette:.3f}, {clusterer.method}), "
+                f"warm {warm_s * 1000:7.1f} ms ({np.mean(labels == warm_labels):.1%} same labels)")
+        if n <= args.legacy_round_trips:
+            start = time.perf_counter()
+            KMeans(n_clusters=2, random_state=42).fit(round_trips[["Duration", "Profit"]].values)
+            line += f", legacy KMeans(2) {(time.perf_counter() - start) * 1000:7.1f} ms"
+        print(line)
+        n *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_context_builder.py
+"""
+Prompt size as trade history grows: the original context (the whole
+pattern_analysis dict, trade_data included, f-stringed into the prompt)
+against context_builder's token-budgeted summary.
+
+    cd backend && python -m benchmarks.bench_context_builder --rows 1000000
+"""
+import argparse
+import time
+
+from modules.context_builder import CONTEXT_TOKEN_BUDGET, build_context, count_tokens
+from modules.preprocessing import LotMatcher
+from modules.trade_analysis import analyze_trade_patterns
+from benchmarks.synthetic import make_trade_history
+
+
+def legacy_context(pattern_analysis, market_data, sentiment) -> str:
+    """The original context_str from analyze_trades."""
+    return (
+        f"Trade patterns: {pattern_analysis}. "
+        f"Market data: {market_data}. "
+        f"Aggregated sentiment scores: {sentiment}."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=100_000, help="largest history to render the old way")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    n_rows = 100
+    while n_rows <= args.rows:
+        matcher = LotMatcher("fifo")
+        round_trips = matcher.match(make_trade_history(n_rows, n_contracts=max(10, n_rows // 50)))
+        open_positions = matcher.open_positions()
+        tickers = sorted(round_trips["Ticker"].unique())
+        market_data = {t: {"recent_close": 100.0 + i, "data_points": 124} for i, t in enumerate(tickers)}
+        sentiment = {t: 0.01 * (i % 50) - 0.25 for i, t in enumerate(tickers)}
+        pattern_analysis = analyze_trade_patterns(round_trips)
+
+        start = time.perf_counter()
+        _, text, tokens = build_context(round_trips, pattern_analysis, market_data, sentiment, open_positions,
+                                        token_budget=args.budget)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        if n_rows <= args.legacy_rows:
+            legacy = legacy_context(pattern_analysis, market_data, sentiment)
+            legacy_note = f"legacy {count_tokens(legacy):>11,} tokens ({len(legacy) / 1e6:7.2f} MB)"
+        else:
+            legacy_note = "legacy skipped"
+        print(f"{n_rows:>9,} rows / {len(round_trips):>9,} round-trips: context {tokens:>4} tokens "
+              f"({len(text):>5} chars, built in {build_ms:7.1f} ms)  {legacy_note}")
+        n_rows *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_index_types.py
+"""
+Recall@k, QPS, build time and memory for each VectorStore index type on
+synthetic clustered 384-d embeddings, against exact search as ground truth.
+
+    cd backend && python -m benchmarks.bench_index_types --vectors 1000000 --queries 1000
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+
+from modules.vector_store import EMBEDDING_DIM, VectorStore
+
+CHUNK = 100_000
+
+
+def make_embeddings(rng, n: int, centers: np.ndarray) -> np.ndarray:
+    """Unit vectors scattered around topic centers, roughly like sentence embeddings."""
+    topic = rng.integers(0, len(centers), n)
+    vectors = centers[topic] + rng.standard_normal((n, EMBEDDING_DIM), dtype=np.float32) * 0.6
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(np.intersect1d(f[f >= 0], t)) / k for f, t in zip(found, truth)]))
+
+
+def index_bytes(index) -> int:
+    return len(faiss.serialize_index(index))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=40)
+    parser.add_argument("--types", default="flat,hnsw,ivfpq")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.topics, EMBEDDING_DIM), dtype=np.float32)
+    data = np.vstack([make_embeddings(rng, min(CHUNK, args.vectors - i), centers)
+                      for i in range(0, args.vectors, CHUNK)])
+    queries = make_embeddings(rng, args.queries, centers)
+
+    exact = faiss.IndexFlatL2(EMBEDDING_DIM)
+    exact.add(data)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    # Each index type is built once and then searched at several search-time settings
+    sweeps = {
+        "flat": ("", [None]),
+        "hnsw": ("ef_search", [16, 32, 64, 128, 256]),
+        "ivfpq": ("nprobe", [4, 16, 64, 128]),
+    }
+    print(f"{args.vectors} vectors, {args.queries} queries, k={args.k}")
+    print(f"{'index':<8}{'setting':<16}{'recall@k':>9}{'QPS':>10}{'build s':>9}{'index MB':>10}")
+    for index_type in args.types.split(","):
+        store = VectorStore(index_type, hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+                            nlist=args.nlist, pq_m=args.pq_m)
+        metadatas = [{}] * CHUNK
+        start = time.perf_counter()
+        if index_type == "ivfpq":
+            store.train(data[rng.choice(len(data), min(len(data), 256 * args.nlist), replace=False)])
+        for i in range(0, len(data), CHUNK):
+            batch = data[i:i + CHUNK]
+            store.add_documents(batch, metadatas[:len(batch)])
+        build_s = time.perf_counter() - start
+        size_mb = index_bytes(store.index) / 1e6
+
+        knob, values = sweeps[index_type]
+        for value in values:
+            if knob:
+                setattr(store, knob, value)
+            params = store._search_params(None, args.k)
+            start = time.perf_counter()
+            _, found = store.index.search(queries, args.k, params=params)
+            qps = args.queries / (time.perf_counter() - start)
+            setting = f"{knob}={value}" if knob else "exact"
+            print(f"{index_type:<8}{setting:<16}{recall_at_k(found, truth):>9.3f}{qps:>10,.0f}"
+                  f"{build_s:>9.1f}{size_mb:>10.1f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# backend/benchmarks/bench_lot_matching.py
+"""
+Throughput of the LotMatcher engine on synthetic histories, plus the old
+cumulative-count grouping for reference on a smaller slice.
+
+    cd backend && python -m benchmarks.bench_lot_matching --rows 1000000
+"""
+import argparse
+import time
+import pandas as pd
+
+from modules.preprocessing import LotMatcher, MATCH_METHODS
+from benchmarks.synthetic import make_trade_history
+
+
+def legacy_calculate_trade_metrics(trade_df: pd.DataFrame) -> pd.DataFrame:
+    """The pre-LotMatcher implementation (first buy vs first sell per global buy count)."""
+    trade_df = trade_df.sort_values("activity_date")
+    trade_df["TradeID"] = (trade_df["parsed_action"] == "Buy to Open").cumsum()
+    metrics = []
+    for trade_id, group in trade_df.groupby("TradeID"):
+        buy_rows = group[group["parsed_action"] == "Buy to Open"]
+        sell_rows = group[group["parsed_action"] == "Sell to Close"]
+        if not buy_rows.empty and not sell_rows.empty:
+            buy_row = buy_rows.iloc[0]
+            sell_row = sell_rows.iloc[0]
+            metrics.append({
+                "TradeID": trade_id,
+                "BuyDate": buy_row["activity_date"],
+                "SellDate": sell_row["activity_date"],
+                "Duration": (sell_row["activity_date"] - buy_row["activity_date"]).days,
+                "Profit": (sell_row["price"] - buy_row["price"]) * buy_row["quantity"],
+                "Ticker": buy_row["ticker"],
+            })
+    return pd.DataFrame(metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for n_rows in sorted({args.rows // 10, args.rows}):
+        history = make_trade_history(n_rows)
+        for method in MATCH_METHODS:
+            start = time.perf_counter()
+            matcher = LotMatcher(method)
+            round_trips = matcher.match(history)
+            elapsed = time.perf_counter() - start
+            print(f"{method:>8} {n_rows:>9} rows: {elapsed:6.2f}s  "
+                  f"({n_rows / elapsed:,.0f} rows/s, {len(round_trips)} round-trips, "
+                  f"{len(matcher.open_positions())} open lots)")
+
+    if args.legacy_rows:
+        history = make_trade_history(args.legacy_rows)
+        start = time.perf_counter()
+        legacy_calculate_trade_metrics(history)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        LotMatcher("fifo").match(history)
+        new = time.perf_counter() - start
+        print(f"legacy grouping {args.legacy_rows} rows: {legacy:.2f}s vs LotMatcher {new:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/benchmarks/bench_news_pipeline.py
+"""
+Fetch news articles from the local stand-in server (tools/news_stub_server)
+with the original per-ticker loop and with market_data.iter_news_articles.
+
+    cd backend && python -m benchmarks.bench_news_pipeline --tickers 5 --articles 20 --latency 0.1
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from bs4 import BeautifulSoup
+from modules.market_data import iter_news_articles
+from tools.news_stub_server import start_stub_server, stub_search
+
+
+def legacy_fetch(tickers, news_count, search):
+    """The original get_news_data loop: one thread per ticker, articles fetched and parsed serially."""
+    all_news = []
+    session = requests.Session()
+
+    def process_ticker(ticker):
+        for article in search(ticker, news_count):
+            response = session.get(article["link"], headers={'User-Agent': 'Mozilla/5.0'})
+            soup = BeautifulSoup(response.text, 'html.parser')
+            text = ' '.join(p.get_text() for p in soup.find_all('p'))
+            all_news.append({'Ticker': ticker, 'Title': article["title"], 'Link': article["link"], 'Content': text})
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        executor.map(process_ticker, tickers)
+    return all_news
+
+
+def uncached(search):
+    # A fresh query string per run keeps the HTTP cache from answering
+    run = uuid.uuid4().hex
+
+    def wrapped(ticker, news_count):
+        return [dict(a, link=f"{a['link']}?run={run}") for a in search(ticker, news_count)]
+    return wrapped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--hosts", type=int, default=4, help="stand-in servers, each a separate host")
+    args = parser.parse_args()
+
+    servers = [start_stub_server(latency=args.latency, fail_first=0) for _ in range(args.hosts)]
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    search = stub_search([base_url for _, base_url in servers])
+    total = args.tickers * args.articles
+    print(f"{total} articles over {args.hosts} hosts, {args.latency * 1000:.0f} ms simulated latency")
+
+    start = time.perf_counter()
+    legacy = legacy_fetch(tickers, args.articles, uncached(search))
+    legacy_s = time.perf_counter() - start
+    print(f"legacy loop      : {legacy_s:7.2f}s  ({len(legacy)} articles)")
+
+    start = time.perf_counter()
+    first_s = None
+    articles = []
+    for item in iter_news_articles(tickers, args.articles, search=uncached(search)):
+        if first_s is None:
+            first_s = time.perf_counter() - start
+        articles.append(item)
+    new_s = time.perf_counter() - start
+    print(f"bounded pipeline : {new_s:7.2f}s  ({len(articles)} articles, first after {first_s:.2f}s)")
+    print(f"speedup          : {legacy_s / new_s:7.1f}x")
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_options_analytics.py
+"""
+Implied volatility and greeks for synthetic option trades priced off the
+synthetic price history, against a per-row scipy.optimize.brentq solve.
+
+    cd backend && python -m benchmarks.bench_options_analytics --trades 50000 --tickers 100
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.price_store import SyntheticPriceProvider
+from modules.options_analytics import (
+    RISK_FREE_RATE, black_scholes_greeks, option_trade_analytics, options_analytics,
+)
+
+
+def make_option_trades(n: int, prices: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Option fills (load_trade_frame columns) priced by Black-Scholes at a random volatility, plus noise."""
+    rng = np.random.default_rng(seed)
+    rows = prices.iloc[rng.integers(0, len(prices), n)]
+    spot = rows["close"].to_numpy()
+    days = rng.choice([2, 7, 14, 30, 60, 120, 365], n)
+    strike = np.round(spot * rng.uniform(0.7, 1.3, n))
+    is_call = rng.random(n) < 0.5
+    sigma = rng.uniform(0.15, 1.2, n)
+    premium = black_scholes_greeks(spot, strike, days / 365.0, sigma, is_call)["price"]
+    premium = np.round(np.maximum(premium * rng.uniform(0.97, 1.03, n), 0.01), 2)
+    expiration = (rows["date"] + pd.to_timedelta(days, unit="D")).dt.strftime("%-m/%-d/%Y")
+    opening = rng.random(n) < 0.6
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "activity_date": rows["date"].to_numpy(),
+        "parsed_action": np.where(opening, "Buy to Open", "Sell to Close"),
+        "price": premium,
+        "quantity": rng.integers(1, 10, n).astype(float),
+        "ticker": rows["ticker"].to_numpy(dtype=object),
+        "option_type": np.where(is_call, "Call", "Put"),
+        "strike_price": strike,
+        "option_expiration": expiration.to_numpy(dtype=object),
+    })
+
+
+def brentq_iv(frame: pd.DataFrame) -> np.ndarray:
+    """The straightforward alternative: one scalar root solve per trade."""
+    from scipy.optimize import brentq
+
+    ivs = []
+    for row in frame.itertuples(index=False):
+        def error(sigma):
+            return black_scholes_greeks(row.underlying, row.strike_price, row.days_to_expiry / 365.0, sigma,
+                                        row.option_type == "Call", RISK_FREE_RATE)["price"] - row.price
+        try:
+            ivs.append(brentq(error, 1e-4, 5.0, xtol=1e-8))
+        except ValueError:
+            ivs.append(np.nan)
+    return np.asarray(ivs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trades", type=int, default=50_000)
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--baseline-rows", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    end = datetime.date(2024, 12, 31)
+    prices = SyntheticPriceProvider().download(tickers, end - datetime.timedelta(days=3 * 365), end)
+    trades = make_option_trades(args.trades, prices)
+    # Open lots: the opening fills, so exposure covers every contract still alive at the last price date
+    opens = trades[trades["parsed_action"] == "Buy to Open"]
+    open_positions = pd.DataFrame({
+        "LotID": opens["id"], "Ticker": opens["ticker"], "OptionType": opens["option_type"],
+        "Strike": opens["strike_price"], "Expiration": opens["option_expiration"],
+        "OpenDate": opens["activity_date"], "Quantity": opens["quantity"], "Price": opens["price"],
+    })
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        analytics = option_trade_analytics(trades, prices)
+        timings.append(time.perf_counter() - start)
+    solved = analytics["iv"].notna()
+    print(f"option_trade_analytics: {min(timings) * 1000:8.1f} ms for {len(trades):,} trades "
+          f"({solved.mean():.1%} with an implied volatility)")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = options_analytics(trades, open_positions, prices)
+        timings.append(time.perf_counter() - start)
+    print(f"options_analytics (IV, greeks, exposure): {min(timings) * 1000:8.1f} ms "
+          f"({len(result['exposure'])} expiration/ticker buckets, {result['summary']['open_contracts']:,.0f} open contracts)")
+
+    sample = analytics.head(args.baseline_rows)
+    start = time.perf_counter()
+    baseline = brentq_iv(sample)
+    elapsed = time.perf_counter() - start
+    agree = np.nanmax(np.abs(baseline - sample["iv"].to_numpy()))
+    print(f"per-row brentq: {elapsed * 1000:8.1f} ms for {len(sample):,} trades "
+          f"(~{elapsed / len(sample) * len(trades):.1f} s for {len(trades):,}); max |IV difference| {agree:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# backend/benchmarks/bench_portfolio_analytics.py
+"""
+portfolio_analytics over synthetic round-trips, with the original
+groupby + iterrows profit_by_ticker loop for reference.
+
+    cd backend && python -m benchmarks.bench_portfolio_analytics --round-trips 1000000
+"""
+import argparse
+import time
+
+from modules.portfolio_analytics import portfolio_analytics
+from benchmarks.synthetic import make_round_trips
+
+
+def legacy_profit_by_ticker(trade_metrics):
+    """The original /analyze per-ticker summary (total profit only)."""
+    profit_summary = trade_metrics.groupby("Ticker")["Profit"].sum().reset_index()
+    profit_by_ticker = []
+    for _, row in profit_summary.iterrows():
+        profit_by_ticker.append({"ticker": row["Ticker"], "total_profit": float(row["Profit"])})
+    return profit_by_ticker
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--round-trips", type=int, default=1_000_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    round_trips = make_round_trips(args.round_trips)
+    # Spread the trades over more symbols than the synthetic default
+    round_trips["Ticker"] = "T" + (round_trips["TradeID"] % args.tickers).astype(str).str.zfill(4)
+
+    start = time.perf_counter()
+    legacy_profit_by_ticker(round_trips)
+    print(f"legacy profit_by_ticker: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    for period in ("M", "W"):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = portfolio_analytics(round_trips, period=period)
+            timings.append(time.perf_counter() - start)
+        print(f"portfolio_analytics period={period}: {min(timings) * 1000:8.1f} ms for {len(round_trips):,} "
+              f"round-trips ({len(result['per_ticker'])} tickers, {len(result['per_period'])} periods, "
+              f"max drawdown {result['portfolio']['max_drawdown']:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
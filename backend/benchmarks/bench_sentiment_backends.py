@@ -0,0 +1,91 @@
+# backend/benchmarks/bench_sentiment_backends.py
+"""
+Accuracy vs. latency of the FinBERT CPU backends (fp32 torch, dynamic int8,
+ONNX Runtime) on a fixed set of headlines. The first backend that can run
+here is the reference for label agreement and score drift; backends whose
+packages or weights are missing are reported and skipped.
+
+    cd backend && python -m benchmarks.bench_sentiment_backends --repeat 5
+"""
+import argparse
+import time
+import numpy as np
+
+from modules.sentiment import SentimentBackendError, SentimentModel, SENTIMENT_BACKENDS, MODEL_NAME
+
+HEADLINES = [
+    "Apple beats quarterly revenue estimates on record iPhone sales",
+    "Tesla shares slump after deliveries miss analyst expectations",
+    "Microsoft announces $60 billion share buyback and raises dividend",
+    "Nvidia guidance tops forecasts as data center demand surges",
+    "Amazon faces antitrust lawsuit from FTC over marketplace practices",
+    "Alphabet reports steady ad revenue growth, cloud margins improve",
+    "Meta cuts 10,000 jobs in second round of layoffs",
+    "AMD loses market share to Intel in server processors, report says",
+    "Federal Reserve holds rates steady, signals two cuts later this year",
+    "Oil prices tumble as OPEC+ output increase outweighs demand outlook",
+    "Bank stocks rally after stress test results show strong capital buffers",
+    "Retail sales unexpectedly fall for second straight month",
+    "Company withdraws full-year guidance citing supply chain disruptions",
+    "Shares were little changed in quiet pre-holiday trading",
+    "Regulators approve merger, clearing the way for the deal to close next quarter",
+    "Chipmaker warns of inventory glut as PC demand weakens",
+    "Streaming service adds more subscribers than expected, stock jumps 12%",
+    "Airline cancels hundreds of flights amid pilot shortage",
+    "Biotech stock soars after FDA grants approval to lead drug candidate",
+    "Credit rating agency downgrades outlook to negative on rising debt",
+    "Quarterly earnings in line with consensus; management reiterates outlook",
+    "Automaker recalls 500,000 vehicles over faulty airbag inflators",
+    "Payments company beats on earnings but revenue growth slows",
+    "Housing starts rise to highest level in a year",
+    "Retailer files for Chapter 11 bankruptcy protection",
+    "Semiconductor index hits all-time high on AI optimism",
+    "Dividend cut sends utility shares to five-year low",
+    "Board authorizes special dividend after asset sale",
+    "Consumer confidence slips as inflation worries persist",
+    "Cloud provider signs multi-year contract with Department of Defense",
+    "Short seller report alleges accounting irregularities; shares plunge",
+    "Analysts upgrade stock to buy, citing improving free cash flow",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backends", nargs="+", default=list(SENTIMENT_BACKENDS))
+    args = parser.parse_args()
+
+    texts = HEADLINES
+    reference = None
+    print(f"model: {MODEL_NAME}, {len(texts)} headlines, batch size {args.batch_size}")
+    print(f"{'backend':>8} {'load s':>8} {'texts/s':>9} {'speedup':>8} {'label agree':>12} {'max |dscore|':>13}")
+    baseline_rate = None
+    for backend in args.backends:
+        start = time.perf_counter()
+        try:
+            model = SentimentModel(MODEL_NAME, backend)
+        except SentimentBackendError as exc:
+            print(f"{backend:>8} skipped: {exc}")
+            continue
+        load_time = time.perf_counter() - start
+
+        model.score(texts, args.batch_size)  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            scores = np.array(model.score(texts, args.batch_size))
+        rate = len(texts) * args.repeat / (time.perf_counter() - start)
+
+        labels = np.concatenate([model.predict_proba(texts[i:i + args.batch_size]).argmax(axis=1)
+                                 for i in range(0, len(texts), args.batch_size)])
+        if reference is None:
+            reference = (labels, scores)
+            baseline_rate = rate
+        agreement = float((labels == reference[0]).mean())
+        drift = float(np.abs(scores - reference[1]).max())
+        print(f"{backend:>8} {load_time:8.2f} {rate:9.1f} {rate / baseline_rate:7.2f}x "
+              f"{agreement:11.1%} {drift:13.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# backend/benchmarks/bench_startup.py
+"""
+Time a cold `import app` in a fresh interpreter and list the slowest imports
+from `python -X importtime`.
+
+    cd backend && python -m benchmarks.bench_startup --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return (cumulative_us, self_us, module) for each `import time:` line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        entries.append((int(cumulative_us), int(self_us), module.rstrip()[1:]))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    # Point the app at an in-memory database so the measurement needs no Postgres server
+    env = dict(os.environ, DATABASE_URL=os.environ.get("DATABASE_URL", "sqlite://"))
+    wall_times = []
+    stderr = ""
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+        wall_times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            sys.exit(proc.stderr)
+        stderr = proc.stderr
+
+    entries = parse_importtime(stderr)
+    app_us = next(e[0] for e in entries if e[2] == "app")
+    print(f"import app: {app_us / 1e6:.3f}s (last run); best wall time {min(wall_times):.3f}s "
+          f"over {args.runs} runs including interpreter startup")
+    print(f"\n{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, module in sorted(entries, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1e6:11.3f}s {self_us / 1e6:9.3f}s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_trade_ingestion.py
+"""
+Compare the vectorized parse_robinhood_csv against the original row-loop parser.
+
+    cd backend && python -m benchmarks.bench_trade_ingestion --rows 100000
+"""
+import argparse
+import csv
+import io
+import re
+import time
+import pandas as pd
+
+from modules.trade_ingestion import parse_robinhood_csv, parse_amount_string
+from benchmarks.synthetic import make_robinhood_csv
+
+
+def legacy_parse_robinhood_csv(file_content: bytes) -> pd.DataFrame:
+    """
+    The pre-vectorization parser, kept as the reference output. The only
+    change is that prices go through parse_amount_string like amounts: the
+    original to_numeric turned quoted prices such as "$3.10" into NaN.
+    """
+    df = pd.read_csv(io.BytesIO(file_content), on_bad_lines='skip', quoting=csv.QUOTE_MINIMAL)
+    rename_map = {
+        "Activity Date": "activity_date", "Process Date": "process_date", "Settle Date": "settle_date",
+        "Instrument": "instrument", "Description": "description", "Trans Code": "trade_code",
+        "Quantity": "quantity", "Price": "price", "Amount": "amount"
+    }
+    for old_col, new_col in rename_map.items():
+        if old_col in df.columns:
+            df.rename(columns={old_col: new_col}, inplace=True)
+    for col in ["activity_date", "process_date", "settle_date"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+            df[col] = df[col].apply(lambda x: x if pd.notna(x) else None)
+    for col in ["quantity"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = df[col].apply(lambda x: x if pd.notna(x) else None)
+    for col in ["price", "amount"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+            df[col] = df[col].apply(parse_amount_string)
+            df[col] = df[col].apply(lambda x: x if pd.notna(x) else None)
+    df["parsed_action"] = None
+    df["option_type"] = None
+    df["strike_price"] = None
+    df["option_expiration"] = None
+    trade_code_map = {"BTO": "Buy to Open", "STC": "Sell to Close"}
+    for idx, row in df.iterrows():
+        desc = str(row.get("description", ""))
+        code = str(row.get("trade_code", "")).upper().strip()
+        parsed_action = trade_code_map.get(code, None)
+        match = re.search(r"(\S+)\s+(\d{1,2}/\d{1,2}/\d{4})\s+(Call|Put)\s+\$(\d+(\.\d+)?)", desc)
+        if match:
+            df.at[idx, "option_type"] = match.group(3)
+            df.at[idx, "option_expiration"] = match.group(2)
+            df.at[idx, "strike_price"] = float(match.group(4))
+            if "Assigned" in desc:
+                parsed_action = "Assigned"
+            elif "Expiration" in desc:
+                parsed_action = "Expired"
+        if not parsed_action:
+            parsed_action = "Unknown"
+        df.at[idx, "parsed_action"] = parsed_action
+    df = df.where(pd.notna(df), None)
+    df = df.replace({pd.NaT: None})
+    return df
+
+
+def _normalized(df: pd.DataFrame) -> pd.DataFrame:
+    # Compare values only: the new parser keeps NaN/NaT in typed columns where the old one used None
+    out = df.astype(object)
+    return out.where(pd.notna(out), None)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    contents = make_robinhood_csv(args.rows)
+    print(f"Synthetic CSV: {args.rows} rows, {len(contents) / 1e6:.1f} MB")
+
+    new_df, new_time = _timed(parse_robinhood_csv, contents)
+    print(f"vectorized parse_robinhood_csv: {new_time:.3f}s")
+    if args.skip_legacy:
+        return
+
+    old_df, old_time = _timed(legacy_parse_robinhood_csv, contents)
+    print(f"legacy row-loop parser:         {old_time:.3f}s  ({old_time / new_time:.1f}x slower)")
+
+    pd.testing.assert_frame_equal(_normalized(old_df), _normalized(new_df), check_dtype=False)
+    print("Outputs are equal.")
+
+
+if __name__ == "__main__":
+    main()
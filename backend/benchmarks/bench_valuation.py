@@ -0,0 +1,45 @@
+# backend/benchmarks/bench_valuation.py
+"""
+Mark-to-market and daily equity curve of synthetic open lots against
+multi-year synthetic price history (no network or database).
+
+    cd backend && python -m benchmarks.bench_valuation --lots 20000 --tickers 500 --years 4
+"""
+import argparse
+import datetime
+import time
+
+from modules.price_store import SyntheticPriceProvider
+from modules.valuation import value_open_positions
+from benchmarks.synthetic import make_open_positions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lots", type=int, default=20_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    end = datetime.date(2024, 12, 31)
+    prices = SyntheticPriceProvider().download(tickers, end - datetime.timedelta(days=365 * args.years), end)
+    lots = make_open_positions(args.lots, tickers)
+    print(f"{len(lots):,} open lots ({lots['OptionType'].notna().sum():,} options) over {args.tickers} tickers, "
+          f"{len(prices):,} daily closes")
+
+    for by_ticker in (False, True):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            valuation = value_open_positions(lots, prices, by_ticker=by_ticker)
+            timings.append(time.perf_counter() - start)
+        portfolio = valuation["portfolio"]
+        print(f"value_open_positions by_ticker={by_ticker}: {min(timings) * 1000:8.1f} ms "
+              f"({len(valuation['equity_curve'])} curve days, market value {portfolio['market_value']:,.0f}, "
+              f"unrealized {portfolio['unrealized_pnl']:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
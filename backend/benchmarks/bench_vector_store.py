@@ -0,0 +1,127 @@
+# backend/benchmarks/bench_vector_store.py
+"""
+Build a VectorStore from synthetic 384-d vectors with ticker/date metadata and
+report batched-add throughput, filtered search latency, sidecar size and load
+times, plus the old one-document-at-a-time add with a pickled sidecar for reference.
+
+    cd backend && python -m benchmarks.bench_vector_store --vectors 1000000
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import faiss
+import numpy as np
+import pandas as pd
+
+from modules.vector_store import EMBEDDING_DIM, M, VectorStore
+
+N_TICKERS = 50
+CHUNK = 50_000
+
+
+def make_batch(rng, start: int, n: int):
+    vectors = rng.standard_normal((n, EMBEDDING_DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    tickers = rng.integers(0, N_TICKERS, n)
+    dates = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, n), unit="D")
+    metadatas = [
+        {"Ticker": f"T{t:02d}", "Date": d, "Title": f"headline {start + i}", "Link": f"https://news.example/{start + i}"}
+        for i, (t, d) in enumerate(zip(tickers, dates))
+    ]
+    return vectors, metadatas
+
+
+def legacy_add(vectors, metadatas, path):
+    """The original VectorStore: one reshape + index.add per document, metadata pickled as a list."""
+    index = faiss.IndexHNSWFlat(EMBEDDING_DIM, M)
+    documents = []
+    for embedding, metadata in zip(vectors, metadatas):
+        index.add(np.array(embedding, dtype=np.float32).reshape(1, EMBEDDING_DIM))
+        documents.append(metadata)
+    with open(path, "wb") as f:
+        pickle.dump(documents, f)
+    return os.path.getsize(path)
+
+
+def sidecar_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def time_queries(store, queries, top_k, **filters):
+    start = time.perf_counter()
+    results = [store.search(q, top_k, **filters) for q in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--legacy-docs", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        if args.legacy_docs:
+            vectors, metadatas = make_batch(rng, 0, args.legacy_docs)
+            start = time.perf_counter()
+            pickle_size = legacy_add(vectors, metadatas, os.path.join(workdir, "legacy.meta"))
+            legacy_s = time.perf_counter() - start
+            start = time.perf_counter()
+            small = VectorStore()
+            small.add_documents(vectors, metadatas)
+            small.save_index(os.path.join(workdir, "small.index"))
+            batched_s = time.perf_counter() - start
+            print(f"{args.legacy_docs} docs  legacy add+pickle: {legacy_s:6.2f}s ({pickle_size / 1e6:.1f} MB)  "
+                  f"add_documents+save: {batched_s:6.2f}s "
+                  f"({sidecar_bytes(os.path.join(workdir, 'small.index.cols')) / 1e6:.1f} MB columns)")
+
+        store = VectorStore()
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, CHUNK):
+            vectors, metadatas = make_batch(rng, offset, min(CHUNK, args.vectors - offset))
+            store.add_documents(vectors, metadatas)
+        build_s = time.perf_counter() - start
+        print(f"built {args.vectors} vectors in {build_s:.1f}s ({args.vectors / build_s:,.0f} vectors/s)")
+
+        queries, _ = make_batch(rng, 0, args.queries)
+        for label, filters in [
+            ("unfiltered", {}),
+            ("1 ticker", {"tickers": ["T07"]}),
+            ("5 tickers + 90 days", {"tickers": [f"T{i:02d}" for i in range(5)],
+                                     "start": "2024-01-01", "end": "2024-03-31"}),
+        ]:
+            ms, results = time_queries(store, queries, args.top_k, **filters)
+            wanted = filters.get("tickers")
+            ok = all(doc["Ticker"] in wanted for docs in results for doc in docs) if wanted else True
+            filled = np.mean([len(docs) for docs in results])
+            print(f"search {label:<20}: {ms:7.2f} ms/query  ({filled:.1f} hits avg, filter respected: {ok})")
+
+        start = time.perf_counter()
+        removed = store.remove(np.arange(0, args.vectors, 10))
+        print(f"removed {removed} documents in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        path = os.path.join(workdir, "store.index")
+        start = time.perf_counter()
+        store.save_index(path)
+        print(f"save: {time.perf_counter() - start:.1f}s  index {os.path.getsize(path) / 1e6:.0f} MB, "
+              f"metadata columns {sidecar_bytes(path + '.cols') / 1e6:.0f} MB")
+        del store
+
+        for mmap in (False, True):
+            start = time.perf_counter()
+            loaded = VectorStore()
+            loaded.load_index(path, mmap=mmap)
+            print(f"load (mmap={mmap}): {time.perf_counter() - start:.2f}s, {len(loaded)} live documents")
+            del loaded
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
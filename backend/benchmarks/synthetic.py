@@ -0,0 +1,135 @@
+# backend/benchmarks/synthetic.py
+"""Synthetic Robinhood-style trade histories shared by the benchmark scripts."""
+import numpy as np
+import pandas as pd
+
+from modules.preprocessing import LotMatcher
+
+TICKERS = ["AAPL", "TSLA", "MSFT", "SPY", "NVDA", "AMZN", "GOOGL", "META", "AMD", "QQQ"]
+
+
+def make_robinhood_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Raw export frame with the broker's column names and string-formatted values."""
+    rng = np.random.default_rng(seed)
+    ticker = rng.choice(TICKERS, n_rows)
+    dates = pd.Timestamp("2020-01-02") + pd.to_timedelta(np.sort(rng.integers(0, 1500, n_rows)), unit="D")
+    code = rng.choice(["BTO", "STC", "Buy", "Sell", "OEXP", "OASGN", "CDIV"], n_rows,
+                      p=[0.3, 0.3, 0.15, 0.15, 0.04, 0.03, 0.03])
+    expiration = (dates + pd.Timedelta(days=30)).strftime("%-m/%-d/%Y")
+    kind = rng.choice(["Call", "Put"], n_rows)
+    strike = rng.integers(20, 500, n_rows)
+    contract = [f"{t} {e} {k} ${s:.2f}" for t, e, k, s in zip(ticker, expiration, kind, strike)]
+
+    description = np.full(n_rows, "Common Stock", dtype=object)
+    is_option = np.isin(code, ["BTO", "STC"])
+    description[is_option] = np.asarray(contract, dtype=object)[is_option]
+    description[code == "OEXP"] = ["Option Expiration for " + c for c in np.asarray(contract)[code == "OEXP"]]
+    description[code == "OASGN"] = ["Assigned " + c for c in np.asarray(contract)[code == "OASGN"]]
+
+    quantity = rng.integers(1, 20, n_rows).astype(float)
+    price = np.round(rng.uniform(0.05, 50.0, n_rows), 2)
+    amount = quantity * price * np.where(np.isin(code, ["BTO", "Buy"]), -100.0, 100.0)
+    amount_str = [f"(${-a:,.2f})" if a < 0 else f"${a:,.2f}" for a in amount]
+    date_str = dates.strftime("%-m/%-d/%Y")
+
+    frame = pd.DataFrame({
+        "Activity Date": date_str,
+        "Process Date": date_str,
+        "Settle Date": date_str,
+        "Instrument": ticker,
+        "Description": description,
+        "Trans Code": code,
+        "Quantity": quantity,
+        "Price": [f"${p:.2f}" for p in price],
+        "Amount": amount_str,
+    })
+    # Sprinkle in the gaps real exports have
+    frame.loc[frame.index % 41 == 5, "Amount"] = np.nan
+    frame.loc[frame.index % 97 == 3, "Activity Date"] = np.nan
+    return frame
+
+
+def make_robinhood_csv(n_rows: int, seed: int = 0) -> bytes:
+    return make_robinhood_frame(n_rows, seed).to_csv(index=False).encode("utf-8")
+
+
+def make_trade_history(n_rows: int, n_contracts: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Parsed-trade frame (as loaded for /analyze) of interleaved opens and partial
+    closes spread over `n_contracts` option contracts.
+    """
+    rng = np.random.default_rng(seed)
+    contract = rng.integers(0, n_contracts, n_rows)
+    ticker = np.asarray(TICKERS, dtype=object)[contract % len(TICKERS)]
+    opening = rng.random(n_rows) < 0.5
+    quantity = rng.integers(1, 10, n_rows).astype(float)
+    price = np.round(rng.uniform(0.05, 50.0, n_rows), 2)
+    dates = pd.Timestamp("2020-01-02") + pd.to_timedelta(np.sort(rng.integers(0, 1500, n_rows)), unit="D")
+    return pd.DataFrame({
+        "id": np.arange(1, n_rows + 1),
+        "activity_date": dates,
+        "parsed_action": np.where(opening, "Buy to Open", "Sell to Close"),
+        "price": price,
+        "quantity": quantity,
+        "amount": quantity * price * 100 * np.where(opening, -1, 1),
+        "ticker": ticker,
+        "option_type": np.where(contract % 2 == 0, "Call", "Put"),
+        "strike_price": (contract % 50 * 5 + 50).astype(float),
+        "option_expiration": "1/17/2025",
+    })
+
+
+def make_round_trips(n: int, seed: int = 0) -> pd.DataFrame:
+    """Round-trips from three behaviours: day trades, swing trades and long holds."""
+    rng = np.random.default_rng(seed)
+    style = rng.choice(3, n, p=[0.5, 0.35, 0.15])
+    duration = np.choose(style, [rng.integers(0, 2, n), rng.integers(2, 30, n), rng.integers(30, 400, n)])
+    quantity = np.choose(style, [rng.integers(5, 50, n), rng.integers(1, 10, n), rng.integers(1, 5, n)]).astype(float)
+    buy_price = np.round(rng.lognormal(1.0, 0.8, n), 2)
+    ret = rng.normal(np.choose(style, [-0.05, 0.02, 0.3]), np.choose(style, [0.3, 0.5, 0.8]))
+    sell_price = np.round(np.clip(buy_price * (1 + ret), 0.01, None), 2)
+    buy_date = pd.Timestamp("2020-01-02") + pd.to_timedelta(rng.integers(0, 1500, n), unit="D")
+    option_type = np.where(rng.random(n) < 0.3, rng.choice(np.array(["Call", "Put"], dtype=object), n), None)
+    return pd.DataFrame({
+        "TradeID": np.arange(1, n + 1),
+        "BuyDate": buy_date,
+        "SellDate": buy_date + pd.to_timedelta(duration, unit="D"),
+        "Duration": duration,
+        "Profit": (sell_price - buy_price) * quantity,
+        "Ticker": np.asarray(TICKERS, dtype=object)[rng.integers(0, len(TICKERS), n)],
+        "OptionType": option_type,
+        "Quantity": quantity,
+        "BuyPrice": buy_price,
+        "SellPrice": sell_price,
+    })
+
+
+def make_open_positions(n_lots: int, tickers: list, option_share: float = 0.3, seed: int = 0) -> pd.DataFrame:
+    """
+    Open lots opened over 2021-2023, some of them options, from LotMatcher.open_positions()
+    over Robinhood-shaped buys: only the cash amount is given (x100 per option contract),
+    so lot prices are derived from it the way they are for a real export.
+    """
+    rng = np.random.default_rng(seed)
+    ticker = np.asarray(tickers, dtype=object)[rng.integers(0, len(tickers), n_lots)]
+    open_date = pd.Timestamp("2021-01-04") + pd.to_timedelta(rng.integers(0, 1000, n_lots), unit="D")
+    is_option = rng.random(n_lots) < option_share
+    expiration = (open_date + pd.to_timedelta(rng.choice([7, 30, 90, 365], n_lots), unit="D")).strftime("%-m/%-d/%Y")
+    quantity = rng.integers(1, 20, n_lots).astype(float)
+    # Premium per share for options, share price for equities
+    price = np.round(np.where(is_option, rng.uniform(0.5, 10.0, n_lots), rng.uniform(20.0, 120.0, n_lots)), 2)
+    buys = pd.DataFrame({
+        "id": np.arange(1, n_lots + 1),
+        "activity_date": open_date,
+        "parsed_action": "Buy to Open",
+        "quantity": quantity,
+        "amount": -np.round(quantity * price * np.where(is_option, 100.0, 1.0), 2),
+        "ticker": ticker,
+        "option_type": np.where(is_option, rng.choice(["Call", "Put"], n_lots), None),
+        "strike_price": np.where(is_option, rng.integers(10, 40, n_lots) * 5.0, np.nan),
+        "option_expiration": np.where(is_option, np.asarray(expiration, dtype=object), None),
+    })
+    matcher = LotMatcher()
+    matcher.match(buys)
+    # Valued from the first open date on, so contracts that have expired since are kept
+    return matcher.open_positions(as_of=open_date.min()).sort_values("LotID", kind="stable").reset_index(drop=True)
@@ -0,0 +1,61 @@
+# backend/json_provider.py
+import datetime
+import decimal
+import uuid
+import numpy as np
+import orjson
+import pandas as pd
+from flask.json.provider import JSONProvider
+
+# NumPy arrays/scalars natively; int/float dict keys (cluster ids) become strings
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _native_keys(obj):
+    # orjson only takes str/int/float/bool/None/datetime keys; NumPy keys are rare, so convert on demand
+    if isinstance(obj, dict):
+        return {(key.item() if isinstance(key, np.generic) else key): _native_keys(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_native_keys(value) for value in obj]
+    return obj
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson: several times faster than the
+    standard library encoder on analysis payloads and it serializes NumPy
+    values directly. Dates come out as ISO 8601 and NaN as null.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self._dumpb(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumpb(obj), mimetype="application/json")
+
+    @staticmethod
+    def _dumpb(obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return orjson.dumps(_native_keys(obj), default=_default, option=ORJSON_OPTIONS)
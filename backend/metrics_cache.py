@@ -0,0 +1,212 @@
+# backend/metrics_cache.py
+import json
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db
+from models import RoundTrip, TradeClusterState, TradeMetricsState
+from trade_queries import load_trade_frame
+from modules.preprocessing import LotMatcher
+
+# Round-trip frame column -> round_trips table column
+ROUND_TRIP_FIELDS = {
+    "TradeID": "trade_id",
+    "Actions": "actions",
+    "BuyDate": "buy_date",
+    "SellDate": "sell_date",
+    "Duration": "duration",
+    "Profit": "profit",
+    "Ticker": "ticker",
+    "OptionType": "option_type",
+    "Quantity": "quantity",
+    "BuyPrice": "buy_price",
+    "SellPrice": "sell_price",
+}
+
+# Users whose full round-trip frame is kept in memory between calls (per process)
+METRICS_MEMORY_USERS = int(os.environ.get("METRICS_MEMORY_USERS", 32))
+
+_round_trip_memory = OrderedDict()
+_round_trip_memory_lock = threading.Lock()
+
+
+def get_trade_metrics(user_id: int, method: str = "fifo"):
+    """
+    Return (round_trips, open_positions) for the user, folding in only the
+    trades ingested since the stored watermark. The first call (or the first
+    after invalidate_trade_metrics) replays the full history.
+
+    The round-trips are read from the table only when they changed since this
+    process last read them; otherwise a copy of the in-memory frame is returned.
+    """
+    state, matcher = _update_trade_metrics(user_id, method)
+    version = (state.generation, state.watermark_id)
+    db.session.commit()
+
+    with _round_trip_memory_lock:
+        cached = _round_trip_memory.get(user_id)
+        if cached is not None and cached[0] == version:
+            _round_trip_memory.move_to_end(user_id)
+            return cached[1].copy(), matcher.open_positions()
+
+    round_trips = load_round_trips(user_id)
+    with _round_trip_memory_lock:
+        _round_trip_memory[user_id] = (version, round_trips)
+        _round_trip_memory.move_to_end(user_id)
+        while len(_round_trip_memory) > METRICS_MEMORY_USERS:
+            _round_trip_memory.popitem(last=False)
+    return round_trips.copy(), matcher.open_positions()
+
+
+def get_open_positions(user_id: int, method: str = "fifo") -> pd.DataFrame:
+    """The user's open lots, brought up to date like get_trade_metrics but without reading round-trips."""
+    _, matcher = _update_trade_metrics(user_id, method)
+    db.session.commit()
+    return matcher.open_positions()
+
+
+def refresh_trade_metrics(user_id: int, method: str = "fifo") -> None:
+    """Fold new trades into the stored round-trips without reading them back, e.g. before paging through them."""
+    _update_trade_metrics(user_id, method)
+    db.session.commit()
+
+
+def _update_trade_metrics(user_id: int, method: str):
+    """
+    Fold the trades past the watermark into the user's round-trips and lot
+    state. Returns the (still locked) state row and its matcher; the caller
+    commits. The state row is claimed with insert-or-ignore and then locked,
+    so concurrent calls for one user fold each trade in exactly once.
+    """
+    state = _locked_state(user_id, method)
+    if state.method != method:
+        _reset(user_id)
+        state = _locked_state(user_id, method)
+    matcher = LotMatcher.from_state(json.loads(state.lot_state))
+
+    new_trades = load_trade_frame(user_id, after_id=state.watermark_id)
+    if not new_trades.empty:
+        round_trips = matcher.match(new_trades)
+        _insert_round_trips(user_id, round_trips)
+        state.watermark_id = int(new_trades["id"].max())
+        latest = new_trades["activity_date"].max()
+        if pd.notna(latest) and (state.watermark_date is None or latest > state.watermark_date):
+            state.watermark_date = latest.to_pydatetime()
+        state.lot_state = json.dumps(matcher.to_state())
+    return state, matcher
+
+
+def invalidate_trade_metrics(user_id: int, earliest_new_date=None, first_new_id: int = None) -> None:
+    """
+    Called after ingestion commits rows. Trades dated after everything already
+    processed are picked up incrementally; anything dated on or before the
+    watermark could change earlier matches, so the cache is dropped and rebuilt.
+    So is anything with an id at or below the id watermark: on Postgres ids are
+    assigned at insert but become visible at commit, so a slow upload can
+    commit ids lower than ones an analysis has already folded in.
+    """
+    state = _select_state_for_update(user_id)
+    if state is None:
+        return
+    if first_new_id is not None and first_new_id <= state.watermark_id:
+        _reset(user_id)
+    elif state.watermark_date is None:
+        return
+    elif earliest_new_date is None or pd.isna(earliest_new_date) or earliest_new_date <= state.watermark_date:
+        _reset(user_id)
+
+
+def reset_trade_metrics_tables() -> None:
+    """
+    Drop and recreate the round_trips and trade_metrics_state tables, e.g.
+    after a column was added to them. Both only cache what the trades table
+    holds, so every user's round-trips are rebuilt on their next analysis.
+    """
+    tables = [RoundTrip.__table__, TradeMetricsState.__table__]
+    db.metadata.drop_all(db.engine, tables=tables)
+    db.metadata.create_all(db.engine, tables=tables)
+
+
+def load_round_trips(user_id: int, after_trade_id: int = None, limit: int = None) -> pd.DataFrame:
+    """
+    The user's round-trips ordered by TradeID. `after_trade_id`/`limit` give
+    keyset pagination: each page is a range scan of (user_id, trade_id).
+    """
+    columns = [getattr(RoundTrip, col).label(name) for name, col in ROUND_TRIP_FIELDS.items()]
+    stmt = select(*columns).where(RoundTrip.user_id == user_id)
+    if after_trade_id is not None:
+        stmt = stmt.where(RoundTrip.trade_id > after_trade_id)
+    stmt = stmt.order_by(RoundTrip.trade_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return pd.read_sql(stmt, db.session.connection(), parse_dates=["BuyDate", "SellDate"])
+
+
+def load_cluster_state(user_id: int):
+    """The user's stored TradeClusterer state, or None before the first analysis."""
+    row = db.session.get(TradeClusterState, user_id)
+    return json.loads(row.state) if row is not None else None
+
+
+def save_cluster_state(user_id: int, state: dict) -> None:
+    row = db.session.get(TradeClusterState, user_id)
+    if row is None:
+        db.session.add(TradeClusterState(user_id=user_id, state=json.dumps(state)))
+    else:
+        row.state = json.dumps(state)
+    db.session.commit()
+
+
+def _reset(user_id: int) -> None:
+    db.session.execute(delete(RoundTrip).where(RoundTrip.user_id == user_id))
+    state = db.session.get(TradeMetricsState, user_id)
+    if state is not None:
+        db.session.delete(state)
+    db.session.flush()
+
+
+def _insert_ignoring_existing():
+    # A concurrent first call may have created the row already
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(TradeMetricsState.__table__).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(TradeMetricsState.__table__).on_conflict_do_nothing()
+    return TradeMetricsState.__table__.insert()
+
+
+def _select_state_for_update(user_id: int):
+    return db.session.execute(
+        select(TradeMetricsState).where(TradeMetricsState.user_id == user_id)
+        .with_for_update().execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
+def _locked_state(user_id: int, method: str) -> TradeMetricsState:
+    """
+    The user's state row, created empty if missing and locked (SELECT ... FOR
+    UPDATE) until the caller commits. A caller that loses the creation race
+    waits for the winner's commit and then sees its watermark.
+    """
+    state = _select_state_for_update(user_id)
+    if state is None:
+        db.session.execute(_insert_ignoring_existing(), {
+            "user_id": user_id, "method": method, "watermark_id": 0,
+            "lot_state": json.dumps(LotMatcher(method).to_state()),
+        })
+        state = _select_state_for_update(user_id)
+    return state
+
+
+def _insert_round_trips(user_id: int, round_trips: pd.DataFrame) -> None:
+    if round_trips.empty:
+        return
+    frame = round_trips[list(ROUND_TRIP_FIELDS)].rename(columns=ROUND_TRIP_FIELDS)
+    frame = frame.astype(object).where(frame.notna(), None)
+    records = frame.to_dict(orient="records")
+    for record in records:
+        record["user_id"] = user_id
+    db.session.execute(RoundTrip.__table__.insert(), records)
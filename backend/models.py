@@ -1,3 +1,5 @@
+import json
+import uuid
 from datetime import datetime
 from database import db
 
@@ -29,3 +31,109 @@ class Trade(db.Model):
     option_type = db.Column(db.String(10), nullable=True)   
     strike_price = db.Column(db.Float, nullable=True)
     option_expiration = db.Column(db.String(20), nullable=True)
+
+    # Content hash of the row's natural key, used to skip rows on re-upload
+    row_hash = db.Column(db.String(32), nullable=True)
+
+    __table_args__ = (
+        db.Index("ux_trades_user_row_hash", "user_id", "row_hash", unique=True),
+        db.Index("ix_trades_user_activity", "user_id", "activity_date"),
+    )
+
+
+class UploadJob(db.Model):
+    __tablename__ = "upload_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    bytes_total = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_read = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        progress = self.bytes_read / self.bytes_total if self.bytes_total else 0.0
+        return {
+            "upload_id": self.id,
+            "status": self.status,
+            "bytes_total": self.bytes_total,
+            "bytes_read": self.bytes_read,
+            "progress": round(min(progress, 1.0), 4),
+            "rows_written": self.rows_written,
+            "rows_skipped": self.rows_skipped,
+            "error": self.error,
+        }
+
+
+class AnalysisJob(db.Model):
+    __tablename__ = "analysis_jobs"
+
+    # Doubles as the job queue: workers claim "queued" rows with a conditional UPDATE
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    stages = db.Column(db.Text, nullable=False, default="{}")  # JSON: stage -> {status, seconds, result}
+    result = db.Column(db.Text, nullable=True)  # JSON, the /analyze response body
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "analysis_id": self.id,
+            "status": self.status,
+            "stages": json.loads(self.stages or "{}"),
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class RoundTrip(db.Model):
+    __tablename__ = "round_trips"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    trade_id = db.Column(db.Integer, nullable=False)
+    actions = db.Column(db.String(50), nullable=True)  # e.g. "Buy to Open -> Expired"
+    buy_date = db.Column(db.DateTime, nullable=True)
+    sell_date = db.Column(db.DateTime, nullable=True)
+    duration = db.Column(db.Integer, nullable=True)
+    profit = db.Column(db.Float, nullable=True)
+    ticker = db.Column(db.String(100), nullable=True)
+    option_type = db.Column(db.String(10), nullable=True)  # Call/Put; NULL for equities
+    quantity = db.Column(db.Float, nullable=True)
+    buy_price = db.Column(db.Float, nullable=True)
+    sell_price = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_round_trips_user_trade", "user_id", "trade_id"),
+    )
+
+class TradeMetricsState(db.Model):
+    __tablename__ = "trade_metrics_state"
+
+    # Trades with id <= watermark_id have been folded into round_trips / lot_state
+    user_id = db.Column(db.Integer, primary_key=True)
+    method = db.Column(db.String(20), nullable=False)
+    # New for every rebuild, so (generation, watermark_id) identifies the round-trips' contents
+    generation = db.Column(db.String(32), nullable=False, default=lambda: uuid.uuid4().hex)
+    watermark_id = db.Column(db.Integer, nullable=False, default=0)
+    watermark_date = db.Column(db.DateTime, nullable=True)
+    lot_state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TradeClusterState(db.Model):
+    __tablename__ = "trade_cluster_state"
+
+    # The user's last fitted TradeClusterer (k, centroids), used to warm-start the next fit
+    user_id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
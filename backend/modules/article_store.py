@@ -0,0 +1,262 @@
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from modules.sqlite_utils import connect
+
+ARTICLE_STORE_PATH = os.environ.get("ARTICLE_STORE_PATH", "cache/articles.sqlite3")
+# Articles fetched more recently than this are not downloaded again
+ARTICLE_MAX_AGE = float(os.environ.get("ARTICLE_MAX_AGE_SECONDS", 24 * 3600))
+ARTICLE_COLUMNS = ["url", "title", "content_hash", "content", "fetched_at", "sentiment"]
+EMBEDDED_COLUMNS = ["ticker", "url", "title", "content", "fetched_at"]
+UNUSABLE_CONTENT = {"", "No Link", "No readable content", "Failed to retrieve content"}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ArticleStore:
+    """
+    News articles in SQLite, keyed by URL, with the SHA-256 of their text,
+    fetch time, sentiment score and embedding. An article's score and
+    embedding are only (re)computed when its content hash changes, or when
+    the model that produced them changes.
+    """
+
+    def __init__(self, path: str = ARTICLE_STORE_PATH):
+        self.path = path
+        conn = connect(self.path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                "url TEXT PRIMARY KEY, title TEXT, content_hash TEXT NOT NULL, content TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, sentiment REAL, sentiment_model TEXT, "
+                "embedding BLOB, embedding_model TEXT)"
+            )
+            # A URL can turn up in several tickers' searches
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS article_tickers (ticker TEXT NOT NULL, url TEXT NOT NULL, "
+                "PRIMARY KEY (ticker, url)) WITHOUT ROWID"
+            )
+
+    def fresh_urls(self, urls: list, max_age: float = ARTICLE_MAX_AGE) -> set:
+        """The subset of `urls` fetched within the last `max_age` seconds."""
+        cutoff = time.time() - max_age
+        fresh = set()
+        conn = connect(self.path)
+        for chunk in _chunks(list(urls)):
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT url FROM articles WHERE url IN ({placeholders}) AND fetched_at >= ?", (*chunk, cutoff)
+            ).fetchall()
+            fresh.update(url for url, in rows)
+        return fresh
+
+    def link_tickers(self, ticker: str, urls: list) -> None:
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO article_tickers (ticker, url) VALUES (?, ?)", [(ticker, url) for url in urls]
+            )
+
+    def upsert_articles(self, articles: list) -> int:
+        """
+        Store fetched articles ({'Ticker', 'Title', 'Link', 'Content'} dicts). New
+        or changed content clears the stored score and embedding; unchanged
+        content only refreshes fetched_at. Returns the number of new or changed articles.
+        """
+        rows = [
+            (a["Link"], a.get("Title"), content_hash(a["Content"]), a["Content"], time.time())
+            for a in articles if a.get("Link") and a.get("Content") not in UNUSABLE_CONTENT
+        ]
+        if not rows:
+            return 0
+        conn = connect(self.path)
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO articles (url, title, content_hash, content, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET title = excluded.title, content_hash = excluded.content_hash, "
+                "content = excluded.content, fetched_at = excluded.fetched_at, "
+                "sentiment = NULL, sentiment_model = NULL, embedding = NULL, embedding_model = NULL "
+                "WHERE articles.content_hash != excluded.content_hash",
+                rows,
+            )
+            changed = conn.total_changes - before
+            conn.executemany(
+                "UPDATE articles SET fetched_at = ? WHERE url = ?", [(row[4], row[0]) for row in rows]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO article_tickers (ticker, url) VALUES (?, ?)",
+                [(a["Ticker"], a["Link"]) for a in articles if a.get("Ticker") and a.get("Link")],
+            )
+        return changed
+
+    def unscored(self, model: str) -> pd.DataFrame:
+        """(url, content) of articles without a score from `model`."""
+        return pd.read_sql_query(
+            "SELECT url, content FROM articles WHERE sentiment IS NULL OR sentiment_model IS NOT ?",
+            connect(self.path), params=(model,),
+        )
+
+    def set_sentiments(self, scores: dict, model: str) -> None:
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(
+                "UPDATE articles SET sentiment = ?, sentiment_model = ? WHERE url = ?",
+                [(float(score), model, url) for url, score in scores.items()],
+            )
+
+    def unembedded(self, model: str) -> pd.DataFrame:
+        """(url, content) of articles without an embedding from `model`."""
+        return pd.read_sql_query(
+            "SELECT url, content FROM articles WHERE embedding IS NULL OR embedding_model IS NOT ?",
+            connect(self.path), params=(model,),
+        )
+
+    def set_embeddings(self, embeddings: dict, model: str) -> None:
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(
+                "UPDATE articles SET embedding = ?, embedding_model = ? WHERE url = ?",
+                [(np.asarray(vec, dtype=np.float32).tobytes(), model, url) for url, vec in embeddings.items()],
+            )
+
+    def embedded_hashes(self, model: str) -> dict:
+        """{url: content_hash} of articles with a stored embedding from `model`."""
+        rows = connect(self.path).execute(
+            "SELECT url, content_hash FROM articles WHERE embedding IS NOT NULL AND embedding_model = ?", (model,)
+        ).fetchall()
+        return dict(rows)
+
+    def embedded_articles(self, model: str, urls: list):
+        """
+        (metadata frame, float32 matrix) for the given URLs' `model` embeddings:
+        one row per ticker/article with ticker, url, title, content and fetched_at.
+        """
+        frames, vectors = [], []
+        conn = connect(self.path)
+        for chunk in _chunks(list(urls)):
+            rows = conn.execute(
+                "SELECT t.ticker, a.url, a.title, a.content, a.fetched_at, a.embedding FROM article_tickers t "
+                f"JOIN articles a ON a.url = t.url WHERE a.url IN ({','.join('?' * len(chunk))}) "
+                "AND a.embedding IS NOT NULL AND a.embedding_model = ?",
+                (*chunk, model),
+            ).fetchall()
+            frames.append(pd.DataFrame([row[:5] for row in rows], columns=EMBEDDED_COLUMNS))
+            vectors.extend(np.frombuffer(row[5], dtype=np.float32) for row in rows)
+        metadata = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=EMBEDDED_COLUMNS)
+        matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        return metadata, matrix
+
+    def articles(self, tickers: list, since: float = None) -> pd.DataFrame:
+        """Stored articles for the tickers (one row per ticker/article), newest first."""
+        if not tickers:
+            return pd.DataFrame(columns=["ticker"] + ARTICLE_COLUMNS)
+        sql = (
+            f"SELECT t.ticker, {', '.join('a.' + c for c in ARTICLE_COLUMNS)} FROM article_tickers t "
+            f"JOIN articles a ON a.url = t.url WHERE t.ticker IN ({','.join('?' * len(tickers))})"
+        )
+        params = list(tickers)
+        if since is not None:
+            sql += " AND a.fetched_at >= ?"
+            params.append(since)
+        return pd.read_sql_query(sql + " ORDER BY a.fetched_at DESC", connect(self.path), params=params)
+
+    def sentiment_by_ticker(self, tickers: list, model: str, since: float = None) -> dict:
+        """Mean stored sentiment (scored by `model`) per ticker; tickers with no scored articles are left out."""
+        if not tickers:
+            return {}
+        sql = (
+            "SELECT t.ticker, AVG(a.sentiment) FROM article_tickers t JOIN articles a ON a.url = t.url "
+            f"WHERE t.ticker IN ({','.join('?' * len(tickers))}) AND a.sentiment_model = ?"
+        )
+        params = [*tickers, model]
+        if since is not None:
+            sql += " AND a.fetched_at >= ?"
+            params.append(since)
+        rows = connect(self.path).execute(sql + " GROUP BY t.ticker", params).fetchall()
+        return {ticker: float(score) for ticker, score in rows}
+
+
+def get_article_store() -> ArticleStore:
+    """Thread-safe lazy singleton for the shared article store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArticleStore()
+    return _store
+
+
+def sentiment_model_id() -> str:
+    """Identifies the FinBERT weights and backend that produced a stored score."""
+    from modules import sentiment
+    return sentiment.model_id()
+
+
+def refresh_articles(store: ArticleStore, tickers: list, news_count: int = 20, search=None,
+                     score=None, embed=None, embed_model: str = None, max_age: float = ARTICLE_MAX_AGE) -> dict:
+    """
+    Incremental refresh: search news for the tickers, fetch only articles not
+    fetched within `max_age`, then score and embed only articles whose content
+    is new or changed. `score(texts) -> scores` defaults to the FinBERT batch
+    scorer; `embed(texts) -> matrix` is optional and skipped when omitted.
+    """
+    from modules import market_data, sentiment
+
+    search = search or market_data.search_news
+    score = score or sentiment.get_sentiment_batch
+    sentiment_model = sentiment_model_id()
+
+    def search_new(ticker, count):
+        # Record every ticker/URL pair, but only hand back links that need fetching
+        results = search(ticker, count)
+        links = [a["link"] for a in results if a.get("link")]
+        store.link_tickers(ticker, links)
+        fresh = store.fresh_urls(links, max_age)
+        return [a for a in results if a.get("link") not in fresh]
+
+    fetched = list(market_data.iter_news_articles(tickers, news_count=news_count, search=search_new))
+    changed = store.upsert_articles(fetched)
+
+    pending = store.unscored(sentiment_model)
+    if not pending.empty:
+        store.set_sentiments(dict(zip(pending["url"], score(pending["content"].tolist()))), sentiment_model)
+
+    embedded = 0
+    if embed is not None:
+        pending_embed = store.unembedded(embed_model)
+        if not pending_embed.empty:
+            vectors = embed(pending_embed["content"].tolist())
+            store.set_embeddings(dict(zip(pending_embed["url"], vectors)), embed_model)
+            embedded = len(pending_embed)
+
+    return {"fetched": len(fetched), "changed": changed, "scored": len(pending), "embedded": embedded}
+
+
+def _chunks(items: list, size: int = 500):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch, score and store news for the given tickers")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--news-count", type=int, default=20)
+    parser.add_argument("--no-embed", action="store_true", help="skip sentence-transformer embeddings")
+    args = parser.parse_args()
+
+    embed_options = {}
+    if not args.no_embed:
+        from modules.retrieval import EMBEDDING_MODEL, embed_texts
+        embed_options = {"embed": embed_texts, "embed_model": EMBEDDING_MODEL}
+    print(refresh_articles(get_article_store(), args.tickers, news_count=args.news_count, **embed_options))
@@ -0,0 +1,187 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Fixed-size prompt context: aggregates, the top tickers and a few outliers instead of every trade
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 768))
+CONTEXT_TOP_TICKERS = int(os.environ.get("CONTEXT_TOP_TICKERS", 8))
+CONTEXT_OUTLIERS = int(os.environ.get("CONTEXT_OUTLIERS", 3))
+
+# Approximates a Llama-style BPE tokenizer: words, digits in groups of up to three, single symbols
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """Estimated prompt tokens for `text`; no tokenizer download needed."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def summarize_context(trade_metrics: pd.DataFrame, pattern_analysis: dict, market_data: dict, sentiment: dict,
+                      open_positions: pd.DataFrame = None, top_n: int = CONTEXT_TOP_TICKERS,
+                      n_outliers: int = CONTEXT_OUTLIERS) -> dict:
+    """
+    Reduce the round-trips, cluster summary, market data and sentiment to a
+    summary whose size does not depend on the number of trades: overall stats,
+    one row per cluster, the `top_n` tickers by absolute P&L and the
+    `n_outliers` largest wins and losses.
+    """
+    trades = trade_metrics.dropna(subset=["Profit"]) if "Profit" in trade_metrics.columns else trade_metrics.iloc[0:0]
+    profit = trades["Profit"].astype(float) if len(trades) else pd.Series(dtype=float)
+    duration = trades["Duration"].astype(float) if len(trades) else pd.Series(dtype=float)
+    open_lots = (
+        open_positions.groupby("Ticker").size()
+        if open_positions is not None and not open_positions.empty else pd.Series(dtype=int)
+    )
+
+    overview = {
+        "round_trips": int(len(trades)),
+        "total_pnl": float(profit.sum()),
+        "win_rate": float((profit > 0).mean()) if len(profit) else None,
+        "avg_win": float(profit[profit > 0].mean()) if (profit > 0).any() else None,
+        "avg_loss": float(profit[profit < 0].mean()) if (profit < 0).any() else None,
+        "median_hold_days": float(duration.median()) if len(duration) else None,
+        "open_lots": int(open_lots.sum()),
+    }
+
+    clusters = []
+    cluster_stats = pattern_analysis.get("clusters") or {}
+    for cluster, count in (cluster_stats.get("Profit_count") or {}).items():
+        clusters.append({
+            "cluster": int(cluster),
+            "trades": int(count),
+            "avg_hold_days": float(cluster_stats.get("Duration_mean", {}).get(cluster, np.nan)),
+            "avg_pnl": float(cluster_stats.get("Profit_mean", {}).get(cluster, np.nan)),
+            "win_rate": cluster_stats.get("Win_mean", {}).get(cluster),
+        })
+
+    by_ticker = pd.DataFrame(index=pd.Index(sorted(set(market_data) | set(sentiment) | set(open_lots.index)),
+                                            name="Ticker"))
+    if len(trades):
+        grouped = trades.assign(Win=profit > 0).groupby("Ticker")
+        by_ticker = by_ticker.join(
+            grouped.agg(trades=("Profit", "size"), pnl=("Profit", "sum"), win_rate=("Win", "mean"),
+                        avg_hold_days=("Duration", "mean")),
+            how="outer",
+        )
+    by_ticker = by_ticker.reindex(columns=["trades", "pnl", "win_rate", "avg_hold_days"])
+    by_ticker["trades"] = by_ticker["trades"].fillna(0)
+    by_ticker["pnl"] = by_ticker["pnl"].fillna(0.0)
+    ranked = by_ticker.assign(rank=by_ticker["pnl"].abs()).sort_values(["rank", "trades"], ascending=False)
+
+    tickers = []
+    for ticker, row in ranked.head(top_n).iterrows():
+        quote = market_data.get(ticker) or {}
+        tickers.append({
+            "ticker": ticker,
+            "trades": int(row["trades"]),
+            "pnl": float(row["pnl"]),
+            "win_rate": None if pd.isna(row["win_rate"]) else float(row["win_rate"]),
+            "avg_hold_days": None if pd.isna(row["avg_hold_days"]) else float(row["avg_hold_days"]),
+            "open_lots": int(open_lots.get(ticker, 0)),
+            "recent_close": quote.get("recent_close"),
+            "sentiment": sentiment.get(ticker),
+        })
+    rest = ranked.iloc[top_n:]
+    others = {"tickers": int(len(rest)), "trades": int(rest["trades"].sum()), "pnl": float(rest["pnl"].sum())}
+
+    outliers = []
+    if len(trades) and n_outliers:
+        extremes = pd.concat([profit.nlargest(n_outliers), profit.nsmallest(n_outliers)])
+        extremes = extremes[~extremes.index.duplicated()]
+        for idx in extremes.abs().sort_values(ascending=False).index:
+            row = trades.loc[idx]
+            outliers.append({
+                "ticker": row["Ticker"],
+                "sell_date": str(pd.Timestamp(row["SellDate"]).date()) if pd.notna(row.get("SellDate")) else None,
+                "hold_days": float(row["Duration"]),
+                "pnl": float(row["Profit"]),
+            })
+
+    return {"overview": overview, "clusters": clusters, "tickers": tickers, "others": others, "outliers": outliers}
+
+
+def render_context(summary: dict, token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Render a summary as compact prompt text within `token_budget` tokens.
+    The overview always goes in; other lines are admitted by priority
+    (clusters, the three best-ranked tickers, outliers, remaining tickers)
+    and skipped once they no longer fit.
+    """
+    overview = summary["overview"]
+    header = (
+        f"Overview: {overview['round_trips']} round-trips, total P&L {_money(overview['total_pnl'])}, "
+        f"win rate {_pct(overview['win_rate'])}, avg win {_money(overview['avg_win'])}, "
+        f"avg loss {_money(overview['avg_loss'])}, median hold {_num(overview['median_hold_days'])}d, "
+        f"{overview['open_lots']} open lots."
+    )
+    cluster_lines = [
+        f"- cluster {c['cluster']}: {c['trades']} trades, avg hold {_num(c['avg_hold_days'])}d, "
+        f"avg P&L {_money(c['avg_pnl'])}, win {_pct(c['win_rate'])}"
+        for c in summary["clusters"]
+    ]
+    ticker_lines = [
+        f"- {t['ticker']}: {t['trades']} trades, P&L {_money(t['pnl'])}, win {_pct(t['win_rate'])}, "
+        f"hold {_num(t['avg_hold_days'])}d, open {t['open_lots']}, close {_price(t['recent_close'])}, "
+        f"sentiment {_num(t['sentiment'], 2)}"
+        for t in summary["tickers"]
+    ]
+    others = summary["others"]
+    if others["tickers"]:
+        ticker_lines.append(
+            f"- {others['tickers']} other tickers: {others['trades']} trades, P&L {_money(others['pnl'])}"
+        )
+    outlier_lines = [
+        f"- {o['ticker']} closed {o['sell_date']}: {_money(o['pnl'])} after {_num(o['hold_days'])}d"
+        for o in summary["outliers"]
+    ]
+
+    sections = [("Clusters (hold days vs P&L):", cluster_lines), ("Tickers by |P&L|:", ticker_lines),
+                ("Largest wins/losses:", outlier_lines)]
+    # Priority order in which lines claim the budget: the best-ranked tickers before the outliers
+    priority = [(1, i) for i in range(len(cluster_lines))] + [(2, i) for i in range(min(3, len(ticker_lines)))] \
+        + [(3, i) for i in range(len(outlier_lines))] + [(2, i) for i in range(3, len(ticker_lines))]
+
+    used = count_tokens(header)
+    admitted = set()
+    for section, i in priority:
+        title, lines = sections[section - 1]
+        cost = count_tokens(lines[i]) + (0 if any(s == section for s, _ in admitted) else count_tokens(title))
+        if used + cost <= token_budget:
+            admitted.add((section, i))
+            used += cost
+
+    parts = [header]
+    for section, (title, lines) in enumerate(sections, start=1):
+        kept = [line for i, line in enumerate(lines) if (section, i) in admitted]
+        if kept:
+            parts.append(title)
+            parts.extend(kept)
+    return "\n".join(parts)
+
+
+def build_context(trade_metrics: pd.DataFrame, pattern_analysis: dict, market_data: dict, sentiment: dict,
+                  open_positions: pd.DataFrame = None, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """Returns (summary, context text, estimated token count)."""
+    summary = summarize_context(trade_metrics, pattern_analysis, market_data, sentiment, open_positions)
+    text = render_context(summary, token_budget)
+    return summary, text, count_tokens(text)
+
+
+def _num(value, digits: int = 1) -> str:
+    return "n/a" if value is None or pd.isna(value) else f"{value:,.{digits}f}"
+
+
+def _money(value) -> str:
+    if value is None or pd.isna(value):
+        return "n/a"
+    amount = f"{abs(value):,.0f}" if abs(value) >= 100 else f"{abs(value):.2f}"
+    return f"-${amount}" if value < 0 else f"${amount}"
+
+
+def _price(value) -> str:
+    return "n/a" if value is None or pd.isna(value) else f"${value:,.2f}"
+
+
+def _pct(value) -> str:
+    return "n/a" if value is None or pd.isna(value) else f"{value:.0%}"
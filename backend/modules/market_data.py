@@ -1,77 +1,179 @@
-import yfinance as yf
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 import os
-import requests_cache
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
 
-# Enable caching for HTTP requests to avoid redundant network calls
-session = requests_cache.CachedSession('news_cache', expire_after=1800)  # Cache expires in 30 minutes
+# Article fetching: total worker threads, concurrent requests per host, and retry policy
+NEWS_MAX_WORKERS = int(os.environ.get("NEWS_MAX_WORKERS", 16))
+NEWS_PER_HOST_LIMIT = int(os.environ.get("NEWS_PER_HOST_LIMIT", 4))
+NEWS_TIMEOUT = float(os.environ.get("NEWS_TIMEOUT", 10))
+NEWS_RETRIES = int(os.environ.get("NEWS_RETRIES", 2))
+NEWS_RETRY_BACKOFF = float(os.environ.get("NEWS_RETRY_BACKOFF", 0.5))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+FAILED_CONTENT = "Failed to retrieve content"
 
-def get_stock_data(ticker, start_date, end_date):
-    """Collect stock data using yfinance with detailed logging."""
-    print(f"Downloading stock data for {ticker}...")
+# yfinance, requests_cache and lxml are imported where they are used so
+# importing this module (and the Flask app) stays cheap.
+_session = None
+_session_lock = threading.Lock()
+_price_store = None
+_host_limits = defaultdict(lambda: threading.BoundedSemaphore(NEWS_PER_HOST_LIMIT))
+_host_limits_lock = threading.Lock()
+
+
+def get_http_session():
+    """Thread-safe lazy singleton for the cached HTTP session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests_cache
+                from requests.adapters import HTTPAdapter
+                # Enable caching for HTTP requests to avoid redundant network calls
+                session = requests_cache.CachedSession('news_cache', expire_after=1800)  # Cache expires in 30 minutes
+                # Size the connection pools for the article fetch workers
+                adapter = HTTPAdapter(pool_connections=NEWS_MAX_WORKERS, pool_maxsize=NEWS_MAX_WORKERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def get_price_store():
+    """Thread-safe lazy singleton for the local OHLCV store."""
+    global _price_store
+    if _price_store is None:
+        with _session_lock:
+            if _price_store is None:
+                from modules.price_store import PriceStore
+                _price_store = PriceStore()
+    return _price_store
+
+def get_price_history(tickers, start_date, end_date):
+    """
+    Daily OHLCV for several tickers as one long frame (ticker, date, open, ...).
+    Served from the local price store; only missing date ranges are downloaded,
+    in one batched call per range.
+    """
     try:
-        stock_data = yf.download(ticker, start=start_date, end=end_date)
-        stock_data = stock_data.reset_index()
-        print(f"Successfully downloaded {len(stock_data)} data points for {ticker}")
-        return stock_data
+        return get_price_store().get_history(tickers, start_date, end_date)
     except Exception as e:
-        print(f"Error downloading data for {ticker}: {e}")
-        return pd.DataFrame()
+        print(f"Error loading price history for {list(tickers)}: {e}")
+        from modules.price_store import HISTORY_COLUMNS
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
 
-def get_news_data(tickers, news_count=20, save_dir="news_articles"):
-    """Retrieve news for multiple tickers using multithreading and optimized file writing."""
-    
-    os.makedirs(save_dir, exist_ok=True)  # Ensure directory exists
-    all_news = []  # Store all news data
+def get_stock_data(ticker, start_date, end_date):
+    """Collect stock data for one ticker (yfinance-style columns) via the price store."""
+    print(f"Loading stock data for {ticker}...")
+    history = get_price_history([ticker], start_date, end_date)
+    stock_data = history.drop(columns="ticker").rename(columns={
+        "date": "Date", "open": "Open", "high": "High", "low": "Low",
+        "close": "Close", "adj_close": "Adj Close", "volume": "Volume",
+    })
+    print(f"Loaded {len(stock_data)} data points for {ticker}")
+    return stock_data
+
+def search_news(ticker, news_count=20):
+    """Article metadata ({'title', 'link'}) for a ticker from Yahoo Finance search."""
+    import yfinance as yf
+    return yf.Search(ticker, news_count=news_count).news or []
 
-    def process_ticker(ticker):
-        """Fetch news for a single ticker and save articles efficiently."""
-        print(f"Fetching news for {ticker}...")
+def iter_news_articles(tickers, news_count=20, search=search_news, max_workers=NEWS_MAX_WORKERS):
+    """
+    Search news for every ticker and fetch all of the articles on one bounded
+    thread pool, yielding {'Ticker', 'Title', 'Link', 'Content'} dicts as each
+    article completes. Fetches are limited per host (NEWS_PER_HOST_LIMIT) and
+    retried on timeouts and transient errors. `search(ticker, news_count)`
+    returns the article metadata and can be swapped out, e.g. for a local stand-in.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # future -> ("search", ticker) or ("article", ticker, title, link)
+        pending = {executor.submit(search, ticker, news_count): ("search", ticker) for ticker in tickers}
         try:
-            news_data = yf.Search(ticker, news_count=news_count).news
-            if news_data:
-                all_articles = []  # Collect articles for batch writing
-                for article in news_data:
-                    title = article.get('title', 'No Title')
-                    link = article.get('link', '')
-                    article_text = extract_article_text(link) if link else "No Link"
-                    
-                    if article_text and article_text != "Failed to retrieve content":
-                        all_articles.append(article_text)
-
-                    all_news.append({'Ticker': ticker, 'Title': title, 'Link': link, 'Content': article_text})
-
-                # Batch write articles for this ticker
-                if all_articles:
-                    save_article_text(ticker, all_articles, save_dir)
-        except Exception as e:
-            print(f"Error fetching news for {ticker}: {e}")
-
-    # Use multithreading to speed up fetching news for multiple tickers
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        executor.map(process_ticker, tickers)
-
-    df_news = pd.DataFrame(all_news)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, ticker, *meta = pending.pop(future)
+                    if kind == "article":
+                        title, link = meta
+                        yield {'Ticker': ticker, 'Title': title, 'Link': link, 'Content': future.result()}
+                        continue
+
+                    print(f"Fetching news for {ticker}...")
+                    try:
+                        news_data = future.result()
+                    except Exception as e:
+                        print(f"Error fetching news for {ticker}: {e}")
+                        continue
+                    for article in news_data:
+                        title = article.get('title', 'No Title')
+                        link = article.get('link', '')
+                        if link:
+                            pending[executor.submit(extract_article_text, link)] = ("article", ticker, title, link)
+                        else:
+                            yield {'Ticker': ticker, 'Title': title, 'Link': link, 'Content': "No Link"}
+        finally:
+            # A consumer that stops early cancels the fetches that have not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def get_news_data(tickers, news_count=20, save_dir="news_articles", search=search_news):
+    """Retrieve news for multiple tickers concurrently and save each ticker's articles in one write."""
+    os.makedirs(save_dir, exist_ok=True)  # Ensure directory exists
+    all_news = list(iter_news_articles(tickers, news_count=news_count, search=search))
+
+    articles_by_ticker = defaultdict(list)
+    for item in all_news:
+        if item['Content'] and item['Content'] not in (FAILED_CONTENT, "No Link"):
+            articles_by_ticker[item['Ticker']].append(item['Content'])
+    for ticker, articles in articles_by_ticker.items():
+        save_article_text(ticker, articles, save_dir)
+
+    df_news = pd.DataFrame(all_news, columns=['Ticker', 'Title', 'Link', 'Content'])
     print(df_news.head())
     return df_news
 
+def _host_limit(url):
+    with _host_limits_lock:
+        return _host_limits[urlsplit(url).netloc]
+
+def fetch_article_html(url):
+    """GET an article, holding its host's slot and retrying timeouts, connection errors and 429/5xx."""
+    import requests
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    for attempt in range(NEWS_RETRIES + 1):
+        try:
+            with _host_limit(url):
+                response = get_http_session().get(url, headers=headers, timeout=NEWS_TIMEOUT)
+            if response.status_code in RETRY_STATUS_CODES and attempt < NEWS_RETRIES:
+                raise requests.HTTPError(f"{response.status_code} for {url}", response=response)
+            response.raise_for_status()  # Raise error for bad responses (4xx, 5xx)
+            return response.text
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = e.response.status_code if getattr(e, "response", None) is not None else None
+            if attempt == NEWS_RETRIES or (status is not None and status not in RETRY_STATUS_CODES):
+                raise
+            time.sleep(NEWS_RETRY_BACKOFF * 2 ** attempt)
+
+def parse_article_html(html):
+    """Join the text of every <p> in an HTML page."""
+    import lxml.html
+    from lxml.etree import ParserError
+    try:
+        doc = lxml.html.fromstring(html)
+    except ParserError:
+        return ""
+    return ' '.join(p.text_content() for p in doc.iter('p'))
+
 def extract_article_text(url):
     """Extract text content from a given news article using caching."""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = session.get(url, headers=headers)
-        response.raise_for_status()  # Raise error for bad responses (4xx, 5xx)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        paragraphs = soup.find_all('p')
-        article_text = ' '.join([para.get_text() for para in paragraphs])
+        article_text = parse_article_html(fetch_article_html(url))
         return article_text if article_text else "No readable content"
     except Exception as e:
         print(f"Error extracting article from {url}: {e}")
-        return "Failed to retrieve content"
+        return FAILED_CONTENT
 
 def save_article_text(ticker, articles, save_dir):
     """Save all articles for a ticker in a single write operation."""
@@ -79,6 +181,8 @@ def save_article_text(ticker, articles, save_dir):
     with open(file_path, "w", encoding="utf-8") as f:  # Open once for batch write
         f.write("\n\n".join(articles) + "\n\n" + "="*80 + "\n\n")
 
-# Example Usage
-tickers = ["AAPL", "GOOGL", "MSFT"]
-news_df = get_news_data(tickers)
+if __name__ == "__main__":
+    # Example Usage
+    tickers = ["AAPL", "GOOGL", "MSFT"]
+    news_df = get_news_data(tickers)
+
@@ -0,0 +1,330 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+from modules.preprocessing import CONTRACT_MULTIPLIER
+
+# Continuously compounded rate used for pricing and for implied volatility
+RISK_FREE_RATE = float(os.environ.get("RISK_FREE_RATE", 0.04))
+# Implied volatility search bracket, price tolerance (per share) and iteration cap
+IV_MIN = 1e-4
+IV_MAX = 5.0
+IV_TOLERANCE = 1e-6
+IV_MAX_ITERATIONS = 64
+# Below this vega (price change per share per unit of volatility) the premium can't pin the volatility down
+IV_MIN_VEGA = 1e-3
+# Options are assumed to expire at the close, so a trade on expiration day still has part of a day left
+MIN_DAYS_TO_EXPIRY = 0.25
+
+OPTION_ACTIONS = {"Buy to Open", "Sell to Close"}
+# Trade frame columns (see trade_queries.load_trade_frame) the per-trade analytics read
+OPTION_TRADE_COLUMNS = ["id", "activity_date", "parsed_action", "price", "quantity", "amount", "ticker",
+                        "option_type", "strike_price", "option_expiration"]
+GREEKS = ["delta", "gamma", "vega", "theta"]
+EXPOSURE_FIELDS = ["contracts", "market_value", "delta_shares", "dollar_delta", "gamma_shares", "vega", "theta"]
+
+
+def _d1_d2(S, K, T, sigma, r):
+    vol_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def _pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def _price(S, discount, d1, d2, is_call):
+    return np.where(is_call, S * ndtr(d1) - discount * ndtr(d2), discount * ndtr(-d2) - S * ndtr(-d1))
+
+
+def black_scholes_greeks(S, K, T, sigma, is_call, r: float = RISK_FREE_RATE) -> dict:
+    """
+    European Black-Scholes price and greeks per share, elementwise over
+    NumPy arrays: delta, gamma (per $1 of underlying), vega (per volatility
+    point) and theta (per calendar day).
+    """
+    d1, d2 = _d1_d2(S, K, T, sigma, r)
+    discount = K * np.exp(-r * T)
+    pdf = _pdf(d1)
+    sqrt_t = np.sqrt(T)
+    decay = -S * pdf * sigma / (2.0 * sqrt_t)
+    return {
+        "price": _price(S, discount, d1, d2, is_call),
+        "delta": np.where(is_call, ndtr(d1), ndtr(d1) - 1.0),
+        "gamma": pdf / (S * sigma * sqrt_t),
+        "vega": S * pdf * sqrt_t / 100.0,
+        "theta": np.where(is_call, decay - r * discount * ndtr(d2), decay + r * discount * ndtr(-d2)) / 365.0,
+    }
+
+
+def implied_volatility(price, S, K, T, is_call, r: float = RISK_FREE_RATE,
+                       tolerance: float = IV_TOLERANCE, max_iterations: int = IV_MAX_ITERATIONS) -> np.ndarray:
+    """
+    Black-Scholes implied volatility for whole arrays at once: Newton steps
+    on vega, falling back to bisection whenever a step leaves the bracket
+    that the previous iterations have established. Each iteration only
+    evaluates the rows that have not converged yet.
+
+    NaN where there is no solution: premiums outside the no-arbitrage bounds
+    (e.g. below intrinsic value, which happens when the underlying's close
+    differs from the price at the time of the fill), non-positive inputs,
+    premiums that vega is too small to pin down, solutions at the edge of the
+    search bracket, or rows that don't converge.
+    """
+    price, S, K, T, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(is_call, dtype=bool),
+    )
+    iv = np.full(price.shape, np.nan)
+    with np.errstate(invalid="ignore"):
+        discount = K * np.exp(-r * T)
+        lower = np.where(is_call, np.maximum(S - discount, 0.0), np.maximum(discount - S, 0.0))
+        upper = np.where(is_call, S, discount)
+        solvable = (S > 0) & (K > 0) & (T > 0) & (price > lower) & (price < upper)
+    rows = np.flatnonzero(solvable)
+    if len(rows) == 0:
+        return iv
+
+    p, s, k, t, call = price[rows], S[rows], K[rows], T[rows], is_call[rows]
+    # Brenner-Subrahmanyam starting point, clipped into the bracket
+    sigma = np.clip(np.sqrt(2.0 * np.pi / t) * p / s, 0.05, 2.0)
+    lo = np.full(len(rows), IV_MIN)
+    hi = np.full(len(rows), IV_MAX)
+    active = np.arange(len(rows))
+    for _ in range(max_iterations):
+        a_s, a_k, a_t, a_sigma = s[active], k[active], t[active], sigma[active]
+        d1, d2 = _d1_d2(a_s, a_k, a_t, a_sigma, r)
+        a_discount = a_k * np.exp(-r * a_t)
+        value = _price(a_s, a_discount, d1, d2, call[active])
+        vega = a_s * _pdf(d1) * np.sqrt(a_t)
+        diff = value - p[active]
+
+        # Price increases with volatility, so the sign of the error narrows the bracket
+        a_lo = np.where(diff < 0, a_sigma, lo[active])
+        a_hi = np.where(diff > 0, a_sigma, hi[active])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = a_sigma - diff / vega
+        bisect = ~np.isfinite(step) | (step <= a_lo) | (step >= a_hi)
+        lo[active], hi[active] = a_lo, a_hi
+        sigma[active] = np.where(bisect, 0.5 * (a_lo + a_hi), step)
+
+        converged = (np.abs(diff) < tolerance) | (a_hi - a_lo < tolerance * 1e-2)
+        sigma[active[converged]] = a_sigma[converged]
+        active = active[~converged]
+        if len(active) == 0:
+            break
+    sigma[active] = np.nan
+    # A premium no volatility inside the bracket reproduces ends up pinned to its edge, and one the model
+    # price barely moves for (vega ~ 0: far out of the money or about to expire) matches any volatility
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d1, _ = _d1_d2(s, k, t, sigma, r)
+        flat = s * _pdf(d1) * np.sqrt(t) < IV_MIN_VEGA
+    sigma[(sigma <= IV_MIN + tolerance) | (sigma >= IV_MAX - tolerance) | flat] = np.nan
+    iv[rows] = sigma
+    return iv
+
+
+def option_trade_analytics(trades: pd.DataFrame, price_history: pd.DataFrame,
+                           r: float = RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    Implied volatility and greeks (per contract, at the fill) for every
+    option trade in a trade frame (load_trade_frame columns). The underlying
+    is the last close on or before the trade date, found for all tickers in
+    one merge_asof.
+    """
+    options = _option_trades(trades)
+    if options.empty:
+        return options
+    options = _with_underlying(options, price_history, "activity_date")
+    is_call = (options["option_type"] == "Call").to_numpy()
+    S = options["underlying"].to_numpy(dtype=float)
+    K = options["strike_price"].to_numpy(dtype=float)
+    T = _years_to_expiry(options["expiration"], options["activity_date"])
+    iv = implied_volatility(options["price"].to_numpy(dtype=float), S, K, T, is_call, r)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        greeks = black_scholes_greeks(S, K, T, iv, is_call, r)
+    options["days_to_expiry"] = T * 365.0
+    options["moneyness"] = S / K
+    options["iv"] = iv
+    for name in GREEKS:
+        options[name] = greeks[name] * (CONTRACT_MULTIPLIER if name != "delta" else 1.0)
+    return options
+
+
+def option_exposure(open_positions: pd.DataFrame, trade_analytics: pd.DataFrame, price_history: pd.DataFrame,
+                    as_of=None, r: float = RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    Greeks exposure of the unexpired open option lots at `as_of` (default:
+    the last price date). Each contract is priced at the implied volatility
+    of its most recent trade, or its ticker's median implied volatility when
+    that trade had none. Exposures are signed position totals in dollars
+    and shares (contracts x 100).
+    """
+    if open_positions is None or open_positions.empty or "OptionType" not in open_positions.columns:
+        return pd.DataFrame()
+    lots = open_positions[open_positions["OptionType"].isin(["Call", "Put"])].copy()
+    if lots.empty:
+        return pd.DataFrame()
+    lots["expiration"] = _parse_expiration(lots["Expiration"])
+    prices = price_history if price_history is not None else pd.DataFrame(columns=["ticker", "date", "close"])
+    if as_of is None:
+        as_of = pd.to_datetime(prices["date"]).max() if not prices.empty else pd.Timestamp.today()
+    as_of = pd.Timestamp(as_of).normalize()
+    lots = lots[lots["expiration"] >= as_of]
+    if lots.empty:
+        return pd.DataFrame()
+    lots = _with_underlying(lots.rename(columns={"Ticker": "ticker"}).assign(as_of=as_of), prices, "as_of")
+
+    # Latest implied volatility per contract, then per ticker as a fallback
+    contract = ["ticker", "option_type", "strike_price", "expiration"]
+    if trade_analytics is not None and not trade_analytics.empty:
+        latest = trade_analytics.dropna(subset=["iv"]).sort_values("activity_date", kind="stable")
+        contract_iv = latest.groupby(contract)["iv"].last().rename("iv")
+        ticker_iv = latest.groupby("ticker")["iv"].median().rename("ticker_iv")
+    else:
+        contract_iv = pd.Series(dtype=float, name="iv")
+        ticker_iv = pd.Series(dtype=float, name="ticker_iv")
+    lots = lots.rename(columns={"OptionType": "option_type", "Strike": "strike_price"})
+    lots["strike_price"] = pd.to_numeric(lots["strike_price"], errors="coerce")
+    lots = lots.join(contract_iv, on=contract).join(ticker_iv, on="ticker")
+    sigma = lots["iv"].fillna(lots["ticker_iv"]).to_numpy(dtype=float)
+
+    is_call = (lots["option_type"] == "Call").to_numpy()
+    S = lots["underlying"].to_numpy(dtype=float)
+    K = lots["strike_price"].to_numpy(dtype=float)
+    T = _years_to_expiry(lots["expiration"], lots["as_of"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        greeks = black_scholes_greeks(S, K, T, sigma, is_call, r)
+    shares = pd.to_numeric(lots["Quantity"], errors="coerce").to_numpy(dtype=float) * CONTRACT_MULTIPLIER
+    return pd.DataFrame({
+        "ticker": lots["ticker"].to_numpy(dtype=object),
+        "expiration": lots["expiration"].to_numpy(),
+        "option_type": lots["option_type"].to_numpy(dtype=object),
+        "strike_price": K,
+        "underlying": S,
+        "iv": sigma,
+        "contracts": shares / CONTRACT_MULTIPLIER,
+        "market_value": shares * greeks["price"],
+        "delta_shares": shares * greeks["delta"],
+        "dollar_delta": shares * greeks["delta"] * S,
+        "gamma_shares": shares * greeks["gamma"],
+        "vega": shares * greeks["vega"],
+        "theta": shares * greeks["theta"],
+    })
+
+
+def options_analytics(trades: pd.DataFrame, open_positions: pd.DataFrame, price_history: pd.DataFrame,
+                      as_of=None, include_trades: bool = False, r: float = RISK_FREE_RATE) -> dict:
+    """
+    Per-trade implied volatility and greeks, implied volatility by ticker,
+    and the open option book's exposure per (expiration, ticker) with
+    rollups per expiration and per ticker. `include_trades` adds the
+    per-trade rows as one array per column.
+    """
+    analytics = option_trade_analytics(trades, price_history, r)
+    exposure = option_exposure(open_positions, analytics, price_history, as_of, r)
+    solved = analytics["iv"].notna() if not analytics.empty else pd.Series(dtype=bool)
+
+    result = {
+        "summary": {
+            "option_trades": int(len(analytics)),
+            "contracts": int(analytics.groupby(["ticker", "option_type", "strike_price", "expiration"]).ngroups)
+            if not analytics.empty else 0,
+            "iv_solved": int(solved.sum()),
+            "median_iv": _float(analytics["iv"].median()) if solved.any() else None,
+            "open_contracts": _float(exposure["contracts"].sum()) if not exposure.empty else 0.0,
+            "risk_free_rate": r,
+        },
+        "iv_by_ticker": _records(
+            analytics.groupby("ticker").agg(
+                trades=("iv", "size"), iv_solved=("iv", "count"), median_iv=("iv", "median"),
+                mean_iv=("iv", "mean"),
+            ).reset_index()
+        ) if not analytics.empty else [],
+        "exposure": _exposure_rollup(exposure, ["expiration", "ticker"]),
+        "exposure_by_expiration": _exposure_rollup(exposure, ["expiration"]),
+        "exposure_by_ticker": _exposure_rollup(exposure, ["ticker"]),
+    }
+    if include_trades:
+        columns = ["id", "activity_date", "parsed_action", "ticker", "option_type", "strike_price", "expiration",
+                   "quantity", "price", "underlying", "days_to_expiry", "moneyness", "iv"] + GREEKS
+        result["trades"] = {
+            name: _json_column(analytics[name]) for name in columns if name in analytics.columns
+        } if not analytics.empty else {}
+    return result
+
+
+def _option_trades(trades: pd.DataFrame) -> pd.DataFrame:
+    required = {"activity_date", "ticker", "option_type", "strike_price", "option_expiration", "price"}
+    if trades is None or trades.empty or not required <= set(trades.columns):
+        return pd.DataFrame()
+    options = trades[trades["option_type"].isin(["Call", "Put"])]
+    if "parsed_action" in options.columns:
+        options = options[options["parsed_action"].isin(OPTION_ACTIONS)]
+    price = pd.to_numeric(options["price"], errors="coerce")
+    if "amount" in options.columns and "quantity" in options.columns:
+        # Premium per share from the cash amount when the quoted price is missing
+        contracts = pd.to_numeric(options["quantity"], errors="coerce").abs().replace(0, np.nan)
+        price = price.fillna(pd.to_numeric(options["amount"], errors="coerce").abs() / (contracts * CONTRACT_MULTIPLIER))
+    options = options.assign(
+        activity_date=pd.to_datetime(options["activity_date"]).dt.normalize(),
+        strike_price=pd.to_numeric(options["strike_price"], errors="coerce"),
+        price=price,
+        expiration=_parse_expiration(options["option_expiration"]),
+    )
+    return options.dropna(subset=["activity_date", "strike_price", "expiration"]).reset_index(drop=True)
+
+
+def _parse_expiration(expiration: pd.Series) -> pd.Series:
+    # Robinhood writes expirations as m/d/YYYY; a history has few distinct ones, so parse each once
+    codes, uniques = pd.factorize(expiration)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format="%m/%d/%Y", errors="coerce")
+    # Missing values have code -1, which picks the trailing NaT
+    parsed = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(parsed[codes], index=expiration.index)
+
+
+def _with_underlying(frame: pd.DataFrame, price_history: pd.DataFrame, on: str) -> pd.DataFrame:
+    """Attach `underlying`: the ticker's last close on or before `frame[on]`, keeping the frame's order."""
+    if price_history is None or price_history.empty:
+        return frame.assign(underlying=np.nan)
+    prices = pd.DataFrame({
+        "ticker": price_history["ticker"].astype(object),
+        "_date": pd.to_datetime(price_history["date"]).dt.normalize(),
+        "underlying": pd.to_numeric(price_history["close"], errors="coerce"),
+    }).dropna().sort_values("_date", kind="stable")
+    left = frame.assign(_row=np.arange(len(frame)), _on=pd.to_datetime(frame[on]).astype("datetime64[ns]"))
+    joined = pd.merge_asof(left.sort_values("_on", kind="stable"), prices, left_on="_on", right_on="_date",
+                           by="ticker", direction="backward")
+    return joined.sort_values("_row").drop(columns=["_row", "_on", "_date"]).reset_index(drop=True)
+
+
+def _years_to_expiry(expiration: pd.Series, dates: pd.Series) -> np.ndarray:
+    days = (expiration.to_numpy(dtype="datetime64[ns]") - dates.to_numpy(dtype="datetime64[ns]")) \
+        / np.timedelta64(1, "D")
+    return np.where(days >= 0, np.maximum(days, MIN_DAYS_TO_EXPIRY), np.nan) / 365.0
+
+
+def _exposure_rollup(exposure: pd.DataFrame, keys: list) -> list:
+    if exposure.empty:
+        return []
+    rollup = exposure.groupby(keys, sort=True)[EXPOSURE_FIELDS].sum(min_count=1)
+    rollup["lots"] = exposure.groupby(keys, sort=True).size()
+    return _records(rollup.reset_index())
+
+
+def _json_column(column: pd.Series) -> list:
+    if pd.api.types.is_datetime64_any_dtype(column):
+        column = column.dt.strftime("%Y-%m-%d")
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _records(frame: pd.DataFrame) -> list:
+    # Dates as ISO strings and NaN -> None so every value is JSON-ready
+    values = {name: _json_column(frame[name]) for name in frame.columns}
+    return [dict(zip(values, row)) for row in zip(*values.values())]
+
+
+def _float(value):
+    return None if value is None or not np.isfinite(value) else float(value)
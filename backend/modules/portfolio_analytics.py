@@ -0,0 +1,178 @@
+import os
+import numpy as np
+import pandas as pd
+
+ANALYTICS_PERIODS = ("W", "M", "Q", "Y")
+# Trading days in the rolling Sharpe-like window, and per year for annualizing
+SHARPE_WINDOW = int(os.environ.get("SHARPE_WINDOW_DAYS", 63))
+TRADING_DAYS = 252
+
+
+def portfolio_analytics(round_trips: pd.DataFrame, period: str = "M", window: int = SHARPE_WINDOW) -> dict:
+    """
+    Realized-P&L analytics over closed round-trips, vectorized end to end:
+
+    - per_ticker: trades, P&L, win rate, average hold, max drawdown of the
+      ticker's cumulative P&L and a Sharpe-like ratio of its daily P&L, on
+      the same business-day calendar as the portfolio ratio
+    - per_period: the same aggregates per `period` of the sell date, with the
+      running total and the portfolio's drawdown at period end
+    - portfolio: overall totals, max drawdown, and the rolling `window`-day
+      Sharpe-like ratio (mean / std of daily P&L, annualized), sampled at
+      each period end
+
+    P&L is in dollars, not returns, so the ratios compare consistency of
+    results rather than risk-adjusted returns on capital.
+    """
+    if period not in ANALYTICS_PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    trades = _closed_trades(round_trips)
+    if trades.empty:
+        return {"portfolio": _empty_portfolio(), "per_ticker": [], "per_period": [], "rolling_sharpe": []}
+
+    # One sort by (ticker, sell date), on integer codes, serves every per-ticker running statistic
+    ticker_codes, tickers = pd.factorize(trades["Ticker"], sort=True)
+    sell = trades["SellDate"].to_numpy(dtype="datetime64[ns]")
+    seconds = (sell - sell.min()) // np.timedelta64(1, "s")
+    order = np.argsort((ticker_codes.astype(np.int64) << 32) | seconds, kind="stable")
+    ticker_codes, sell = ticker_codes[order], sell[order]
+    profit = trades["Profit"].to_numpy(dtype=float)[order]
+    hold = trades["Duration"].to_numpy(dtype=float)[order]
+    win = profit > 0
+    day = sell.astype("datetime64[D]").astype("datetime64[ns]")
+
+    per_ticker = pd.DataFrame({
+        "ticker": tickers,
+        "trades": np.bincount(ticker_codes, minlength=len(tickers)),
+        "pnl": np.bincount(ticker_codes, profit, len(tickers)),
+        "win_rate": np.bincount(ticker_codes, win, len(tickers)),
+        "avg_hold_days": np.bincount(ticker_codes, np.nan_to_num(hold), len(tickers)),
+        "hold_count": np.bincount(ticker_codes, ~np.isnan(hold), len(tickers)),
+    })
+    per_ticker["win_rate"] /= per_ticker["trades"]
+    per_ticker["avg_hold_days"] = per_ticker["avg_hold_days"] / per_ticker["hold_count"].replace(0, np.nan)
+    per_ticker["max_drawdown"] = _grouped_max_drawdown(ticker_codes, profit, len(tickers))
+
+    # Portfolio daily realized P&L on a business-day calendar (flat days count as zero)
+    daily = pd.Series(profit).groupby(day).sum()
+    daily.index = pd.DatetimeIndex(daily.index)
+    daily = daily.reindex(pd.bdate_range(daily.index.min(), daily.index.max()).union(daily.index), fill_value=0.0)
+    per_ticker["sharpe"] = _grouped_sharpe(ticker_codes, day, profit, len(tickers), len(daily))
+    per_ticker = per_ticker.drop(columns="hold_count").sort_values("pnl", ascending=False, kind="stable")
+    equity = daily.cumsum()
+    drawdown = equity - np.maximum(equity.cummax(), 0.0)
+    rolling = daily.rolling(window, min_periods=window)
+    rolling_sharpe = (rolling.mean() / rolling.std().replace(0, np.nan)) * np.sqrt(TRADING_DAYS)
+
+    # Periods as integer ordinals, so the per-period sums are bincounts as well
+    ordinals = pd.PeriodIndex(pd.DatetimeIndex(day), freq=period).asi8
+    first = ordinals.min()
+    slot = ordinals - first
+    n_slots = int(slot.max()) + 1
+    counts = np.bincount(slot, minlength=n_slots)
+    hold_counts = np.bincount(slot, ~np.isnan(hold), n_slots)
+    per_period = pd.DataFrame({
+        "trades": counts,
+        "pnl": np.bincount(slot, profit, n_slots),
+        "win_rate": np.bincount(slot, win, n_slots) / np.where(counts, counts, np.nan),
+        "avg_hold_days": np.bincount(slot, np.nan_to_num(hold), n_slots)
+        / np.where(hold_counts, hold_counts, np.nan),
+    }, index=pd.PeriodIndex.from_ordinals(np.arange(first, first + n_slots), freq=period))
+    per_period.index.name = "period"
+    period_end = daily.index.to_period(period)
+    per_period["cumulative_pnl"] = per_period["pnl"].cumsum()
+    per_period["drawdown"] = drawdown.groupby(period_end).last().reindex(per_period.index).to_numpy()
+    per_period = per_period[per_period["trades"] > 0]
+    sharpe_at_end = rolling_sharpe.groupby(period_end).last()
+
+    portfolio = {
+        "trades": int(len(profit)),
+        "pnl": float(profit.sum()),
+        "win_rate": float(win.mean()),
+        "avg_hold_days": _float(np.nanmean(hold)) if (~np.isnan(hold)).any() else None,
+        "max_drawdown": float(drawdown.min()),
+        "sharpe": _sharpe(daily.to_numpy()),
+        "rolling_sharpe_window": window,
+        "first_sell": daily.index[0].date().isoformat(),
+        "last_sell": daily.index[-1].date().isoformat(),
+    }
+    return {
+        "portfolio": portfolio,
+        "per_ticker": _records(per_ticker),
+        "per_period": _records(per_period.reset_index().assign(period=lambda f: f["period"].astype(str))),
+        "rolling_sharpe": [
+            {"period": str(p), "sharpe": _float(v)} for p, v in sharpe_at_end.items()
+        ],
+    }
+
+
+def _closed_trades(round_trips: pd.DataFrame) -> pd.DataFrame:
+    if round_trips.empty or not {"Ticker", "SellDate", "Profit"} <= set(round_trips.columns):
+        return pd.DataFrame(columns=["Ticker", "SellDate", "Profit", "Duration"])
+    trades = pd.DataFrame({
+        "Ticker": round_trips["Ticker"].astype(object),
+        "SellDate": pd.to_datetime(round_trips["SellDate"]),
+        "Profit": pd.to_numeric(round_trips["Profit"], errors="coerce"),
+        "Duration": pd.to_numeric(round_trips.get("Duration", np.nan), errors="coerce"),
+    })
+    return trades[trades["SellDate"].notna() & trades["Profit"].notna() & trades["Ticker"].notna()]
+
+
+def _grouped_max_drawdown(codes: np.ndarray, profit: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Max drawdown of each group's cumulative P&L, for rows already sorted by
+    group and time. Cumulative sums restart per group by subtracting the
+    running total at each group's start; running peaks start from zero.
+    """
+    total = np.cumsum(profit)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, len(codes)])
+    offset = np.repeat(total[starts] - profit[starts], lengths)
+    cum = total - offset
+    # Running peak within each group: lift every group above all earlier ones so a
+    # single maximum.accumulate cannot carry a peak across a group boundary
+    span = np.abs(cum).max() * 2 + 1
+    lift = np.repeat(np.arange(len(starts)) * span, lengths)
+    peak = np.maximum(np.maximum.accumulate(np.maximum(cum, 0.0) + lift) - lift, 0.0)
+    drawdown = np.zeros(n_groups)
+    np.minimum.at(drawdown, codes, cum - peak)
+    return drawdown
+
+
+def _grouped_sharpe(codes: np.ndarray, day: np.ndarray, profit: np.ndarray, n_groups: int,
+                    n_days: int) -> np.ndarray:
+    """
+    Annualized mean / std of each group's daily P&L over the portfolio's
+    `n_days`-day business calendar, for rows already sorted by group and day.
+    Days a group did not trade count as zero, as they do for the portfolio
+    ratio, so only the active days need to be summed.
+    """
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (day[1:] != day[:-1])])
+    day_pnl = np.add.reduceat(profit, starts)
+    day_code = codes[starts]
+    active = np.bincount(day_code, minlength=n_groups)
+    mean = np.bincount(day_code, day_pnl, n_groups) / n_days
+    # Squared deviations of the active days, plus mean**2 for each flat day
+    sq_dev = np.bincount(day_code, (day_pnl - mean[day_code]) ** 2, n_groups) + (n_days - active) * mean ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(sq_dev / (n_days - 1))
+        return np.where((n_days > 1) & (std > 0), mean / std * np.sqrt(TRADING_DAYS), np.nan)
+
+
+def _sharpe(daily: np.ndarray):
+    std = daily.std(ddof=1) if len(daily) > 1 else 0.0
+    return _float(daily.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else None
+
+
+def _records(frame: pd.DataFrame) -> list:
+    # NaN -> None so every value is JSON-ready
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+def _float(value):
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+def _empty_portfolio() -> dict:
+    return {"trades": 0, "pnl": 0.0, "win_rate": None, "avg_hold_days": None, "max_drawdown": 0.0,
+            "sharpe": None, "rolling_sharpe_window": SHARPE_WINDOW, "first_sell": None, "last_sell": None}
@@ -1,60 +1,259 @@
+import math
+import numpy as np
 import pandas as pd
+from collections import deque
 
-def calculate_trade_metrics(trade_df: pd.DataFrame) -> pd.DataFrame:
+OPEN_ACTIONS = {"Buy to Open"}
+CLOSE_ACTIONS = {"Sell to Close"}
+# Option events that end a contract: they close its open lots at the row's price, or at 0
+# when the broker leaves it blank (Robinhood's OEXP/OASGN rows carry no price or amount)
+EXPIRY_ACTIONS = {"Expired", "Assigned"}
+MATCH_METHODS = ("fifo", "lifo", "specific")
+
+# Optional columns that, when present, split a ticker into separate option contracts
+CONTRACT_COLUMNS = ["option_type", "strike_price", "option_expiration"]
+# Shares per option contract: prices are per share, P&L is in dollars
+CONTRACT_MULTIPLIER = 100
+
+ROUND_TRIP_COLUMNS = [
+    "TradeID", "Actions", "BuyDate", "SellDate", "Duration", "Profit", "Ticker",
+    "OptionType", "Quantity", "BuyPrice", "SellPrice",
+]
+OPEN_LOT_COLUMNS = ["LotID", "Ticker", "OptionType", "Strike", "Expiration", "OpenDate", "Quantity", "Price"]
+
+
+class LotMatcher:
+    """
+    Matches closing trades against open lots per ticker/contract in a single
+    chronological pass. Closes may consume several lots and lots may be closed
+    in several pieces (partial fills). Expirations and assignments close the
+    contract's lots like a sale (all of them when the row has no quantity).
+    `method` picks which open lot a close
+    consumes first: "fifo", "lifo", or "specific" (a close's `lot_id` names the
+    opening trade's `id`; anything left over falls back to FIFO).
+
+    Open lots are kept between calls, so further trades can be fed in later.
+    """
+
+    def __init__(self, method: str = "fifo"):
+        if method not in MATCH_METHODS:
+            raise ValueError(f"Unknown lot matching method: {method}")
+        self.method = method
+        # contract key -> deque of lots; a lot is [lot_id, remaining_qty, price, date]
+        self.open_lots = {}
+        self.lots_by_id = {}
+        self.next_trade_id = 1
+
+    def to_state(self) -> dict:
+        """JSON-serializable snapshot of the open lots, restorable with from_state."""
+        return {
+            "method": self.method,
+            "next_trade_id": self.next_trade_id,
+            "open_lots": [
+                [list(key), [lot for lot in lots if lot[1] > 0]]
+                for key, lots in self.open_lots.items() if lots
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "LotMatcher":
+        matcher = cls(state["method"])
+        matcher.next_trade_id = state["next_trade_id"]
+        for key, lots in state["open_lots"]:
+            matcher.open_lots[tuple(key)] = deque(lots)
+            if matcher.method == "specific":
+                for lot in lots:
+                    matcher.lots_by_id[lot[0]] = lot
+        return matcher
+
+    def match(self, trade_df: pd.DataFrame) -> pd.DataFrame:
+        """Process trades and return the round-trips they close."""
+        if trade_df.empty:
+            return pd.DataFrame(columns=ROUND_TRIP_COLUMNS)
+
+        actions = trade_df["parsed_action"].to_numpy(dtype=object)
+        is_open = np.isin(actions, list(OPEN_ACTIONS))
+        is_close = np.isin(actions, list(CLOSE_ACTIONS | EXPIRY_ACTIONS))
+        # Trades without an activity date cannot be placed in time and are skipped
+        all_dates = pd.to_datetime(trade_df["activity_date"]).to_numpy()
+        rows = np.flatnonzero((is_open | is_close) & ~np.isnat(all_dates))
+
+        # Chronological order; on the same day, opens before closes so day trades match
+        rows = rows[np.lexsort((is_close[rows], all_dates[rows]))]
+        # Plain lists keep the per-trade loop free of NumPy scalar boxing;
+        # dates travel as int64 nanoseconds (NaT is the int64 minimum)
+        dates = all_dates[rows].astype("datetime64[ns]").view("i8").tolist()
+        quantity = np.abs(pd.to_numeric(_column(trade_df, "quantity", np.nan)[rows], errors="coerce")).tolist()
+        unit_price = _unit_prices(trade_df)[rows].tolist()
+        tickers = _tickers(trade_df)[rows].tolist()
+        contracts = _contract_keys(trade_df, tickers, rows)
+        row_ids = _column(trade_df, "id", None)[rows].tolist()
+        target_lots = _column(trade_df, "lot_id", None)[rows].tolist()
+        opening = is_open[rows].tolist()
+        row_actions = actions[rows].tolist()
+        positions = rows.tolist()
+
+        buy_dates, sell_dates, matched_qty, buy_prices, sell_prices, out_tickers = [], [], [], [], [], []
+        out_option_types, out_actions = [], []
+        for i in range(len(positions)):
+            qty = quantity[i]
+            expiry = row_actions[i] in EXPIRY_ACTIONS
+            if expiry:
+                if not qty > 0:
+                    qty = math.inf
+                if not unit_price[i] >= 0:
+                    unit_price[i] = 0.0
+            if not qty > 0:
+                continue
+            key = contracts[i]
+            if opening[i]:
+                lot_id = row_ids[i] if row_ids[i] is not None else f"row-{positions[i]}"
+                lot = [lot_id, qty, unit_price[i], dates[i]]
+                lots = self.open_lots.get(key)
+                if lots is None:
+                    lots = self.open_lots[key] = deque()
+                lots.append(lot)
+                if self.method == "specific":
+                    self.lots_by_id[lot_id] = lot
+                continue
+
+            lots = self.open_lots.get(key)
+            if not lots:
+                continue
+            for lot, take in self._consume(lots, qty, target_lots[i]):
+                buy_dates.append(lot[3])
+                sell_dates.append(dates[i])
+                matched_qty.append(take)
+                buy_prices.append(lot[2])
+                sell_prices.append(unit_price[i])
+                out_tickers.append(tickers[i])
+                # The contract key is (ticker, option type, strike, expiration); equities have no type
+                out_option_types.append(key[1])
+                out_actions.append(row_actions[i])
+
+        return self._round_trips(buy_dates, sell_dates, matched_qty, buy_prices, sell_prices, out_tickers,
+                                 out_option_types, out_actions)
+
+    def _consume(self, lots: deque, qty: float, target_lot):
+        """Yield (lot, quantity taken) pairs until `qty` is covered or no lots remain."""
+        if self.method == "specific" and target_lot is not None:
+            lot = self.lots_by_id.get(target_lot)
+            if lot is not None and lot[1] > 0:
+                take = min(qty, lot[1])
+                lot[1] -= take
+                qty -= take
+                if lot[1] <= 0:
+                    del self.lots_by_id[target_lot]
+                yield lot, take
+
+        pop_end = lots.pop if self.method == "lifo" else lots.popleft
+        peek = -1 if self.method == "lifo" else 0
+        while qty > 0 and lots:
+            lot = lots[peek]
+            if lot[1] <= 0:
+                # Already consumed through a specific-lot close
+                pop_end()
+                continue
+            take = min(qty, lot[1])
+            lot[1] -= take
+            qty -= take
+            yield lot, take
+            if lot[1] <= 0:
+                pop_end()
+                self.lots_by_id.pop(lot[0], None)
+
+    def _round_trips(self, buy_dates, sell_dates, qty, buy_prices, sell_prices, tickers,
+                     option_types, close_actions) -> pd.DataFrame:
+        n = len(qty)
+        if n == 0:
+            return pd.DataFrame(columns=ROUND_TRIP_COLUMNS)
+        buy_dates = pd.to_datetime(np.array(buy_dates, dtype="i8").view("datetime64[ns]"))
+        sell_dates = pd.to_datetime(np.array(sell_dates, dtype="i8").view("datetime64[ns]"))
+        qty = np.array(qty, dtype=float)
+        buy_prices = np.array(buy_prices, dtype=float)
+        sell_prices = np.array(sell_prices, dtype=float)
+
+        trade_ids = np.arange(self.next_trade_id, self.next_trade_id + n)
+        self.next_trade_id += n
+        return pd.DataFrame({
+            "TradeID": trade_ids,
+            "Actions": "Buy to Open -> " + np.array(close_actions, dtype=object),
+            "BuyDate": buy_dates,
+            "SellDate": sell_dates,
+            "Duration": (sell_dates - buy_dates).days,
+            "Profit": np.nan_to_num((sell_prices - buy_prices) * qty * _multipliers(option_types)),
+            "Ticker": np.array(tickers, dtype=object),
+            "OptionType": np.array(option_types, dtype=object),
+            "Quantity": qty,
+            "BuyPrice": buy_prices,
+            "SellPrice": sell_prices,
+        })
+
+    def open_positions(self, as_of=None) -> pd.DataFrame:
+        """
+        Remaining open lots, one row per lot. Option lots whose contract expired
+        before `as_of` (default: today) are left out even without an expiration
+        row, since the contract no longer exists.
+        """
+        records = []
+        for key, lots in self.open_lots.items():
+            ticker, option_type, strike, expiration = key
+            for lot_id, qty, price, date in lots:
+                if qty > 0:
+                    records.append((lot_id, ticker, option_type, strike, expiration, date, qty, price))
+        positions = pd.DataFrame.from_records(records, columns=OPEN_LOT_COLUMNS)
+        positions["OpenDate"] = pd.to_datetime(positions["OpenDate"].to_numpy(dtype="i8").view("datetime64[ns]"))
+        as_of = pd.Timestamp.today() if as_of is None else pd.Timestamp(as_of)
+        # Robinhood writes expirations as m/d/YYYY
+        expiration = pd.to_datetime(positions["Expiration"], format="%m/%d/%Y", errors="coerce")
+        return positions[~(expiration < as_of.normalize())].reset_index(drop=True)
+
+
+def _column(trade_df: pd.DataFrame, col: str, default) -> np.ndarray:
+    if col not in trade_df.columns:
+        return np.full(len(trade_df), default, dtype=object)
+    values = trade_df[col].to_numpy(dtype=object)
+    if default is None:
+        values = np.where(pd.isna(values), None, values)
+    return values
+
+
+def _unit_prices(trade_df: pd.DataFrame) -> np.ndarray:
+    # Use the quoted price, falling back to |amount| / shares when it is missing. An option's
+    # amount covers CONTRACT_MULTIPLIER shares per contract, so its price is per share like the quote.
+    price = pd.to_numeric(trade_df["price"], errors="coerce") if "price" in trade_df.columns \
+        else pd.Series(np.nan, index=trade_df.index)
+    if "amount" in trade_df.columns and "quantity" in trade_df.columns:
+        shares = pd.to_numeric(trade_df["quantity"], errors="coerce").abs().replace(0, np.nan) \
+            * _multipliers(_column(trade_df, "option_type", None))
+        price = price.fillna(pd.to_numeric(trade_df["amount"], errors="coerce").abs() / shares)
+    return price.to_numpy(dtype=float)
+
+
+def _multipliers(option_types) -> np.ndarray:
+    """Shares per unit of quantity: CONTRACT_MULTIPLIER for calls and puts, 1 for equities."""
+    return np.where(np.isin(np.asarray(option_types, dtype=object), ["Call", "Put"]), CONTRACT_MULTIPLIER, 1)
+
+
+def _tickers(trade_df: pd.DataFrame) -> np.ndarray:
+    for col in ("ticker", "instrument"):
+        if col in trade_df.columns:
+            return trade_df[col].fillna("UNKNOWN").to_numpy(dtype=object)
+    return np.full(len(trade_df), "UNKNOWN", dtype=object)
+
+
+def _contract_keys(trade_df: pd.DataFrame, tickers: np.ndarray, rows: np.ndarray) -> list:
+    fields = [_column(trade_df, col, None)[rows].tolist() for col in CONTRACT_COLUMNS]
+    return list(zip(tickers, *fields))
+
+
+def calculate_trade_metrics(trade_df: pd.DataFrame, method: str = "fifo") -> pd.DataFrame:
     """
-    Computes basic metrics (duration, profit) by matching "Buy to Open"
-    with "Sell to Close". If the price is missing, it attempts to derive it from the amount.
+    Computes basic metrics (duration, profit) by matching "Buy to Open" lots
+    with "Sell to Close" trades, expirations and assignments per
+    ticker/contract (see LotMatcher). If the price is missing, it is derived
+    from the amount.
     """
     if "activity_date" not in trade_df.columns or "parsed_action" not in trade_df.columns:
         return pd.DataFrame()
-    
-    # Sort by activity date to process trades in chronological order
-    trade_df = trade_df.sort_values("activity_date")
-    
-    # Create an incremental TradeID for each "Buy to Open" action
-    trade_df["TradeID"] = (trade_df["parsed_action"] == "Buy to Open").cumsum()
-    
-    metrics = []
-    for trade_id, group in trade_df.groupby("TradeID"):
-        # Separate the buy and sell rows
-        buy_rows = group[group["parsed_action"] == "Buy to Open"]
-        sell_rows = group[group["parsed_action"] == "Sell to Close"]
-        
-        if not buy_rows.empty and not sell_rows.empty:
-            buy_row = buy_rows.iloc[0]
-            sell_row = sell_rows.iloc[0]
-            
-            # Calculate trade duration (in days)
-            duration = (sell_row["activity_date"] - buy_row["activity_date"]).days
-            
-            # Determine the buy and sell prices
-            buy_price = buy_row.get("price")
-            if buy_price is None and buy_row.get("amount") is not None and buy_row.get("quantity"):
-                buy_price = buy_row.get("amount") / buy_row.get("quantity")
-            
-            sell_price = sell_row.get("price")
-            if sell_price is None and sell_row.get("amount") is not None and sell_row.get("quantity"):
-                sell_price = sell_row.get("amount") / sell_row.get("quantity")
-            
-            # Get the trade quantity (defaulting to 0 if missing)
-            qty = buy_row.get("quantity") or 0
-            
-            # Calculate profit if both prices are available
-            profit = 0.0
-            if buy_price is not None and sell_price is not None:
-                profit = (sell_price - buy_price) * qty
-            
-            # Retrieve the ticker (assuming the buy row contains the correct ticker)
-            ticker = buy_row.get("ticker", "UNKNOWN")
-            
-            metrics.append({
-                "TradeID": trade_id,
-                "Actions": f"{buy_row.get('parsed_action')} -> {sell_row.get('parsed_action')}",
-                "BuyDate": buy_row.get("activity_date"),
-                "SellDate": sell_row.get("activity_date"),
-                "Duration": duration,
-                "Profit": profit,
-                "Ticker": ticker
-            })
-    
-    return pd.DataFrame(metrics)
+    return LotMatcher(method).match(trade_df)
@@ -0,0 +1,253 @@
+import datetime
+import os
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from modules.sqlite_utils import connect
+
+PRICE_STORE_PATH = os.environ.get("PRICE_STORE_PATH", "cache/prices.sqlite3")
+PRICE_PROVIDER = os.environ.get("PRICE_PROVIDER", "yfinance")
+PRICE_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume"]
+HISTORY_COLUMNS = ["ticker", "date"] + PRICE_COLUMNS
+# How long a download reaching today (whose bar is still forming) is served before refetching
+PRICE_RECENT_TTL_SECONDS = float(os.environ.get("PRICE_RECENT_TTL_SECONDS", 900))
+
+
+class YFinanceProvider:
+    """Fetches daily OHLCV for many tickers in one yfinance download call."""
+
+    def download(self, tickers: list, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        import yfinance as yf
+
+        # yfinance treats `end` as exclusive; the provider contract is inclusive
+        raw = yf.download(
+            list(tickers), start=start.isoformat(), end=(end + datetime.timedelta(days=1)).isoformat(),
+            group_by="ticker", auto_adjust=False, progress=False, threads=True,
+        )
+        if raw.empty:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        if not isinstance(raw.columns, pd.MultiIndex):
+            raw.columns = pd.MultiIndex.from_product([[tickers[0]], raw.columns])
+        long = raw.stack(level=0, future_stack=True).reset_index()
+        long.columns = [str(c) for c in long.columns]
+        long = long.rename(columns={
+            "Date": "date", "Ticker": "ticker", "level_1": "ticker", "Open": "open", "High": "high",
+            "Low": "low", "Close": "close", "Adj Close": "adj_close", "Volume": "volume",
+        })
+        if "adj_close" not in long.columns:
+            long["adj_close"] = long["close"]
+        return long.dropna(subset=["close"])[HISTORY_COLUMNS]
+
+
+class SyntheticPriceProvider:
+    """
+    Deterministic random-walk prices on business days, with no network access.
+    Used for offline development, tests and benchmarks (PRICE_PROVIDER=synthetic).
+    """
+
+    def download(self, tickers: list, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        frames = []
+        for ticker in tickers:
+            # Walk from a fixed origin so overlapping requests agree on every date
+            dates = pd.bdate_range("2000-01-03", end)
+            rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+            close = 50.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+            frame = pd.DataFrame({
+                "ticker": ticker,
+                "date": dates,
+                "open": close * (1 + rng.normal(0, 0.005, len(dates))),
+                "high": close * 1.01,
+                "low": close * 0.99,
+                "close": close,
+                "adj_close": close,
+                "volume": rng.integers(100_000, 5_000_000, len(dates)).astype(float),
+            })
+            frames.append(frame[frame["date"] >= pd.Timestamp(start)])
+        if not frames:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+PROVIDERS = {"yfinance": YFinanceProvider, "synthetic": SyntheticPriceProvider}
+
+
+class PriceStore:
+    """
+    Local daily OHLCV store in SQLite, keyed by (ticker, date). Each ticker
+    records which date ranges have been fetched, so a request only downloads
+    the missing ranges (batched across tickers) and is otherwise served from disk.
+    Settled ranges (up to yesterday) are covered for good; the part of a
+    download reaching today is reused for PRICE_RECENT_TTL_SECONDS.
+    """
+
+    def __init__(self, path: str = PRICE_STORE_PATH, provider=None):
+        self.path = path
+        self.provider = provider if provider is not None else PROVIDERS[PRICE_PROVIDER]()
+        self._fetch_lock = threading.Lock()
+        conn = connect(self.path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ohlcv (ticker TEXT NOT NULL, date TEXT NOT NULL, "
+                "open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL, "
+                "PRIMARY KEY (ticker, date)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage (ticker TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_coverage_ticker ON coverage (ticker)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recent_fetches (ticker TEXT PRIMARY KEY, start TEXT NOT NULL, "
+                "end TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+
+    def get_history(self, tickers, start, end) -> pd.DataFrame:
+        """Long frame (ticker, date, open, high, low, close, adj_close, volume) for [start, end]."""
+        tickers = sorted({t for t in tickers if t})
+        start, end = _as_date(start), _as_date(end)
+        if not tickers or start > end:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        with self._fetch_lock:
+            self._fill_gaps(tickers, start, end)
+        return self._read(tickers, start, end)
+
+    def _fill_gaps(self, tickers: list, start: datetime.date, end: datetime.date) -> None:
+        # Today's bar is still forming, so coverage never extends past yesterday
+        settled = datetime.date.today() - datetime.timedelta(days=1)
+        recent = self._recent_fetches(tickers)
+
+        # Group tickers that miss the same range so each range is one download call
+        by_range = {}
+        for ticker in tickers:
+            covered = self._coverage(ticker)
+            if ticker in recent:
+                covered = _merge(covered + [recent[ticker]])
+            for gap in _subtract(start, end, covered):
+                by_range.setdefault(gap, []).append(ticker)
+
+        for (gap_start, gap_end), group in by_range.items():
+            prices = self.provider.download(group, gap_start, gap_end)
+            self._write(prices)
+            if gap_start <= settled:
+                self._add_coverage(_returned_coverage(prices, group, gap_start, min(gap_end, settled)))
+            if gap_end > settled:
+                self._mark_recent(group, max(gap_start, settled + datetime.timedelta(days=1)), gap_end)
+
+    def _coverage(self, ticker: str) -> list:
+        rows = connect(self.path).execute(
+            "SELECT start, end FROM coverage WHERE ticker = ? ORDER BY start", (ticker,)
+        ).fetchall()
+        return [(_as_date(s), _as_date(e)) for s, e in rows]
+
+    def _add_coverage(self, ranges: dict) -> None:
+        conn = connect(self.path)
+        with conn:
+            for ticker, (start, end) in ranges.items():
+                merged = _merge(self._coverage(ticker) + [(start, end)])
+                conn.execute("DELETE FROM coverage WHERE ticker = ?", (ticker,))
+                conn.executemany(
+                    "INSERT INTO coverage (ticker, start, end) VALUES (?, ?, ?)",
+                    [(ticker, s.isoformat(), e.isoformat()) for s, e in merged],
+                )
+
+    def _recent_fetches(self, tickers: list) -> dict:
+        placeholders = ",".join("?" * len(tickers))
+        rows = connect(self.path).execute(
+            f"SELECT ticker, start, end FROM recent_fetches WHERE ticker IN ({placeholders}) AND fetched_at >= ?",
+            [*tickers, time.time() - PRICE_RECENT_TTL_SECONDS],
+        ).fetchall()
+        return {ticker: (_as_date(s), _as_date(e)) for ticker, s, e in rows}
+
+    def _mark_recent(self, tickers: list, start: datetime.date, end: datetime.date) -> None:
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO recent_fetches (ticker, start, end, fetched_at) VALUES (?, ?, ?, ?)",
+                [(ticker, start.isoformat(), end.isoformat(), time.time()) for ticker in tickers],
+            )
+
+    def _write(self, prices: pd.DataFrame) -> None:
+        if prices.empty:
+            return
+        frame = prices[HISTORY_COLUMNS].copy()
+        frame["date"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+        frame[PRICE_COLUMNS] = frame[PRICE_COLUMNS].astype(float)
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO ohlcv ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+                frame.itertuples(index=False, name=None),
+            )
+
+    def _read(self, tickers: list, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        placeholders = ",".join("?" * len(tickers))
+        frame = pd.read_sql_query(
+            f"SELECT {', '.join(HISTORY_COLUMNS)} FROM ohlcv WHERE ticker IN ({placeholders}) "
+            "AND date BETWEEN ? AND ? ORDER BY ticker, date",
+            connect(self.path),
+            params=[*tickers, start.isoformat(), end.isoformat()],
+        )
+        frame["date"] = pd.to_datetime(frame["date"])
+        return frame
+
+
+def _as_date(value) -> datetime.date:
+    return pd.Timestamp(value).date()
+
+
+def _returned_coverage(prices: pd.DataFrame, tickers: list, start: datetime.date, end: datetime.date) -> dict:
+    """
+    The part of [start, end] each ticker's download actually answered for.
+    yfinance drops failed tickers without raising, so a ticker is covered up
+    to its last returned bar, or to `end` once that bar reaches the range's
+    last business day. A ticker with no bars is only covered when the range
+    has no business day at all (e.g. a weekend).
+    """
+    last_business_day = np.busday_offset(np.datetime64(end, "D"), 0, roll="backward").astype(object)
+    last_bars = {}
+    if not prices.empty:
+        last_bars = pd.to_datetime(prices["date"]).groupby(prices["ticker"].to_numpy()).max().to_dict()
+
+    coverage = {}
+    for ticker in tickers:
+        last_bar = last_bars.get(ticker)
+        if last_bar is None:
+            if last_business_day < start:
+                coverage[ticker] = (start, end)
+        elif last_bar.date() >= last_business_day:
+            coverage[ticker] = (start, end)
+        elif last_bar.date() >= start:
+            coverage[ticker] = (start, last_bar.date())
+    return coverage
+
+
+def _merge(ranges: list) -> list:
+    """Merge overlapping or adjacent inclusive date ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(start: datetime.date, end: datetime.date, covered: list) -> list:
+    """Parts of [start, end] not inside any of the (sorted, merged) covered ranges."""
+    gaps = []
+    cursor = start
+    for cov_start, cov_end in covered:
+        if cov_end < cursor:
+            continue
+        if cov_start > end:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, cov_start - datetime.timedelta(days=1)))
+        cursor = max(cursor, cov_end + datetime.timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
@@ -1,10 +1,50 @@
-import subprocess
+import json
+import os
+import threading
+import time
 
-def generate_trade_recommendation(context: str) -> str:
-    prompt = (
+from modules.recommendation_cache import get_recommendation_cache, recommendation_key
+
+# Long-running local model server (Ollama's HTTP API) instead of a CLI process per request
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434").rstrip("/")
+LLM_MODEL = os.environ.get("LLM_MODEL", "llama3.2")
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 3))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 120))  # max wait between streamed chunks
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 2))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 30))
+LLM_KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "30m")  # keeps the model loaded between requests
+
+_session = None
+_session_lock = threading.Lock()
+# Generations beyond this many wait for a slot rather than piling onto the model server
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMBusyError(RuntimeError):
+    """No generation slot became free within LLM_QUEUE_TIMEOUT."""
+
+
+def get_llm_session():
+    """Thread-safe lazy singleton for the pooled HTTP session to the model server."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_MAX_CONCURRENCY)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def build_prompt(context: str) -> str:
+    return (
         f"""You only give advice based on the gaps found in trade data. Don't feel the need to justify.
-Your primary role is to identify and analyze gaps such as price discrepancies, volume anomalies, timing irregularities, or missing data points. 
-You do not make predictions or provide general financial advice. Your insights are solely focused on explaining the causes and implications of these gaps, 
+Your primary role is to identify and analyze gaps such as price discrepancies, volume anomalies, timing irregularities, or missing data points.
+You do not make predictions or provide general financial advice. Your insights are solely focused on explaining the causes and implications of these gaps,
 offering strategic responses, and highlighting potential opportunities or risks associated with them.
 Based on the following trading patterns, sentiment insights, and market context,
 provide actionable trading advice:
@@ -12,21 +52,68 @@ provide actionable trading advice:
 Recommendation:"""
     )
 
+
+def cache_key(context_data) -> str:
+    """Recommendation cache key for the structured data a context string was built from."""
+    return recommendation_key(context_data, LLM_MODEL, build_prompt(""))
+
+
+def stream_trade_recommendation(context: str, key: str = None):
+    """
+    Yield the recommendation text in chunks as the model generates it. Raises
+    LLMBusyError when no slot frees up in time, and requests exceptions on
+    connection errors or timeouts.
+
+    With a cache `key` (see cache_key), a cached response is yielded whole and
+    a completed generation is stored for next time.
+    """
+    cache = get_recommendation_cache() if key is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    if not _slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+        raise LLMBusyError(f"All {LLM_MAX_CONCURRENCY} generation slots are busy")
+    started = time.perf_counter()
+    parts = []
+    finished = False
     try:
-        # Call the Ollama CLI with the model name and pass the prompt via input
-        result = subprocess.run(
-            ["ollama", "run", "llama3.2"],
-            input=prompt.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
+        response = get_llm_session().post(
+            f"{OLLAMA_URL}/api/generate",
+            json={"model": LLM_MODEL, "prompt": build_prompt(context), "stream": True, "keep_alive": LLM_KEEP_ALIVE},
+            stream=True,
+            timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
         )
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                if chunk.get("response"):
+                    parts.append(chunk["response"])
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    finished = True
+                    break
+    finally:
+        _slots.release()
+    # Errors, truncated and abandoned streams are never cached
+    if cache is not None and finished:
+        cache.put(key, "".join(parts), time.perf_counter() - started)
 
-        generated_text = result.stdout.decode("utf-8").strip()
-        
-        # Post-process the generated text as needed
-        recommendation = generated_text.split("Recommendation:")[-1].strip()
-        return recommendation
-        
-    except subprocess.CalledProcessError as e:
-        return f"Error: {e.stderr.decode('utf-8')}"
+
+def clean_recommendation(generated_text: str) -> str:
+    # Post-process the generated text as needed
+    return generated_text.strip().split("Recommendation:")[-1].strip()
+
+
+def generate_trade_recommendation(context: str, key: str = None) -> str:
+    try:
+        return clean_recommendation("".join(stream_trade_recommendation(context, key)))
+    except Exception as e:
+        return f"Error: {e}"
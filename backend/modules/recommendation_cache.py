@@ -0,0 +1,161 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+from modules.sqlite_utils import connect
+
+# Generated advice on disk, shared by every worker process and kept across restarts
+RECOMMENDATION_CACHE_PATH = os.environ.get("RECOMMENDATION_CACHE_PATH", "cache/recommendations.sqlite3")
+RECOMMENDATION_CACHE_TTL = float(os.environ.get("RECOMMENDATION_CACHE_TTL_SECONDS", 6 * 3600))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.environ.get("RECOMMENDATION_CACHE_MAX_ENTRIES", 5000))
+# Floats in the context are rounded to this many significant digits before hashing,
+# so a close of 187.43 vs 187.46 or a sentiment of 0.1234 vs 0.1236 hits the same entry
+RECOMMENDATION_CACHE_DIGITS = int(os.environ.get("RECOMMENDATION_CACHE_DIGITS", 3))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def recommendation_key(context, model: str, prompt: str = "", digits: int = RECOMMENDATION_CACHE_DIGITS) -> str:
+    """
+    SHA-256 of the normalized context (dict keys sorted, floats rounded,
+    whitespace collapsed) together with the model and prompt template, so a
+    new model or prompt never serves stale advice.
+    """
+    payload = json.dumps([model, prompt, _normalize(context, digits)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _normalize(value, digits: int):
+    if isinstance(value, dict):
+        return {str(key): _normalize(item, digits) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, digits) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value
+    try:
+        number = float(value)  # numpy scalars
+    except (TypeError, ValueError):
+        return str(value)  # timestamps and the like
+    if math.isnan(number):
+        return None
+    if number.is_integer() and abs(number) < 1e15:
+        return int(number)
+    return float(f"{number:.{digits}g}")
+
+
+class RecommendationCache:
+    """
+    Generated recommendations in SQLite keyed by recommendation_key. Entries
+    expire `ttl` seconds after they were generated; past `max_entries` the
+    least recently used are evicted. Hit/miss counts and the generation time
+    saved by hits are kept alongside, so they cover every worker.
+    """
+
+    def __init__(self, path: str = RECOMMENDATION_CACHE_PATH, ttl: float = RECOMMENDATION_CACHE_TTL,
+                 max_entries: int = RECOMMENDATION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        conn = connect(self.path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, "
+                "last_used REAL NOT NULL, gen_seconds REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS recommendations_last_used ON recommendations (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS recommendation_stats (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def get(self, key: str):
+        """The cached response for `key`, or None when absent or expired."""
+        now = time.time()
+        conn = connect(self.path)
+        with conn:
+            row = conn.execute(
+                "SELECT response, gen_seconds FROM recommendations WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                conn.execute("DELETE FROM recommendations WHERE key = ?", (key,))
+                self._bump(conn, misses=1)
+                return None
+            response, gen_seconds = row
+            conn.execute("UPDATE recommendations SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._bump(conn, hits=1, saved_seconds=gen_seconds)
+        return response
+
+    def put(self, key: str, response: str, gen_seconds: float) -> None:
+        """Store a freshly generated response, then evict expired and least recently used entries."""
+        now = time.time()
+        conn = connect(self.path)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendations (key, response, created_at, last_used, gen_seconds, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, response, now, now, gen_seconds),
+            )
+            conn.execute("DELETE FROM recommendations WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM recommendations WHERE key IN ("
+                "SELECT key FROM recommendations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        conn = connect(self.path)
+        counters = dict(conn.execute("SELECT name, value FROM recommendation_stats").fetchall())
+        entries, = conn.execute("SELECT COUNT(*) FROM recommendations").fetchone()
+        hits = int(counters.get("hits", 0))
+        misses = int(counters.get("misses", 0))
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "saved_seconds": float(counters.get("saved_seconds", 0.0)),
+        }
+
+    def clear(self) -> None:
+        conn = connect(self.path)
+        with conn:
+            conn.execute("DELETE FROM recommendations")
+            conn.execute("DELETE FROM recommendation_stats")
+
+    @staticmethod
+    def _bump(conn, **counters) -> None:
+        conn.executemany(
+            "INSERT INTO recommendation_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            counters.items(),
+        )
+
+
+def get_recommendation_cache() -> RecommendationCache:
+    """Thread-safe lazy singleton for the shared recommendation cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RecommendationCache()
+    return _cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show (or clear) the recommendation cache statistics")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = get_recommendation_cache()
+    if args.clear:
+        cache.clear()
+    print(cache.stats())
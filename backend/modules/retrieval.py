@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 4096))
+QUERY_TEMPLATE = "Latest news, earnings and market sentiment for {ticker}"
+
+# The encoder is loaded on first use, not at import, so the app starts fast
+_encoder = None
+_encoder_lock = threading.Lock()
+_query_cache = OrderedDict()
+_query_lock = threading.Lock()
+
+
+def get_encoder():
+    """Thread-safe lazy singleton for the sentence-transformer encoder."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                from sentence_transformers import SentenceTransformer
+                _encoder = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _encoder
+
+
+def embed_texts(texts: list, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """L2-normalized float32 embeddings, one row per text, encoded in batches."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    embeddings = get_encoder().encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def embed_queries(queries: list) -> np.ndarray:
+    """
+    Embeddings for query strings. Queries are built from a few templates, so
+    they are memoized in an LRU; the misses are encoded together in one batch.
+    """
+    with _query_lock:
+        cached = {q: _query_cache[q] for q in queries if q in _query_cache}
+        for q in cached:
+            _query_cache.move_to_end(q)
+    missing = list(dict.fromkeys(q for q in queries if q not in cached))
+    if missing:
+        computed = dict(zip(missing, embed_texts(missing)))
+        with _query_lock:
+            for q, vec in computed.items():
+                _query_cache[q] = vec
+                _query_cache.move_to_end(q)
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+        cached.update(computed)
+    return np.vstack([cached[q] for q in queries])
+
+
+class Retriever:
+    """
+    Per-ticker retrieval over the VectorStore. The store is filled from the
+    article embeddings kept in the article store (new and re-embedded ones
+    are picked up on each call), queries come from a template per ticker, and
+    each query is restricted to its ticker's documents inside the index search.
+    """
+
+    def __init__(self, vector_store, article_store=None, model: str = EMBEDDING_MODEL):
+        self.vector_store = vector_store
+        self.article_store = article_store
+        self.model = model
+        # url -> content hash of the version in the vector store
+        self.indexed_hashes = {}
+        # FAISS indexes are not safe to search while documents are being added
+        self._index_lock = threading.Lock()
+
+    def sync(self) -> int:
+        """
+        Add articles embedded since the last sync, replacing those whose content
+        changed; returns how many documents were added or replaced.
+        """
+        from modules.article_store import get_article_store
+
+        store = self.article_store or get_article_store()
+        with self._index_lock:
+            current = store.embedded_hashes(self.model)
+            stale = {url: h for url, h in current.items() if self.indexed_hashes.get(url) != h}
+            if not stale:
+                return 0
+            metadata, matrix = store.embedded_articles(self.model, sorted(stale))
+            fetched = pd.to_datetime(metadata["fetched_at"], unit="s")
+            self.vector_store.upsert_documents(matrix, [
+                {"Ticker": ticker, "Date": date, "Title": title, "Link": url, "Content": content}
+                for ticker, date, title, url, content in zip(
+                    metadata["ticker"], fetched, metadata["title"], metadata["url"], metadata["content"])
+            ], key="Link")
+            self.indexed_hashes.update(stale)
+            return len(metadata)
+
+    def retrieve(self, tickers: list, top_k: int = 3, template: str = QUERY_TEMPLATE) -> dict:
+        """{ticker: up to top_k documents tagged with that ticker}, nearest first."""
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        self.sync()
+
+        with self._index_lock:
+            if self.vector_store.index.ntotal == 0:
+                return {ticker: [] for ticker in tickers}
+
+        # Encode outside the lock; only the index search has to exclude sync()
+        queries = embed_queries([template.format(ticker=ticker) for ticker in tickers])
+        with self._index_lock:
+            hits = self.vector_store.search_batch(queries, top_k=top_k, query_tickers=tickers)
+        return dict(zip(tickers, hits))
@@ -1,10 +1,212 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import hashlib
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from modules.sqlite_utils import connect
 
-MODEL_NAME = "/Users/utsav/Hacklytics-personal-trade-advisor/finbert_finetuned"
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "finbert_finetuned")
+MODEL_NAME = os.path.normpath(os.environ.get("FINBERT_MODEL_PATH", DEFAULT_MODEL_PATH))
+MAX_LENGTH = 512
+BATCH_SIZE = int(os.environ.get("SENTIMENT_BATCH_SIZE", 32))
+NUM_THREADS = int(os.environ.get("SENTIMENT_NUM_THREADS", 0))  # 0 keeps the runtime's default
+MEMORY_CACHE_SIZE = int(os.environ.get("SENTIMENT_MEMORY_CACHE_SIZE", 10_000))
+CACHE_PATH = os.environ.get("SENTIMENT_CACHE_PATH", "cache/sentiment.sqlite3")
+
+# "torch" (fp32), "int8" (dynamically quantized PyTorch) or "onnx" (ONNX Runtime)
+SENTIMENT_BACKENDS = ("torch", "int8", "onnx")
+BACKEND = os.environ.get("SENTIMENT_BACKEND", "torch")
+ONNX_CACHE_DIR = os.environ.get("SENTIMENT_ONNX_DIR", "cache/onnx")
+
+# Packages each backend needs beyond numpy (see requirements.txt)
+BACKEND_PACKAGES = {
+    "torch": ("torch", "transformers"),
+    "int8": ("torch", "transformers"),
+    "onnx": ("torch", "transformers", "onnxruntime"),
+}
+
+# Either file holds the fine-tuned weights (the repo ships only the config and tokenizer)
+WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin")
+
+# The tokenizer/model are loaded on first use, not at import, so the app starts fast
+_model = None
+_model_lock = threading.Lock()
+
+
+class SentimentBackendError(RuntimeError):
+    """The configured backend cannot run here (missing package, weights or quantized engine)."""
+
+
+class SentimentModel:
+    """FinBERT tokenizer plus one of the CPU inference backends."""
+
+    def __init__(self, model_path: str = MODEL_NAME, backend: str = BACKEND):
+        if backend not in SENTIMENT_BACKENDS:
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+        check_backend(backend, model_path)
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        if NUM_THREADS > 0:
+            torch.set_num_threads(NUM_THREADS)
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        model.eval()
+        # Fall back to the [negative, neutral, positive] layout when labels are unnamed
+        self.positive_idx = _label_index(model.config.id2label, "positive", 2)
+        self.negative_idx = _label_index(model.config.id2label, "negative", 0)
+
+        self.model = None
+        self.session = None
+        if backend == "torch":
+            self.model = model
+        elif backend == "int8":
+            self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.session = _onnx_session(export_onnx(model, model_path))
+
+    def predict_proba(self, texts: list) -> np.ndarray:
+        """Class probabilities for one batch, padded to its longest text."""
+        if self.session is not None:
+            inputs = self.tokenizer(texts, return_tensors="np", padding=True, truncation=True, max_length=MAX_LENGTH)
+            feed = {i.name: inputs[i.name].astype(np.int64) for i in self.session.get_inputs()}
+            logits = self.session.run(None, feed)[0]
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            return exp / exp.sum(axis=1, keepdims=True)
+
+        import torch
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=MAX_LENGTH)
+        with torch.inference_mode():
+            return torch.softmax(self.model(**inputs).logits, dim=1).numpy()
+
+    def score(self, texts: list, batch_size: int = BATCH_SIZE) -> list:
+        """positive - negative probability for each text, in input order."""
+        # Bucket by length so each batch pads only up to a similar-sized longest text
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [0.0] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            probs = self.predict_proba([texts[i] for i in batch_idx])
+            batch_scores = (probs[:, self.positive_idx] - probs[:, self.negative_idx]).tolist()
+            for i, score in zip(batch_idx, batch_scores):
+                results[i] = score
+        return results
+
+
+def check_backend(backend: str, model_path: str = MODEL_NAME) -> None:
+    """
+    Fail early, with the fix in the message, when a backend cannot run: its
+    packages are not installed, the weights are missing, or (int8) PyTorch
+    has no quantized engine on this CPU.
+    """
+    missing = [name for name in BACKEND_PACKAGES[backend] if importlib.util.find_spec(name) is None]
+    if missing:
+        raise SentimentBackendError(
+            f"SENTIMENT_BACKEND={backend} needs {', '.join(missing)} (see requirements.txt) "
+            f"or choose another backend ({', '.join(SENTIMENT_BACKENDS)})"
+        )
+    has_weights = any(os.path.isfile(os.path.join(model_path, name)) for name in WEIGHT_FILES)
+    if not os.path.isfile(os.path.join(model_path, "config.json")) or not has_weights:
+        raise SentimentBackendError(f"No FinBERT weights in {model_path}; set FINBERT_MODEL_PATH")
+    if backend == "int8":
+        import torch
+        if not [engine for engine in torch.backends.quantized.supported_engines if engine != "none"]:
+            raise SentimentBackendError("SENTIMENT_BACKEND=int8 needs a PyTorch build with a quantized engine "
+                                        "(fbgemm or qnnpack); use torch or onnx instead")
+
+
+@lru_cache(maxsize=None)
+def weights_fingerprint(model_path: str = MODEL_NAME) -> str:
+    """
+    Short hash of the name, size and mtime of every file in the model
+    directory, so retrained or replaced weights at the same path get their own
+    cache entries and ONNX export. Computed once per process, like the model.
+    """
+    try:
+        names = sorted(os.listdir(model_path))
+    except OSError:
+        names = []
+    entries = []
+    for name in names:
+        stat = os.stat(os.path.join(model_path, name))
+        entries.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()[:12]
+
+
+def model_id() -> str:
+    """Identifies the FinBERT weights and backend that produce scores."""
+    return f"{MODEL_NAME}@{weights_fingerprint(MODEL_NAME)}:{BACKEND}"
+
+
+def _label_index(id2label: dict, name: str, default: int) -> int:
+    for idx, label in id2label.items():
+        if str(label).lower() == name:
+            return int(idx)
+    return default
+
+
+def export_onnx(model, model_path: str) -> str:
+    """
+    Export the classifier to ONNX once and reuse the file afterwards. The file
+    name is derived from the model path and weights fingerprint, so retraining
+    the model produces a fresh export.
+    """
+    import torch
+
+    stamp = f"{os.path.abspath(model_path)}:{weights_fingerprint(model_path)}".encode("utf-8")
+    onnx_path = os.path.join(ONNX_CACHE_DIR, f"finbert-{hashlib.sha1(stamp).hexdigest()[:12]}.onnx")
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    dummy = {
+        "input_ids": torch.ones((1, 8), dtype=torch.long),
+        "attention_mask": torch.ones((1, 8), dtype=torch.long),
+        "token_type_ids": torch.zeros((1, 8), dtype=torch.long),
+    }
+    dynamic = {0: "batch", 1: "sequence"}
+    tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        tmp_path,
+        input_names=list(dummy),
+        output_names=["logits"],
+        dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "token_type_ids": dynamic, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    # Atomic publish so concurrent workers never load a half-written graph
+    os.replace(tmp_path, onnx_path)
+    return onnx_path
+
+
+def _onnx_session(onnx_path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if NUM_THREADS > 0:
+        options.intra_op_num_threads = NUM_THREADS
+    return ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def get_model() -> SentimentModel:
+    """Thread-safe lazy singleton for the configured FinBERT backend."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = SentimentModel(MODEL_NAME, BACKEND)
+    return _model
+
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, local_files_only=True)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, local_files_only=True)
 
 def get_sentiment(text: str) -> float:
     """
@@ -14,9 +216,74 @@ def get_sentiment(text: str) -> float:
     sentiment_score = positive_score - negative_score.
     Adjust according to your model's specifics.
     """
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    scores = torch.softmax(outputs.logits, dim=1)[0].tolist()  
-    sentiment_score = scores[2] - scores[0]
-    return sentiment_score
+    return get_sentiment_batch([text])[0]
+
+
+def get_sentiment_batch(texts: list, batch_size: int = BATCH_SIZE) -> list:
+    """
+    Score many texts at once. Results come from the in-memory LRU, then the
+    on-disk cache; only texts never seen before go through the model, in
+    length-sorted batches padded to the longest text of each batch.
+    """
+    keys = [_text_key(text) for text in texts]
+    scores = _cached_scores(set(keys))
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in scores:
+            pending[key] = text
+    if pending:
+        computed = get_model().score(list(pending.values()), batch_size)
+        new_scores = dict(zip(pending.keys(), computed))
+        _store_scores(new_scores)
+        scores.update(new_scores)
+
+    return [scores[key] for key in keys]
+
+
+def _text_key(text: str) -> str:
+    # Backends (and retrained weights) differ in their scores, so each keeps its own cache entries
+    return hashlib.sha256(f"{model_id()}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _cache_conn():
+    conn = connect(CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS sentiment_cache (text_hash TEXT PRIMARY KEY, score REAL NOT NULL)")
+    return conn
+
+
+def _cached_scores(keys: set) -> dict:
+    found = {}
+    with _memory_lock:
+        for key in keys:
+            if key in _memory_cache:
+                _memory_cache.move_to_end(key)
+                found[key] = _memory_cache[key]
+    missing = [key for key in keys if key not in found]
+    if missing:
+        conn = _cache_conn()
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_hash, score FROM sentiment_cache WHERE text_hash IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(rows)
+        _remember({key: found[key] for key in missing if key in found})
+    return found
+
+
+def _store_scores(scores: dict) -> None:
+    conn = _cache_conn()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO sentiment_cache (text_hash, score) VALUES (?, ?)", scores.items())
+    _remember(scores)
+
+
+def _remember(scores: dict) -> None:
+    with _memory_lock:
+        for key, score in scores.items():
+            _memory_cache[key] = score
+            _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
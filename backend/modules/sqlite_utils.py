@@ -0,0 +1,25 @@
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Per-thread SQLite connection for the on-disk caches and stores. WAL mode
+    lets several worker processes read while one writes.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
@@ -1,5 +1,21 @@
+import os
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+
+# Candidate cluster counts, scored by silhouette on a sample of the round-trips
+CLUSTER_MIN_K = int(os.environ.get("CLUSTER_MIN_K", 2))
+CLUSTER_MAX_K = int(os.environ.get("CLUSTER_MAX_K", 6))
+CLUSTER_SAMPLE_SIZE = int(os.environ.get("CLUSTER_SAMPLE_SIZE", 2000))
+# Above this many round-trips, MiniBatchKMeans fits a subsample and every trade is then assigned
+MINIBATCH_THRESHOLD = int(os.environ.get("CLUSTER_MINIBATCH_THRESHOLD", 20_000))
+MINIBATCH_FIT_SIZE = int(os.environ.get("CLUSTER_MINIBATCH_FIT_SIZE", 100_000))
+MINIBATCH_BATCH_SIZE = 4096
+# A warm start keeps the stored k only while the history stays within this factor of
+# the size k was selected on; beyond it, k is chosen again by silhouette
+RESELECT_K_FACTOR = float(os.environ.get("CLUSTER_RESELECT_K_FACTOR", 2.0))
+
+FEATURE_NAMES = ["HoldDays", "Profit", "Return", "Size", "IsOption", "Win"]
+
 
 def flatten_dict_keys(d: dict) -> dict:
     """
@@ -14,19 +30,210 @@ def flatten_dict_keys(d: dict) -> dict:
         new_d[new_key] = value
     return new_d
 
-def analyze_trade_patterns(trade_metrics: pd.DataFrame) -> dict:
-    features = trade_metrics[["Duration", "Profit"]].dropna().values
-    if len(features) < 2:
+
+def trade_features(trade_metrics: pd.DataFrame):
+    """
+    Behavioural features per round-trip, as (matrix, valid row mask). Hold
+    time, P&L and position size are heavy-tailed, so they are log-scaled
+    (P&L keeping its sign) before standardization.
+    """
+    n = len(trade_metrics)
+
+    def column(name):
+        if name not in trade_metrics.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(trade_metrics[name], errors="coerce").to_numpy(dtype=float)
+
+    duration = column("Duration")
+    profit = column("Profit")
+    quantity = np.abs(column("Quantity"))
+    buy_price = column("BuyPrice")
+    sell_price = column("SellPrice")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(buy_price > 0, (sell_price - buy_price) / buy_price, 0.0)
+    if "OptionType" in trade_metrics.columns:
+        is_option = trade_metrics["OptionType"].notna().to_numpy(dtype=float)
+    else:
+        # Without contract info the column is constant, which standardization gives no weight
+        is_option = np.zeros(n)
+
+    features = np.column_stack([
+        np.log1p(np.clip(duration, 0, None)),
+        np.sign(profit) * np.log1p(np.abs(profit)),
+        np.clip(np.nan_to_num(ret, nan=0.0, posinf=0.0, neginf=0.0), -1.0, 5.0),
+        np.log1p(np.nan_to_num(quantity * buy_price, nan=0.0)),
+        is_option,
+        (profit > 0).astype(float),
+    ])
+    valid = ~np.isnan(duration) & ~np.isnan(profit)
+    return features, valid
+
+
+class TradeClusterer:
+    """
+    K-means over standardized trade features. k is chosen by silhouette score
+    on a sample; large histories are fitted with MiniBatchKMeans on a
+    subsample and every trade is then assigned to its nearest centroid.
+
+    The fitted model is kept in to_state()/from_state() form, so the next fit
+    for the same user starts from the previous centroids (same k, one init),
+    which is faster and keeps cluster numbers stable between requests. Once
+    the history has grown or shrunk by more than RESELECT_K_FACTOR since k
+    was chosen, k is chosen again instead.
+    """
+
+    def __init__(self, min_k: int = CLUSTER_MIN_K, max_k: int = CLUSTER_MAX_K,
+                 sample_size: int = CLUSTER_SAMPLE_SIZE, random_state: int = 42):
+        self.min_k = min_k
+        self.max_k = max_k
+        self.sample_size = sample_size
+        self.random_state = random_state
+        self.centroids = None  # in raw feature space, so they survive a change of scaling
+        self.mean = None
+        self.scale = None
+        self.k = None
+        self.k_selected_on = None  # number of rows k was chosen for
+        self.silhouette = None
+        self.method = None
+        self.warm_started = False
+
+    def to_state(self) -> dict:
+        return {
+            "features": FEATURE_NAMES,
+            "k": self.k,
+            "k_selected_on": self.k_selected_on,
+            "centroids": None if self.centroids is None else self.centroids.tolist(),
+            "mean": None if self.mean is None else self.mean.tolist(),
+            "scale": None if self.scale is None else self.scale.tolist(),
+            "silhouette": self.silhouette,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, **kwargs) -> "TradeClusterer":
+        clusterer = cls(**kwargs)
+        if state and state.get("features") == FEATURE_NAMES and state.get("centroids"):
+            clusterer.centroids = np.asarray(state["centroids"], dtype=float)
+            clusterer.k = int(state["k"])
+            clusterer.k_selected_on = state.get("k_selected_on")
+            clusterer.silhouette = state.get("silhouette")
+            if state.get("mean") is not None:
+                clusterer.mean = np.asarray(state["mean"], dtype=float)
+                clusterer.scale = np.asarray(state["scale"], dtype=float)
+        return clusterer
+
+    def fit_predict(self, features: np.ndarray) -> np.ndarray:
+        """Cluster label per row of `features` (rows must be finite)."""
+        from sklearn.cluster import KMeans, MiniBatchKMeans  # deferred: scikit-learn is slow to import
+
+        rng = np.random.default_rng(self.random_state)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0  # constant features (e.g. all options) carry no weight
+        scaled = (features - mean) / scale
+
+        self.warm_started = self.centroids is not None and self.k <= len(scaled) and self._k_still_fits(len(scaled))
+        if self.warm_started:
+            k = self.k
+            init = (self.centroids - mean) / scale
+        else:
+            k, init = self._choose_k(scaled, rng)
+            self.k_selected_on = len(scaled)
+
+        if len(scaled) > MINIBATCH_THRESHOLD:
+            self.method = "minibatch"
+            fit_rows = scaled[rng.choice(len(scaled), min(MINIBATCH_FIT_SIZE, len(scaled)), replace=False)]
+            model = MiniBatchKMeans(n_clusters=k, init=init, n_init=1, batch_size=MINIBATCH_BATCH_SIZE,
+                                    max_iter=20, random_state=self.random_state).fit(fit_rows)
+        else:
+            self.method = "kmeans"
+            model = KMeans(n_clusters=k, init=init, n_init=1, random_state=self.random_state).fit(scaled)
+        centers = model.cluster_centers_
+
+        if not self.warm_started:
+            # Number fresh clusters by typical hold time, shortest first
+            centers = centers[np.argsort(centers[:, 0], kind="stable")]
+        self.k = k
+        self.centroids = centers * scale + mean
+        self.mean, self.scale = mean, scale
+        return _nearest(scaled, centers)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Labels from the last fit, without refitting (e.g. for one page of round-trips)."""
+        if self.centroids is None or self.mean is None:
+            raise ValueError("TradeClusterer has not been fitted")
+        return _nearest((features - self.mean) / self.scale, (self.centroids - self.mean) / self.scale)
+
+    def _k_still_fits(self, n_rows: int) -> bool:
+        # States saved before k_selected_on was recorded get one fresh selection
+        if not self.k_selected_on:
+            return False
+        return self.k_selected_on / RESELECT_K_FACTOR <= n_rows <= self.k_selected_on * RESELECT_K_FACTOR
+
+    def _choose_k(self, scaled: np.ndarray, rng):
+        from sklearn.cluster import KMeans
+        from sklearn.metrics import silhouette_score
+
+        sample = scaled[rng.choice(len(scaled), min(self.sample_size, len(scaled)), replace=False)]
+        best = None
+        for k in range(self.min_k, min(self.max_k, len(sample) - 1) + 1):
+            model = KMeans(n_clusters=k, n_init=3, random_state=self.random_state).fit(sample)
+            if len(np.unique(model.labels_)) < 2:
+                continue
+            score = float(silhouette_score(sample, model.labels_))
+            if best is None or score > best[0]:
+                best = (score, k, model.cluster_centers_)
+        if best is None:
+            # Degenerate sample (e.g. all identical trades): fall back to the smallest k
+            k = max(1, min(self.min_k, len(sample)))
+            self.silhouette = None
+            return k, sample[rng.choice(len(sample), k, replace=False)]
+        self.silhouette = best[0]
+        return best[1], best[2]
+
+
+def _nearest(points: np.ndarray, centers: np.ndarray, chunk: int = 262_144) -> np.ndarray:
+    labels = np.empty(len(points), dtype=np.int64)
+    center_norms = (centers ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        labels[start:start + chunk] = np.argmin(center_norms - 2.0 * block @ centers.T, axis=1)
+    return labels
+
+
+def analyze_trade_patterns(trade_metrics: pd.DataFrame, clusterer: TradeClusterer = None) -> dict:
+    """
+    Cluster the round-trips and summarize each cluster. Pass the user's
+    previous TradeClusterer (see TradeClusterer.from_state) to warm-start.
+    Only aggregates are returned; trade-level rows (with their "Cluster"
+    label, added to `trade_metrics`) are served separately, page by page.
+    """
+    features, valid = trade_features(trade_metrics)
+    if valid.sum() < 2:
         return {"message": "Not enough data to analyze patterns."}
-    
-    kmeans = KMeans(n_clusters=2, random_state=42).fit(features)
-    trade_metrics["Cluster"] = kmeans.labels_
-    summary = trade_metrics.groupby("Cluster").agg({
-        "Duration": "mean",
-        "Profit": ["mean", "count"]
-    }).to_dict()
-    
+
+    clusterer = clusterer or TradeClusterer()
+    labels = clusterer.fit_predict(features[valid])
+    cluster = np.full(len(trade_metrics), -1, dtype=np.int64)
+    cluster[valid] = labels
+    trade_metrics["Cluster"] = cluster
+
+    clustered = trade_metrics[valid].assign(Win=features[valid, FEATURE_NAMES.index("Win")])
+    aggregations = {"Duration": "mean", "Profit": ["mean", "count"], "Quantity": "mean", "Win": "mean"}
+    summary = clustered.groupby("Cluster").agg(
+        {col: agg for col, agg in aggregations.items() if col in clustered.columns}
+    ).to_dict()
+
     # Flatten the tuple keys in the summary dictionary.
     flat_summary = flatten_dict_keys(summary)
-    
-    return {"clusters": flat_summary, "trade_data": trade_metrics.to_dict(orient="records")}
+
+    return {
+        "clusters": flat_summary,
+        "clustering": {
+            "k": clusterer.k,
+            "silhouette": clusterer.silhouette,
+            "method": clusterer.method,
+            "warm_start": clusterer.warm_started,
+            "k_selected_on": clusterer.k_selected_on,
+            "features": FEATURE_NAMES,
+        },
+    }
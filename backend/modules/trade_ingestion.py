@@ -4,6 +4,33 @@ import io
 import csv
 import numpy as np
 
+# Rename columns for consistency
+RENAME_MAP = {
+    "Activity Date": "activity_date",
+    "Process Date": "process_date",
+    "Settle Date": "settle_date",
+    "Instrument": "instrument",
+    "Description": "description",
+    "Trans Code": "trade_code",
+    "Quantity": "quantity",
+    "Price": "price",
+    "Amount": "amount"
+}
+
+TRADE_CODE_MAP = {
+    "BTO": "Buy to Open",
+    "STC": "Sell to Close"
+}
+
+# Characters dropped from amounts like "($1,110.00)" before numeric conversion
+AMOUNT_STRIP_TABLE = str.maketrans("", "", "$,()")
+
+# e.g. "AAPL 3/15/2024 Call $180.00"
+OPTION_PATTERN = re.compile(
+    r"(?P<symbol>\S+)\s+(?P<expiration>\d{1,2}/\d{1,2}/\d{4})\s+(?P<option_type>Call|Put)\s+\$(?P<strike>\d+(?:\.\d+)?)"
+)
+
+
 def parse_robinhood_csv(file_content: bytes) -> pd.DataFrame:
     # Parse CSV columns
     df = pd.read_csv(
@@ -11,78 +38,85 @@ def parse_robinhood_csv(file_content: bytes) -> pd.DataFrame:
         on_bad_lines='skip',         # Skip problematic lines
         quoting=csv.QUOTE_MINIMAL
     )
-    
-    # Rename columns for consistency
-    rename_map = {
-        "Activity Date": "activity_date",
-        "Process Date": "process_date",
-        "Settle Date": "settle_date",
-        "Instrument": "instrument",
-        "Description": "description",
-        "Trans Code": "trade_code",
-        "Quantity": "quantity",
-        "Price": "price",
-        "Amount": "amount"
-    }
-    for old_col, new_col in rename_map.items():
-        if old_col in df.columns:
-            df.rename(columns={old_col: new_col}, inplace=True)
-    
-    # Convert date columns and replace NaT with None
+    return normalize_trades(df)
+
+
+def iter_robinhood_csv(file_obj, chunksize: int = 50_000):
+    """
+    Stream a Robinhood export from an open binary file, yielding normalized
+    frames of at most `chunksize` rows so the whole file is never in memory.
+    """
+    reader = pd.read_csv(
+        file_obj,
+        on_bad_lines='skip',
+        quoting=csv.QUOTE_MINIMAL,
+        chunksize=chunksize
+    )
+    with reader:
+        for chunk in reader:
+            yield normalize_trades(chunk)
+
+
+def normalize_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Standardize a raw Robinhood frame using column-wise pandas operations.
+    Missing values are left as NaN/NaT; callers persisting rows convert them to None.
+    """
+    df = df.rename(columns=RENAME_MAP)
+
     for col in ["activity_date", "process_date", "settle_date"]:
         if col in df.columns:
             df[col] = pd.to_datetime(df[col], errors="coerce")
-            df[col] = df[col].apply(lambda x: x if pd.notna(x) else None)
-    
-    # Convert numeric columns and replace NaN with None
-    for col in ["quantity", "price"]:
+
+    if "quantity" in df.columns:
+        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce")
+
+    # Prices are quoted like "$3.10" and amounts like "($1,110.00)"
+    for col in ["price", "amount"]:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-            df[col] = df[col].apply(lambda x: x if pd.notna(x) else None)
-    
-    if "amount" in df.columns:
-        # Convert amount to string and parse, then replace NaN with None
-        df["amount"] = df["amount"].astype(str)
-        df["amount"] = df["amount"].apply(parse_amount_string)
-        df["amount"] = df["amount"].apply(lambda x: x if pd.notna(x) else None)
-    
-    # Create additional columns for parsed data
-    df["parsed_action"] = None
-    df["option_type"] = None
-    df["strike_price"] = None
-    df["option_expiration"] = None
-    
-    trade_code_map = {
-        "BTO": "Buy to Open",
-        "STC": "Sell to Close"
-    }
-    
-    for idx, row in df.iterrows():
-        desc = str(row.get("description", ""))
-        code = str(row.get("trade_code", "")).upper().strip()
-        
-        parsed_action = trade_code_map.get(code, None)
-        
-        # Try to extract option details
-        match = re.search(r"(\S+)\s+(\d{1,2}/\d{1,2}/\d{4})\s+(Call|Put)\s+\$(\d+(\.\d+)?)", desc)
-        if match:
-            df.at[idx, "option_type"] = match.group(3)
-            df.at[idx, "option_expiration"] = match.group(2)
-            df.at[idx, "strike_price"] = float(match.group(4))
-            if "Assigned" in desc:
-                parsed_action = "Assigned"
-            elif "Expiration" in desc:
-                parsed_action = "Expired"
-        
-        if not parsed_action:
-            parsed_action = "Unknown"
-        
-        df.at[idx, "parsed_action"] = parsed_action
-    
-    df = df.where(pd.notna(df), None)
-    df = df.replace({pd.NaT: None})
+            df[col] = parse_amount_series(df[col])
+
+    # Descriptions and trade codes repeat heavily, so parse each distinct value once
+    desc_codes, desc = _factorize_strings(df, "description")
+    code_codes, code = _factorize_strings(df, "trade_code")
+    parsed_action = code.str.upper().str.strip().map(TRADE_CODE_MAP).take(code_codes)
+
+    # Extract option details
+    options = desc.str.extract(OPTION_PATTERN).take(desc_codes)
+    is_option = options["option_type"].notna().to_numpy()
+    assigned = is_option & desc.str.contains("Assigned", regex=False).take(desc_codes).to_numpy()
+    expired = is_option & ~assigned & desc.str.contains("Expiration", regex=False).take(desc_codes).to_numpy()
+    parsed_action = parsed_action.mask(assigned, "Assigned").mask(expired, "Expired")
+
+    df["parsed_action"] = parsed_action.fillna("Unknown").to_numpy(dtype=object)
+    df["option_type"] = options["option_type"].to_numpy(dtype=object)
+    df["strike_price"] = pd.to_numeric(options["strike"]).to_numpy()
+    df["option_expiration"] = options["expiration"].to_numpy(dtype=object)
+
     return df
 
+
+def _factorize_strings(df: pd.DataFrame, col: str):
+    """
+    Return (codes, uniques) for a column rendered as strings. Missing columns and
+    values behave like str(NaN) == "nan", which never matches a pattern.
+    """
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.intp), pd.Series([""], dtype=object)
+    codes, uniques = pd.factorize(df[col].astype(str))
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def parse_amount_series(values: pd.Series) -> pd.Series:
+    # Convert strings like "($110.00)" or "$120.00" into floats, column-wise (amounts and prices).
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    s = values.astype(str).str.strip()
+    negative = (s.str.startswith("(") & s.str.endswith(")")).to_numpy()
+    amounts = pd.to_numeric(s.str.translate(AMOUNT_STRIP_TABLE), errors="coerce")
+    return amounts.mask(negative, -amounts)
+
+
 def parse_amount_string(val: str) -> float:
     # Convert strings like "($110.00)" or "$120.00" into floats.
     val = val.strip()
@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+from modules.preprocessing import CONTRACT_MULTIPLIER
+
+POSITION_COLUMNS = [
+    "LotID", "Ticker", "OptionType", "Strike", "Expiration", "OpenDate", "Quantity", "Price",
+    "MarkDate", "Underlying", "Mark", "MarketValue", "CostBasis", "UnrealizedPnL", "Return",
+]
+
+
+def value_open_positions(open_positions: pd.DataFrame, price_history: pd.DataFrame, as_of=None,
+                         by_ticker: bool = False) -> dict:
+    """
+    Mark the open lots (LotMatcher.open_positions()) to market against daily
+    closes from the price store (get_price_history), and build the daily
+    equity curve of those lots from the first open date to `as_of` (default:
+    the last price date).
+
+    Prices come from as-of joins (merge_asof by ticker), so weekends, holidays
+    and gaps in a ticker's history use the last close on or before the date,
+    and every ticker is handled in the same join rather than one at a time.
+    Options are marked at intrinsic value on the underlying's close, frozen
+    at expiration for lots that were never closed. Lot prices and marks are
+    per share; values are in dollars, like realized P&L, so option lots count
+    CONTRACT_MULTIPLIER shares per contract. Lots with no price yet are
+    carried at cost.
+
+    Returns portfolio totals, one row per lot, per-ticker totals and the
+    equity curve; with `by_ticker`, also each ticker's curve as one array
+    per field.
+    """
+    lots = _lots(open_positions)
+    prices = _closes(price_history)
+    if lots.empty:
+        return _empty_valuation(by_ticker)
+    if as_of is None:
+        # Last price date, or the latest open date when prices lag behind it
+        as_of = max(prices["date"].max(), lots["OpenDate"].max()) if not prices.empty else lots["OpenDate"].max()
+    as_of = pd.Timestamp(as_of).normalize()
+    lots = lots[lots["OpenDate"] <= as_of].copy()
+    if lots.empty:
+        return _empty_valuation(by_ticker)
+
+    # 1) Current mark per lot
+    lots["PriceDate"] = _price_dates(lots["Expiration"], as_of)
+    marked = _asof_close(lots, prices, "PriceDate").sort_values("LotID", kind="stable")
+    marked = marked.rename(columns={"close": "Underlying", "date": "MarkDate"})
+    unit = _intrinsic(marked["Underlying"].to_numpy(dtype=float), marked["OptionType"].to_numpy(dtype=object),
+                      marked["Strike"].to_numpy(dtype=float))
+    marked["Mark"] = unit
+    marked["Unpriced"] = np.isnan(unit)
+    marked["CostBasis"] = marked["Shares"] * marked["Price"]
+    marked["MarketValue"] = np.where(np.isnan(unit), marked["CostBasis"], marked["Shares"] * unit)
+    marked["UnrealizedPnL"] = marked["MarketValue"] - marked["CostBasis"]
+    marked["Return"] = marked["UnrealizedPnL"] / marked["CostBasis"].where(marked["CostBasis"] > 0)
+
+    per_ticker = marked.groupby("Ticker", sort=True).agg(
+        lots=("LotID", "size"),
+        market_value=("MarketValue", "sum"),
+        cost_basis=("CostBasis", "sum"),
+        unrealized_pnl=("UnrealizedPnL", "sum"),
+        unpriced_lots=("Unpriced", "sum"),
+    ).reset_index().rename(columns={"Ticker": "ticker"})
+    per_ticker = per_ticker.sort_values("market_value", ascending=False, kind="stable")
+
+    # 2) Daily equity curve of the open book
+    calendar, tickers, market_values, costs = _equity_curves(lots, prices, as_of)
+    dates = pd.DatetimeIndex(calendar).strftime("%Y-%m-%d").tolist()
+
+    cost_basis = float(marked["CostBasis"].sum())
+    market_value = float(marked["MarketValue"].sum())
+    valuation = {
+        "portfolio": {
+            "as_of": as_of.date().isoformat(),
+            "lots": int(len(marked)),
+            "tickers": int(per_ticker["ticker"].nunique()),
+            "market_value": market_value,
+            "cost_basis": cost_basis,
+            "unrealized_pnl": market_value - cost_basis,
+            "return": (market_value - cost_basis) / cost_basis if cost_basis > 0 else None,
+            "unpriced_lots": int(marked["Unpriced"].sum()),
+        },
+        "positions": _records(marked[POSITION_COLUMNS]),
+        "per_ticker": _records(per_ticker),
+        "equity_curve": _records(_curve(dates, market_values.sum(axis=0), costs.sum(axis=0))),
+    }
+    if by_ticker:
+        # One array per field, each ticker's curve starting on its first open date
+        first_open = np.searchsorted(calendar, lots.groupby("Ticker", sort=True)["OpenDate"].min().to_numpy())
+        valuation["equity_curve_by_ticker"] = {
+            ticker: {field: values[first:] for field, values in _curve(dates, market_value, cost).items()}
+            for ticker, first, market_value, cost in zip(tickers, first_open, market_values, costs)
+        }
+    return valuation
+
+
+def _lots(open_positions: pd.DataFrame) -> pd.DataFrame:
+    if open_positions is None or open_positions.empty:
+        return pd.DataFrame()
+    lots = open_positions.reset_index(drop=True).copy()
+    lots["OpenDate"] = pd.to_datetime(lots["OpenDate"]).dt.normalize()
+    lots["Strike"] = pd.to_numeric(lots["Strike"], errors="coerce")
+    # Robinhood writes expirations as m/d/YYYY
+    lots["Expiration"] = pd.to_datetime(lots["Expiration"], format="%m/%d/%Y", errors="coerce")
+    lots["Quantity"] = pd.to_numeric(lots["Quantity"], errors="coerce").fillna(0.0)
+    lots["Price"] = pd.to_numeric(lots["Price"], errors="coerce").fillna(0.0)
+    lots["Shares"] = lots["Quantity"] * np.where(lots["OptionType"].isin(["Call", "Put"]), CONTRACT_MULTIPLIER, 1)
+    lots = lots[lots["OpenDate"].notna()].copy()
+    # Same contract -> same instrument; equities are keyed by ticker alone. Numbered in ticker order.
+    lots["Instrument"] = lots.groupby(
+        ["Ticker", "OptionType", "Strike", "Expiration"], dropna=False, sort=True
+    ).ngroup()
+    return lots
+
+
+def _closes(price_history: pd.DataFrame) -> pd.DataFrame:
+    if price_history is None or price_history.empty:
+        return pd.DataFrame({"ticker": pd.Series(dtype=object), "date": pd.Series(dtype="datetime64[ns]"),
+                             "close": pd.Series(dtype=float)})
+    prices = pd.DataFrame({
+        "ticker": price_history["ticker"].astype(object),
+        "date": pd.to_datetime(price_history["date"]).dt.normalize(),
+        "close": pd.to_numeric(price_history["close"], errors="coerce"),
+    }).dropna()
+    return prices.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+def _price_dates(expiration: pd.Series, as_of: pd.Timestamp) -> np.ndarray:
+    # An option's underlying is read at expiration once it has passed
+    expiration = expiration.to_numpy(dtype="datetime64[ns]")
+    return np.where(~np.isnat(expiration) & (expiration < as_of.to_datetime64()), expiration, as_of.to_datetime64())
+
+
+def _asof_close(frame: pd.DataFrame, prices: pd.DataFrame, on: str) -> pd.DataFrame:
+    """Attach the last close (and its date) on or before `frame[on]`, per ticker."""
+    left = frame.sort_values(on, kind="stable")
+    return pd.merge_asof(
+        left, prices, left_on=on, right_on="date", left_by="Ticker", right_by="ticker", direction="backward"
+    ).drop(columns="ticker")
+
+
+def _intrinsic(underlying, option_type, strike):
+    # Equities are worth their close, calls and puts their intrinsic value (NaN stays NaN)
+    return np.where(option_type == "Call", np.maximum(underlying - strike, 0.0),
+                    np.where(option_type == "Put", np.maximum(strike - underlying, 0.0), underlying))
+
+
+def _equity_curves(lots: pd.DataFrame, prices: pd.DataFrame, as_of: pd.Timestamp, block: int = 1024):
+    """
+    Daily market value and cost of the lots per ticker, as (calendar,
+    tickers, market_value[ticker, day], cost[ticker, day]). Days are the
+    trading days in the price history from the first open date to `as_of`
+    (business days when there are none).
+
+    Closes are laid out as a dense (ticker x day) matrix with one as-of join,
+    so each instrument's daily unit value is a fancy-index into it; shares
+    and cost are cumulative sums of the lots' open-date steps. Instruments
+    are processed in blocks to bound memory for option-heavy books.
+    """
+    start = lots["OpenDate"].min()
+    calendar = prices["date"].drop_duplicates().to_numpy(dtype="datetime64[ns]")
+    calendar = calendar[(calendar >= start.to_datetime64()) & (calendar <= as_of.to_datetime64())]
+    if len(calendar) == 0:
+        calendar = pd.bdate_range(start, as_of).to_numpy(dtype="datetime64[ns]")
+    calendar = np.unique(np.r_[calendar, start.to_datetime64(), as_of.to_datetime64()])
+    n_days = len(calendar)
+
+    ticker_codes, tickers = pd.factorize(lots["Ticker"], sort=True)
+    grid = pd.DataFrame({
+        "Ticker": np.repeat(np.asarray(tickers, dtype=object), n_days),
+        "date": np.tile(calendar, len(tickers)),
+        "cell": np.arange(len(tickers) * n_days),
+    })
+    joined = pd.merge_asof(grid.sort_values("date", kind="stable"), prices, on="date",
+                           left_by="Ticker", right_by="ticker", direction="backward")
+    closes = np.empty(len(grid))
+    closes[joined["cell"].to_numpy()] = joined["close"].to_numpy(dtype=float)
+    closes = closes.reshape(len(tickers), n_days)
+
+    # Per instrument: ticker, contract terms, and day index of each lot's open and of expiration
+    lots = lots.assign(TickerCode=ticker_codes, OpenDay=np.searchsorted(calendar, lots["OpenDate"].to_numpy()))
+    instruments = lots.drop_duplicates("Instrument").set_index("Instrument").sort_index()
+    expiration = instruments["Expiration"].to_numpy(dtype="datetime64[ns]")
+    last_day = np.where(np.isnat(expiration), n_days - 1,
+                        np.searchsorted(calendar, expiration, side="right") - 1).clip(0)
+    inst_ticker = instruments["TickerCode"].to_numpy()
+    option_type = instruments["OptionType"].to_numpy(dtype=object)
+    strike = instruments["Strike"].to_numpy(dtype=float)
+    # Flat (instrument, open day) cell of every lot, for the step bincounts
+    cell = np.searchsorted(instruments.index.to_numpy(), lots["Instrument"].to_numpy()) * n_days + lots["OpenDay"].to_numpy()
+    lot_shares = lots["Shares"].to_numpy(dtype=float)
+    lot_cost = lot_shares * lots["Price"].to_numpy(dtype=float)
+
+    market_values = np.zeros((len(tickers), n_days))
+    costs = np.zeros((len(tickers), n_days))
+    days = np.arange(n_days)
+    for first in range(0, len(instruments), block):
+        stop = min(first + block, len(instruments))
+        in_block = (cell >= first * n_days) & (cell < stop * n_days)
+        shape = (stop - first, n_days)
+        offset = cell[in_block] - first * n_days
+        shares = np.bincount(offset, lot_shares[in_block], shape[0] * n_days).reshape(shape).cumsum(axis=1)
+        cost = np.bincount(offset, lot_cost[in_block], shape[0] * n_days).reshape(shape).cumsum(axis=1)
+
+        # Underlying close each day, frozen at expiration for options
+        underlying = closes[inst_ticker[first:stop, None], np.minimum(days, last_day[first:stop, None])]
+        unit = _intrinsic(underlying, option_type[first:stop, None], strike[first:stop, None])
+        value = np.where(np.isnan(unit), cost, shares * np.nan_to_num(unit))
+
+        # Instruments are in ticker order, so each ticker is one run of rows
+        codes = inst_ticker[first:stop]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        market_values[codes[starts]] += np.add.reduceat(value, starts, axis=0)
+        costs[codes[starts]] += np.add.reduceat(cost, starts, axis=0)
+    return calendar, list(tickers), market_values, costs
+
+
+def _curve(dates: list, market_value: np.ndarray, cost: np.ndarray) -> dict:
+    return {
+        "date": dates,
+        "market_value": market_value.tolist(),
+        "cost_basis": cost.tolist(),
+        "unrealized_pnl": (market_value - cost).tolist(),
+    }
+
+
+def _records(columns) -> list:
+    """Row dicts from a frame or a dict of columns, with dates as ISO strings and NaN/NaT as None."""
+    values = {}
+    for name, column in columns.items():
+        column = pd.Series(column)
+        if pd.api.types.is_datetime64_any_dtype(column):
+            column = column.dt.strftime("%Y-%m-%d")
+        values[name] = column.astype(object).where(column.notna(), None).tolist()
+    return [dict(zip(values, row)) for row in zip(*values.values())]
+
+
+def _empty_valuation(by_ticker: bool) -> dict:
+    valuation = {
+        "portfolio": {"as_of": None, "lots": 0, "tickers": 0, "market_value": 0.0, "cost_basis": 0.0,
+                      "unrealized_pnl": 0.0, "return": None, "unpriced_lots": 0},
+        "positions": [],
+        "per_ticker": [],
+        "equity_curve": [],
+    }
+    if by_ticker:
+        valuation["equity_curve_by_ticker"] = {}
+    return valuation
@@ -0,0 +1,43 @@
+# backend/tests/conftest.py
+import importlib
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# Tests import backend modules the way app.py does (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from database import db  # noqa: E402
+import models  # noqa: E402,F401  (registers the tables)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Bare Flask app on a throwaway SQLite database, inside an application context."""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'trades.sqlite3'}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client for app.py on an emptied in-memory database, logged in as user 1."""
+    # app.py creates its tables on import, so point it at an in-memory database first
+    monkeypatch.setattr(config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+    flask_app = importlib.import_module("app").app
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    return client
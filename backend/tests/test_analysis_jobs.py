@@ -0,0 +1,113 @@
+# backend/tests/test_analysis_jobs.py
+import datetime
+import json
+
+import pytest
+
+import analysis_pipeline
+from analysis_pipeline import queued_analysis_jobs, requeue_stale_analysis_jobs, run_analysis_job
+from database import db
+from models import AnalysisJob
+
+
+def _job(job_id, user_id=1, **columns):
+    db.session.add(AnalysisJob(id=job_id, user_id=user_id, **columns))
+    db.session.commit()
+
+
+def _stored(job_id):
+    """The job's row as another process would read it."""
+    db.session.expire_all()
+    return db.session.get(AnalysisJob, job_id).to_dict()
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stand-in analysis that records what the job row looked like while it ran."""
+    seen = []
+
+    def prepare(user_id, retriever, on_stage):
+        seen.append(_stored("job"))
+        on_stage("trade_metrics", 0.25, {"round_trips": 3, "open_lots": 0})
+        seen.append(_stored("job"))
+        on_stage("patterns", 0.5, {"clusters": {}})
+        return {
+            "pattern_analysis": {"clusters": {}}, "market_summary": {"market": {}},
+            "profit_by_ticker": [{"ticker": "AAPL", "total_profit": 100.0}], "context_str": "context", "rec_key": "k",
+        }
+
+    monkeypatch.setattr(analysis_pipeline, "prepare_analysis", prepare)
+    monkeypatch.setattr(analysis_pipeline, "generate_trade_recommendation", lambda context, key: "Hold.")
+    return seen
+
+
+def test_job_runs_from_queued_to_completed_with_stage_progress(app, pipeline):
+    _job("job")
+    assert _stored("job")["status"] == "queued"
+
+    run_analysis_job("job", retriever=None)
+
+    running, after_first_stage = pipeline
+    assert running["status"] == "running" and running["stages"] == {}
+    assert after_first_stage["stages"] == {
+        "trade_metrics": {"status": "completed", "seconds": 0.25, "result": {"round_trips": 3, "open_lots": 0}},
+    }
+    job = _stored("job")
+    assert job["status"] == "completed" and job["error"] is None and job["finished_at"]
+    assert set(job["stages"]) == {"trade_metrics", "patterns", "recommendation"}
+    assert job["result"]["personalized_advice"] == "Hold."
+    assert job["result"]["profit_by_ticker"] == [{"ticker": "AAPL", "total_profit": 100.0}]
+
+
+def test_an_error_marks_the_job_failed(app, monkeypatch):
+    def prepare(user_id, retriever, on_stage):
+        on_stage("trade_metrics", 0.1, {"round_trips": 3, "open_lots": 0})
+        raise RuntimeError("price store unavailable")
+
+    monkeypatch.setattr(analysis_pipeline, "prepare_analysis", prepare)
+    _job("job")
+    run_analysis_job("job", retriever=None)
+
+    job = _stored("job")
+    assert job["status"] == "failed"
+    assert job["error"] == "price store unavailable"
+    assert job["finished_at"] and job["result"] is None
+
+
+def test_a_job_is_only_claimed_once(app, pipeline):
+    _job("job")
+    run_analysis_job("job", retriever=None)
+    run_analysis_job("job", retriever=None)
+    assert len(pipeline) == 2  # prepare ran once
+
+    # Claimed by a worker in another process: left alone
+    _job("other", status="running", started_at=datetime.datetime.utcnow())
+    run_analysis_job("other", retriever=None)
+    assert len(pipeline) == 2
+    assert _stored("other")["status"] == "running"
+
+
+def test_stale_running_jobs_are_requeued(app):
+    now = datetime.datetime.utcnow()
+    _job("stale", status="running", started_at=now - datetime.timedelta(hours=2),
+         stages=json.dumps({"trade_metrics": {"status": "completed"}}), created_at=now - datetime.timedelta(hours=3))
+    _job("busy", status="running", started_at=now - datetime.timedelta(minutes=5))
+    _job("waiting", created_at=now)
+    _job("done", status="completed", started_at=now - datetime.timedelta(hours=2))
+
+    assert requeue_stale_analysis_jobs(timeout=3600) == 1
+    assert queued_analysis_jobs() == ["stale", "waiting"]
+    assert _stored("stale")["stages"] == {}
+    assert _stored("busy")["status"] == "running"
+    assert _stored("done")["status"] == "completed"
+
+
+def test_jobs_are_private_to_their_user(client):
+    with client.application.app_context():
+        _job("mine", user_id=1)
+        _job("theirs", user_id=2)
+
+    assert client.get("/analyze/mine").get_json()["status"] == "queued"
+    response = client.get("/analyze/theirs")
+    assert response.status_code == 404
+    assert response.get_json() == {"message": "Analysis not found"}
@@ -0,0 +1,78 @@
+# backend/tests/test_context_builder.py
+import pytest
+
+from benchmarks.synthetic import TICKERS, make_round_trips
+from modules.context_builder import build_context, count_tokens, render_context, summarize_context
+
+PATTERNS = {"clusters": {
+    "Profit_count": {0: 120, 1: 60, 2: 20},
+    "Duration_mean": {0: 0.5, 1: 12.0, 2: 150.0},
+    "Profit_mean": {0: -4.2, 1: 8.5, 2: 55.0},
+    "Win_mean": {0: 0.41, 1: 0.55, 2: 0.7},
+}}
+
+
+@pytest.fixture(scope="module")
+def summary():
+    market = {ticker: {"recent_close": 100.0 + i} for i, ticker in enumerate(TICKERS)}
+    sentiment = {ticker: 0.1 * (i % 3) for i, ticker in enumerate(TICKERS)}
+    return summarize_context(make_round_trips(2000), PATTERNS, market, sentiment, top_n=6, n_outliers=3)
+
+
+def _sections(text):
+    """Rendered lines grouped under their section titles (the overview line first)."""
+    sections, title = {}, None
+    for line in text.splitlines()[1:]:
+        if line.startswith("- "):
+            sections[title].append(line)
+        else:
+            title = line
+            sections[title] = []
+    return sections
+
+
+def test_full_budget_renders_every_line(summary):
+    text = render_context(summary, token_budget=100_000)
+    sections = _sections(text)
+    assert text.startswith("Overview: 2000 round-trips")
+    assert len(sections["Clusters (hold days vs P&L):"]) == 3
+    assert len(sections["Tickers by |P&L|:"]) == 7  # six tickers plus the "other tickers" line
+    assert len(sections["Largest wins/losses:"]) == 6
+
+
+@pytest.mark.parametrize("budget", [60, 120, 200, 280, 360])
+def test_rendering_stays_within_budget_and_keeps_whole_lines(summary, budget):
+    full_lines = render_context(summary, token_budget=100_000).splitlines()
+    text = render_context(summary, token_budget=budget)
+
+    assert count_tokens(text) <= budget
+    lines = text.splitlines()
+    # Every line is a complete line of the full rendering, in the same order
+    assert all(line in full_lines for line in lines)
+    assert [full_lines.index(line) for line in lines] == sorted(full_lines.index(line) for line in lines)
+
+
+def test_lowest_priority_lines_are_dropped_first(summary):
+    full = _sections(render_context(summary, token_budget=100_000))
+    header = render_context(summary, token_budget=0)
+    clusters, tickers, outliers = full.values()
+
+    # Exactly enough for the overview, clusters, the three best tickers and the outliers
+    budget = sum(count_tokens(part) for part in [header, *full.keys(), *clusters, *tickers[:3], *outliers])
+    kept = _sections(render_context(summary, token_budget=budget))
+    assert kept["Clusters (hold days vs P&L):"] == clusters
+    assert kept["Tickers by |P&L|:"] == tickers[:3]
+    assert kept["Largest wins/losses:"] == outliers
+
+    # Without room for the outliers, the clusters and best tickers are still all there
+    budget -= sum(count_tokens(line) for line in outliers) + count_tokens("Largest wins/losses:")
+    kept = _sections(render_context(summary, token_budget=budget))
+    assert kept["Clusters (hold days vs P&L):"] == clusters
+    assert kept["Tickers by |P&L|:"] == tickers[:3]
+    assert "Largest wins/losses:" not in kept
+
+
+def test_reported_tokens_match_the_rendered_text():
+    summary, text, tokens = build_context(make_round_trips(500, seed=1), PATTERNS, {}, {}, token_budget=150)
+    assert tokens == count_tokens(text) <= 150
+    assert summary["overview"]["round_trips"] == 500
@@ -0,0 +1,64 @@
+# backend/tests/test_json_provider.py
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+from json_provider import OrjsonProvider
+
+
+@pytest.fixture
+def orjson_app():
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    return app
+
+
+@pytest.fixture
+def provider(orjson_app):
+    return orjson_app.json
+
+
+def test_nan_and_missing_values_become_null(provider):
+    payload = {"float": float("nan"), "numpy": np.float64("nan"), "inf": float("inf"), "nat": pd.NaT}
+    assert json.loads(provider.dumps(payload)) == {"float": None, "numpy": None, "inf": None, "nat": None}
+
+
+def test_numpy_values_and_keys(provider):
+    payload = {
+        "int": np.int64(7), "float": np.float32(0.5), "bool": np.bool_(True),
+        "array": np.array([[1, 2], [3, 4]]), "clusters": {np.int64(0): 3, 1: 4},
+    }
+    assert json.loads(provider.dumps(payload)) == {
+        "int": 7, "float": 0.5, "bool": True, "array": [[1, 2], [3, 4]], "clusters": {"0": 3, "1": 4},
+    }
+
+
+def test_dates_are_iso_8601(provider):
+    payload = [pd.Timestamp("2024-01-02 09:30"), datetime.date(2024, 1, 2), datetime.datetime(2024, 1, 2, 9, 30)]
+    assert json.loads(provider.dumps(payload)) == ["2024-01-02T09:30:00", "2024-01-02", "2024-01-02T09:30:00"]
+
+
+def test_a_round_trip_frame_serializes_as_records(provider):
+    frame = pd.DataFrame({
+        "TradeID": [1, 2], "SellDate": pd.to_datetime(["2024-01-10", None]), "Profit": [12.5, np.nan],
+    })
+    assert json.loads(provider.dumps(frame.to_dict(orient="records"))) == [
+        {"TradeID": 1, "SellDate": "2024-01-10T00:00:00", "Profit": 12.5},
+        {"TradeID": 2, "SellDate": None, "Profit": None},
+    ]
+
+
+def test_unknown_types_raise(provider):
+    with pytest.raises(TypeError):
+        provider.dumps({"value": object()})
+
+
+def test_jsonify_uses_the_provider(orjson_app):
+    with orjson_app.app_context():
+        response = jsonify({"count": np.int64(3), "profit": np.nan})
+    assert response.mimetype == "application/json"
+    assert orjson_app.json.loads(response.get_data()) == {"count": 3, "profit": None}
@@ -0,0 +1,100 @@
+# backend/tests/test_lot_matching.py
+import pandas as pd
+import pytest
+
+from modules.preprocessing import LotMatcher
+
+CALL = ("Call", 190.0, "2/16/2024")
+
+
+def trades(*rows, contract=(None, None, None)):
+    """Parsed trades from (id, date, action, quantity, price[, lot_id]) tuples for one ticker/contract."""
+    option_type, strike, expiration = contract
+    return pd.DataFrame([{
+        "id": row[0], "activity_date": pd.Timestamp(row[1]), "parsed_action": row[2], "quantity": row[3],
+        "price": row[4], "amount": None, "lot_id": row[5] if len(row) > 5 else None, "ticker": "AAPL",
+        "option_type": option_type, "strike_price": strike, "option_expiration": expiration,
+    } for row in rows])
+
+
+# Two lots of 10 at 100 and 110, then a sale of 15 at 120
+LADDER = [
+    (1, "2024-01-02", "Buy to Open", 10, 100.0),
+    (2, "2024-01-03", "Buy to Open", 10, 110.0),
+    (3, "2024-01-04", "Sell to Close", 15, 120.0),
+]
+
+
+def test_fifo_splits_a_sale_across_lots_oldest_first():
+    matcher = LotMatcher("fifo")
+    round_trips = matcher.match(trades(*LADDER))
+
+    assert list(round_trips["Quantity"]) == [10, 5]
+    assert list(round_trips["BuyPrice"]) == [100.0, 110.0]
+    assert list(round_trips["Profit"]) == [200.0, 50.0]
+    assert list(round_trips["Duration"]) == [2, 1]
+    # The rest of the second lot stays open
+    open_lots = matcher.open_positions()
+    assert list(open_lots["LotID"]) == [2] and list(open_lots["Quantity"]) == [5]
+
+
+def test_lifo_takes_the_newest_lot_first():
+    matcher = LotMatcher("lifo")
+    round_trips = matcher.match(trades(*LADDER))
+
+    assert list(round_trips["BuyPrice"]) == [110.0, 100.0]
+    assert list(round_trips["Quantity"]) == [10, 5]
+    assert list(matcher.open_positions()["LotID"]) == [1]
+
+
+def test_specific_lot_then_fifo_for_the_remainder():
+    matcher = LotMatcher("specific")
+    round_trips = matcher.match(trades(*LADDER[:2], (3, "2024-01-04", "Sell to Close", 15, 120.0, 2)))
+
+    # Lot 2 is named, so it goes first; the other 5 come from lot 1
+    assert list(round_trips["BuyPrice"]) == [110.0, 100.0]
+    assert list(round_trips["Quantity"]) == [10, 5]
+    assert list(matcher.open_positions()["Quantity"]) == [5]
+
+
+def test_partial_fills_close_one_lot_in_pieces_across_calls():
+    matcher = LotMatcher()
+    first = matcher.match(trades((1, "2024-01-02", "Buy to Open", 10, 100.0),
+                                 (2, "2024-01-05", "Sell to Close", 4, 105.0)))
+    # State survives a round-trip through JSON, as the metrics cache stores it
+    matcher = LotMatcher.from_state(matcher.to_state())
+    second = matcher.match(trades((3, "2024-01-08", "Sell to Close", 6, 90.0)))
+
+    assert list(first["Profit"]) == [20.0]
+    assert list(second["Profit"]) == [-60.0]
+    assert list(first["TradeID"]) + list(second["TradeID"]) == [1, 2]
+    assert matcher.open_positions().empty
+
+
+def test_option_profit_counts_the_contract_multiplier():
+    round_trips = LotMatcher().match(trades((1, "2024-01-03", "Buy to Open", 2, 3.10),
+                                            (2, "2024-01-10", "Sell to Close", 2, 4.00), contract=CALL))
+    assert round_trips["Profit"].iloc[0] == pytest.approx(2 * 100 * 0.90)
+    assert round_trips["OptionType"].iloc[0] == "Call"
+
+
+def test_expiration_closes_the_contract_at_zero():
+    matcher = LotMatcher()
+    round_trips = matcher.match(trades((1, "2024-01-03", "Buy to Open", 2, 3.10),
+                                       (2, "2024-01-04", "Buy to Open", 1, 2.00),
+                                       (3, "2024-02-16", "Expired", None, None), contract=CALL))
+
+    assert list(round_trips["Actions"]) == ["Buy to Open -> Expired"] * 2
+    assert list(round_trips["SellPrice"]) == [0.0, 0.0]
+    assert round_trips["Profit"].sum() == pytest.approx(-(2 * 310.0 + 200.0))
+    assert matcher.open_positions(as_of="2024-01-10").empty
+
+
+def test_open_positions_drop_contracts_past_expiration():
+    matcher = LotMatcher()
+    matcher.match(trades((1, "2024-01-03", "Buy to Open", 2, 3.10), contract=CALL))
+    matcher.match(trades((2, "2024-01-03", "Buy to Open", 5, 180.0)))
+
+    assert list(matcher.open_positions(as_of="2024-02-16")["LotID"]) == [1, 2]
+    # No expiration row was exported, but the contract is gone the day after
+    assert list(matcher.open_positions(as_of="2024-02-17")["LotID"]) == [2]
@@ -0,0 +1,101 @@
+# backend/tests/test_metrics_cache.py
+import json
+
+import metrics_cache
+from database import db
+from metrics_cache import get_open_positions, get_trade_metrics, invalidate_trade_metrics
+from models import RoundTrip, Trade, TradeMetricsState
+from modules.preprocessing import LotMatcher
+from modules.trade_ingestion import parse_robinhood_csv
+from trade_store import _frame_to_columns, bulk_insert_trades, trade_row_hashes
+
+HEADER = b"Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount\n"
+AAPL_ROUND_TRIP = HEADER + b"""1/3/2024,1/3/2024,1/5/2024,AAPL,Apple,BTO,10,$180.00,"($1,800.00)"
+1/10/2024,1/10/2024,1/12/2024,AAPL,Apple,STC,10,$190.00,"$1,900.00"
+"""
+MSFT_SELL = HEADER + b"""3/1/2024,3/1/2024,3/5/2024,MSFT,Microsoft,STC,5,$410.00,"$2,050.00"\n"""
+MSFT_BUY = HEADER + b"""4/1/2024,4/1/2024,4/3/2024,MSFT,Microsoft,BTO,5,$400.00,"($2,000.00)"\n"""
+
+
+def _insert_with_id(user_id, csv, trade_id):
+    """Write one parsed row under a chosen id, as a concurrent upload would have."""
+    parsed = parse_robinhood_csv(csv)
+    columns = _frame_to_columns(parsed.assign(row_hash=trade_row_hashes(parsed)))
+    record = {name: values[0] for name, values in columns.items()}
+    db.session.execute(Trade.__table__.insert(), [dict(record, id=trade_id, user_id=user_id)])
+    db.session.commit()
+
+
+def test_new_trades_are_folded_in_incrementally(app):
+    bulk_insert_trades(1, parse_robinhood_csv(AAPL_ROUND_TRIP))
+    round_trips, open_positions = get_trade_metrics(1)
+    assert list(round_trips["Ticker"]) == ["AAPL"]
+    assert open_positions.empty
+
+    bulk_insert_trades(1, parse_robinhood_csv(MSFT_BUY))
+    round_trips, open_positions = get_trade_metrics(1)
+    assert list(round_trips["Ticker"]) == ["AAPL"]
+    assert list(open_positions["Ticker"]) == ["MSFT"]
+    assert db.session.get(TradeMetricsState, 1).watermark_id == 3
+
+
+def test_losing_the_state_creation_race_is_not_an_error(app, monkeypatch):
+    bulk_insert_trades(1, parse_robinhood_csv(AAPL_ROUND_TRIP))
+    real_insert = metrics_cache._insert_ignoring_existing
+
+    def insert_after_competitor():
+        # Another worker creates and commits the row between our lookup and insert
+        with db.engine.begin() as conn:
+            conn.execute(TradeMetricsState.__table__.insert(), {
+                "user_id": 1, "method": "fifo", "watermark_id": 0,
+                "lot_state": json.dumps(LotMatcher("fifo").to_state()),
+            })
+        return real_insert()
+
+    monkeypatch.setattr(metrics_cache, "_insert_ignoring_existing", insert_after_competitor)
+    round_trips, _ = get_trade_metrics(1)
+
+    assert list(round_trips["Ticker"]) == ["AAPL"]
+    assert db.session.query(TradeMetricsState).count() == 1
+
+
+def test_rows_committed_below_the_watermark_trigger_a_rebuild(app):
+    bulk_insert_trades(1, parse_robinhood_csv(AAPL_ROUND_TRIP))
+    # Upload B took ids up to 8 and committed first; the analysis folds it in
+    _insert_with_id(1, MSFT_SELL, 8)
+    get_trade_metrics(1)
+    assert db.session.get(TradeMetricsState, 1).watermark_id == 8
+
+    # Upload A's later-dated row commits afterwards with the lower id 5
+    _insert_with_id(1, MSFT_BUY, 5)
+    invalidate_trade_metrics(1, parse_robinhood_csv(MSFT_BUY)["activity_date"].min(), first_new_id=5)
+    db.session.commit()
+    assert db.session.get(TradeMetricsState, 1) is None
+    assert db.session.query(RoundTrip).count() == 0
+
+    round_trips, open_positions = get_trade_metrics(1)
+    assert list(round_trips["Ticker"]) == ["AAPL"]
+    assert list(open_positions["Ticker"]) == ["MSFT"]
+
+
+def test_unchanged_round_trips_are_served_from_memory(app, monkeypatch):
+    bulk_insert_trades(1, parse_robinhood_csv(AAPL_ROUND_TRIP))
+    reads = []
+    real_load = metrics_cache.load_round_trips
+    monkeypatch.setattr(metrics_cache, "load_round_trips", lambda user_id: reads.append(user_id) or real_load(user_id))
+
+    first, _ = get_trade_metrics(1)
+    first["Cluster"] = 0  # callers get a copy they can change
+    again, _ = get_trade_metrics(1)
+    assert reads == [1]
+    assert "Cluster" not in again and list(again["Ticker"]) == ["AAPL"]
+
+    # New trades, and a rebuild that ends on the same watermark, are read again
+    bulk_insert_trades(1, parse_robinhood_csv(MSFT_BUY))
+    assert list(get_open_positions(1)["Ticker"]) == ["MSFT"]
+    get_trade_metrics(1)
+    invalidate_trade_metrics(1, first_new_id=1)
+    db.session.commit()
+    round_trips, open_positions = get_trade_metrics(1)
+    assert reads == [1, 1, 1]
+    assert list(round_trips["Ticker"]) == ["AAPL"] and list(open_positions["Ticker"]) == ["MSFT"]
@@ -0,0 +1,78 @@
+# backend/tests/test_news_fetch.py
+import threading
+from collections import defaultdict
+
+import pytest
+import requests
+
+from modules import market_data
+from tools.news_stub_server import start_stub_server, stub_search
+
+
+@pytest.fixture(autouse=True)
+def plain_session(monkeypatch):
+    # No response cache, no backoff, and fresh per-host slots for every test
+    monkeypatch.setattr(market_data, "_session", requests.Session())
+    monkeypatch.setattr(market_data, "NEWS_RETRY_BACKOFF", 0.0)
+    monkeypatch.setattr(market_data, "NEWS_PER_HOST_LIMIT", 2)
+    monkeypatch.setattr(market_data, "_host_limits",
+                        defaultdict(lambda: threading.BoundedSemaphore(market_data.NEWS_PER_HOST_LIMIT)))
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_stub_server(**kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_transient_errors_are_retried_and_404s_are_not(stub, monkeypatch):
+    monkeypatch.setattr(market_data, "NEWS_RETRIES", 2)
+    server, base_url = stub(fail_first=2)
+
+    articles = list(market_data.iter_news_articles(["AAPL"], news_count=3, search=stub_search(base_url, "flaky")))
+    assert len(articles) == 3
+    assert all(a["Content"].startswith("AAPL article") for a in articles)
+    assert sorted(server.attempts.values()) == [3, 3, 3]
+
+    missing = list(market_data.iter_news_articles(["MSFT"], news_count=2, search=stub_search(base_url, "missing")))
+    assert [a["Content"] for a in missing] == [market_data.FAILED_CONTENT] * 2
+    assert [server.attempts[f"/missing/MSFT/{i}"] for i in range(2)] == [1, 1]
+
+
+def test_retries_give_up_after_news_retries(stub, monkeypatch):
+    monkeypatch.setattr(market_data, "NEWS_RETRIES", 1)
+    server, base_url = stub(fail_first=5)
+
+    articles = list(market_data.iter_news_articles(["AAPL"], news_count=2, search=stub_search(base_url, "flaky")))
+    assert [a["Content"] for a in articles] == [market_data.FAILED_CONTENT] * 2
+    assert sorted(server.attempts.values()) == [2, 2]
+
+
+def test_each_host_is_limited_separately(stub):
+    hosts = [stub(latency=0.05) for _ in range(2)]
+    search = stub_search([base_url for _, base_url in hosts])
+
+    articles = list(market_data.iter_news_articles(["AAPL", "MSFT"], news_count=8, search=search, max_workers=16))
+    assert len(articles) == 16
+    # 8 requests per host on 16 workers, but never more than the per-host limit at once
+    assert [server.max_in_flight for server, _ in hosts] == [2, 2]
+
+
+def test_results_stream_as_they_complete(stub):
+    server, base_url = stub(latency=0.1)
+    stream = market_data.iter_news_articles(["AAPL"], news_count=10, search=stub_search(base_url), max_workers=4)
+
+    first = next(stream)
+    assert first["Ticker"] == "AAPL" and first["Content"].startswith("AAPL article")
+    # With 2 slots per host the first article arrives long before the last is requested
+    assert sum(server.attempts.values()) < 10
+    stream.close()
@@ -0,0 +1,220 @@
+# backend/tests/test_options_analytics.py
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_pipeline
+from modules.options_analytics import (
+    IV_MIN_VEGA, black_scholes_greeks, implied_volatility, option_exposure, option_trade_analytics,
+    options_analytics,
+)
+from modules.preprocessing import LotMatcher
+from modules.trade_ingestion import parse_robinhood_csv
+from trade_store import bulk_insert_trades
+
+R = 0.04
+
+
+def _years(start, end):
+    return (pd.Timestamp(end) - pd.Timestamp(start)).days / 365.0
+
+
+def test_greeks_match_the_closed_form():
+    # S = K = 100, one year, 20% volatility, 5% rate (Hull's textbook case)
+    call, put = (black_scholes_greeks(100.0, 100.0, 1.0, 0.2, is_call, r=0.05) for is_call in (True, False))
+
+    assert call["price"] == pytest.approx(10.450584, abs=1e-6)
+    assert put["price"] == pytest.approx(5.573526, abs=1e-6)
+    assert call["delta"] == pytest.approx(0.636831, abs=1e-6)
+    assert put["delta"] == pytest.approx(0.636831 - 1.0, abs=1e-6)
+    assert call["gamma"] == put["gamma"] == pytest.approx(0.018762, abs=1e-6)
+    assert call["vega"] == put["vega"] == pytest.approx(0.375240, abs=1e-6)  # per volatility point
+    assert call["theta"] == pytest.approx(-6.414028 / 365, abs=1e-7)  # per calendar day
+    assert put["theta"] == pytest.approx(-1.657880 / 365, abs=1e-7)
+    # Put-call parity
+    assert call["price"] - put["price"] == pytest.approx(100.0 - 100.0 * np.exp(-0.05))
+
+
+def test_price_to_iv_round_trip_across_moneyness_and_expiries():
+    grid = np.array(list(itertools.product(
+        [0.7, 0.9, 1.0, 1.1, 1.3], [7 / 365, 30 / 365, 0.5, 2.0], [0.15, 0.5, 1.2], [True, False],
+    )), dtype=object)
+    S = 100.0 * grid[:, 0].astype(float)
+    T = grid[:, 1].astype(float)
+    sigma = grid[:, 2].astype(float)
+    is_call = grid[:, 3].astype(bool)
+    greeks = black_scholes_greeks(S, 100.0, T, sigma, is_call, r=R)
+
+    iv = implied_volatility(greeks["price"], S, 100.0, T, is_call, r=R)
+
+    # Every premium that moves with volatility gives its volatility back...
+    identifiable = greeks["vega"] * 100.0 >= IV_MIN_VEGA
+    assert identifiable.sum() > 0.8 * len(grid)
+    assert iv[identifiable] == pytest.approx(sigma[identifiable], abs=1e-3)
+    # ...and the rest (far from the money, days from expiry) are NaN rather than a guess
+    assert np.isnan(iv[~identifiable]).all()
+
+
+def test_iv_is_nan_outside_the_no_arbitrage_bounds():
+    discount = 100.0 * np.exp(-R * 0.5)
+    premiums = [
+        (19.0, 120.0, True),  # call below intrinsic (S - K e^-rT ~ 22)
+        (120.0, 120.0, True),  # call worth the whole share
+        (0.0, 100.0, True),  # free option
+        (discount - 80.0 - 1.0, 80.0, False),  # put below intrinsic
+        (discount, 80.0, False),  # put worth the discounted strike
+    ]
+    price, S, is_call = (np.array(column) for column in zip(*premiums))
+    assert np.isnan(implied_volatility(price, S, 100.0, 0.5, is_call, r=R)).all()
+
+
+def test_iv_is_nan_without_vega():
+    price = [2.0, 0.01, 1e-6, 70.2]
+    S = [100.0, 100.0, 100.0, 100.0]
+    K = [100.0, 300.0, 300.0, 30.0]
+    T = [0.0, 1 / 365, 1 / 365, 1 / 365]  # expired, or a day left far from the money
+    assert np.isnan(implied_volatility(price, S, K, T, True, r=R)).all()
+
+
+# Fills priced at a known volatility off the underlying's close that day
+PRICES = pd.DataFrame({
+    "ticker": ["AAPL", "AAPL", "MSFT", "MSFT"],
+    "date": pd.to_datetime(["2024-01-03", "2024-01-10", "2024-01-03", "2024-01-10"]),
+    "close": [185.0, 190.0, 390.0, 400.0],
+})
+CLOSE = {(row.ticker, row.date): row.close for row in PRICES.itertuples()}
+
+
+def _fill(trade_id, date, action, quantity, ticker, option_type, strike, expiration, sigma=None, price=None):
+    if sigma is not None:
+        S = CLOSE[ticker, pd.Timestamp(date)]
+        price = float(black_scholes_greeks(S, strike, _years(date, expiration), sigma, option_type == "Call",
+                                           r=R)["price"])
+    expires = pd.Timestamp(expiration)
+    return {
+        "id": trade_id, "activity_date": pd.Timestamp(date), "parsed_action": action, "quantity": quantity,
+        "price": price, "amount": None, "lot_id": None, "ticker": ticker, "option_type": option_type,
+        "strike_price": strike, "option_expiration": f"{expires.month}/{expires.day}/{expires.year}",
+    }
+
+
+TRADES = pd.DataFrame([
+    _fill(1, "2024-01-03", "Buy to Open", 2, "AAPL", "Call", 190.0, "2024-02-16", sigma=0.30),
+    _fill(2, "2024-01-03", "Buy to Open", 1, "AAPL", "Call", 200.0, "2024-02-16", sigma=0.40),
+    _fill(3, "2024-01-10", "Sell to Close", 1, "AAPL", "Call", 200.0, "2024-02-16", sigma=0.40),
+    # Paid less than intrinsic value on the day's close: no implied volatility
+    _fill(4, "2024-01-03", "Buy to Open", 1, "AAPL", "Put", 200.0, "2024-03-15", price=10.0),
+    _fill(5, "2024-01-03", "Buy to Open", 3, "MSFT", "Call", 400.0, "2024-02-16", sigma=0.25),
+    # Expires before the valuation date
+    _fill(6, "2024-01-03", "Buy to Open", 1, "AAPL", "Call", 185.0, "2024-01-05", sigma=0.30),
+    {**_fill(7, "2024-01-03", "Buy to Open", 5, "MSFT", None, np.nan, "2024-01-03", price=390.0),
+     "option_expiration": None},
+])
+
+
+def _expected_lot(ticker, option_type, strike, expiration, sigma, contracts):
+    S = CLOSE[ticker, pd.Timestamp("2024-01-10")]
+    greeks = black_scholes_greeks(S, strike, _years("2024-01-10", expiration), sigma, option_type == "Call", r=R)
+    shares = contracts * 100
+    return {
+        "contracts": contracts, "market_value": shares * greeks["price"], "delta_shares": shares * greeks["delta"],
+        "dollar_delta": shares * greeks["delta"] * S, "gamma_shares": shares * greeks["gamma"],
+        "vega": shares * greeks["vega"], "theta": shares * greeks["theta"],
+    }
+
+
+def _total(*lots):
+    return {field: sum(float(lot[field]) for lot in lots) for field in lots[0]}
+
+
+@pytest.fixture(scope="module")
+def analytics():
+    matcher = LotMatcher()
+    matcher.match(TRADES)
+    # Lots as of the first fill, so the expired call reaches option_exposure's own cutoff
+    open_positions = matcher.open_positions(as_of="2024-01-03")
+    return options_analytics(TRADES, open_positions, PRICES, as_of="2024-01-10", include_trades=True, r=R)
+
+
+def test_trade_ivs_recover_the_fill_volatility():
+    trades = option_trade_analytics(TRADES, PRICES, r=R)
+    assert list(trades["id"]) == [1, 2, 3, 4, 5, 6]
+    assert list(trades["iv"].round(6)[[0, 1, 2, 4, 5]]) == pytest.approx([0.30, 0.40, 0.40, 0.25, 0.30])
+    assert np.isnan(trades["iv"].iloc[3])
+    # Greeks are per contract
+    assert trades["vega"].iloc[0] == pytest.approx(
+        100 * black_scholes_greeks(185.0, 190.0, _years("2024-01-03", "2024-02-16"), 0.30, True, r=R)["vega"])
+
+
+def test_summary_counts(analytics):
+    summary = analytics["summary"]
+    assert summary["option_trades"] == 6
+    assert summary["contracts"] == 5
+    assert summary["iv_solved"] == 5
+    assert summary["median_iv"] == pytest.approx(0.30)
+    assert summary["open_contracts"] == 6.0  # 2 AAPL calls, 1 AAPL put, 3 MSFT calls
+
+
+def test_exposure_rolls_up_per_ticker_and_expiry_in_dollars(analytics):
+    aapl_call = _expected_lot("AAPL", "Call", 190.0, "2024-02-16", 0.30, 2)
+    # No solved fill for the put: priced at the median of AAPL's implied volatilities (0.3, 0.4, 0.4, 0.3)
+    aapl_put = _expected_lot("AAPL", "Put", 200.0, "2024-03-15", 0.35, 1)
+    msft_call = _expected_lot("MSFT", "Call", 400.0, "2024-02-16", 0.25, 3)
+
+    by_ticker = {row.pop("ticker"): row for row in analytics["exposure_by_ticker"]}
+    assert by_ticker["AAPL"].pop("lots") == 2 and by_ticker["MSFT"].pop("lots") == 1
+    assert by_ticker["AAPL"] == pytest.approx(_total(aapl_call, aapl_put))
+    assert by_ticker["MSFT"] == pytest.approx(_total(msft_call))
+
+    by_expiration = {row.pop("expiration"): row for row in analytics["exposure_by_expiration"]}
+    assert list(by_expiration) == ["2024-02-16", "2024-03-15"]  # the January call has expired
+    assert by_expiration["2024-02-16"].pop("lots") == 2
+    assert by_expiration["2024-02-16"] == pytest.approx(_total(aapl_call, msft_call))
+    assert by_expiration["2024-03-15"].pop("lots") == 1
+    assert by_expiration["2024-03-15"] == pytest.approx(_total(aapl_put))
+
+    assert [(row["expiration"], row["ticker"]) for row in analytics["exposure"]] == [
+        ("2024-02-16", "AAPL"), ("2024-02-16", "MSFT"), ("2024-03-15", "AAPL"),
+    ]
+
+
+def test_exposure_without_option_lots_is_empty():
+    shares = pd.DataFrame({"Ticker": ["MSFT"], "OptionType": [None], "Strike": [None], "Expiration": [None],
+                           "Quantity": [5.0]})
+    assert option_exposure(shares, pd.DataFrame(), PRICES).empty
+    assert option_exposure(pd.DataFrame(), pd.DataFrame(), PRICES).empty
+
+
+def test_options_analytics_endpoint(client, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    prices = pd.DataFrame({"ticker": ["AAPL", "AAPL"], "date": [pd.Timestamp("2024-01-03"), today],
+                           "close": [185.0, 190.0]})
+    requested = []
+
+    def price_history(tickers, start_date, end_date):
+        requested.append(list(tickers))
+        return prices
+
+    monkeypatch.setattr(analysis_pipeline, "get_price_history", price_history)
+    premium = float(black_scholes_greeks(185.0, 190.0, _years("2024-01-03", "2034-12-15"), 0.3, True)["price"])
+    csv = (
+        "Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount\n"
+        f"1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 12/15/2034 Call $190.00,BTO,2,${premium:.2f},(${premium * 200:.2f})\n"
+        "1/3/2024,1/3/2024,1/5/2024,MSFT,Microsoft,Buy,5,$390.00,($1950.00)\n"
+    ).encode()
+    with client.application.app_context():
+        bulk_insert_trades(1, parse_robinhood_csv(csv))
+
+    body = client.get("/options/analytics?trades=1").get_json()
+
+    assert requested == [["AAPL"]]
+    assert body["summary"]["option_trades"] == 1
+    assert body["summary"]["median_iv"] == pytest.approx(0.3, abs=1e-3)
+    assert body["summary"]["open_contracts"] == 2.0
+    assert [row["ticker"] for row in body["exposure_by_ticker"]] == ["AAPL"]
+    assert body["exposure_by_expiration"][0]["expiration"] == "2034-12-15"
+    assert body["exposure_by_ticker"][0]["contracts"] == 2.0
+    assert body["trades"]["ticker"] == ["AAPL"]
+    assert body["trades"]["iv"] == [pytest.approx(0.3, abs=1e-3)]
@@ -0,0 +1,26 @@
+# backend/tests/test_portfolio_analytics.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_round_trips
+from modules.portfolio_analytics import TRADING_DAYS, portfolio_analytics
+
+
+def test_single_ticker_sharpe_matches_the_portfolio():
+    round_trips = make_round_trips(300).assign(Ticker="AAPL")
+    result = portfolio_analytics(round_trips)
+    assert result["per_ticker"][0]["sharpe"] == pytest.approx(result["portfolio"]["sharpe"])
+
+
+def test_per_ticker_sharpe_counts_flat_days_on_the_portfolio_calendar():
+    round_trips = make_round_trips(500, seed=3)
+    result = portfolio_analytics(round_trips)
+
+    day = pd.to_datetime(round_trips["SellDate"]).dt.normalize()
+    calendar = pd.bdate_range(day.min(), day.max()).union(pd.DatetimeIndex(day.unique()))
+    for row in result["per_ticker"]:
+        mine = round_trips["Ticker"] == row["ticker"]
+        daily = round_trips["Profit"][mine].groupby(day[mine]).sum().reindex(calendar, fill_value=0.0)
+        expected = daily.mean() / daily.std(ddof=1) * np.sqrt(TRADING_DAYS)
+        assert row["sharpe"] == pytest.approx(expected)
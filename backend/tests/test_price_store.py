@@ -0,0 +1,91 @@
+# backend/tests/test_price_store.py
+import datetime
+
+import pandas as pd
+import pytest
+
+from modules import price_store
+from modules.price_store import HISTORY_COLUMNS, PriceStore, SyntheticPriceProvider, _subtract
+
+D = datetime.date
+
+
+class RecordingProvider:
+    """Synthetic prices, with every call recorded and chosen tickers silently dropped (like yfinance)."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def download(self, tickers, start, end):
+        self.calls.append((tuple(tickers), start, end))
+        served = [t for t in tickers if t not in self.failing]
+        if not served:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return SyntheticPriceProvider().download(served, start, end)
+
+
+@pytest.fixture
+def provider():
+    return RecordingProvider()
+
+
+@pytest.fixture
+def store(tmp_path, provider):
+    return PriceStore(str(tmp_path / "prices.sqlite3"), provider=provider)
+
+
+def test_subtract_returns_uncovered_parts():
+    covered = [(D(2024, 1, 5), D(2024, 1, 10)), (D(2024, 1, 20), D(2024, 1, 25))]
+    assert _subtract(D(2024, 1, 1), D(2024, 1, 31), covered) == [
+        (D(2024, 1, 1), D(2024, 1, 4)), (D(2024, 1, 11), D(2024, 1, 19)), (D(2024, 1, 26), D(2024, 1, 31)),
+    ]
+    assert _subtract(D(2024, 1, 6), D(2024, 1, 9), covered) == []
+    assert _subtract(D(2024, 1, 8), D(2024, 1, 22), covered) == [(D(2024, 1, 11), D(2024, 1, 19))]
+
+
+def test_second_lookup_is_served_from_disk(store, provider):
+    first = store.get_history(["AAPL", "MSFT"], "2024-01-01", "2024-03-31")
+    assert provider.calls == [(("AAPL", "MSFT"), D(2024, 1, 1), D(2024, 3, 31))]
+
+    provider.calls.clear()
+    second = store.get_history(["MSFT", "AAPL"], "2024-02-01", "2024-03-31")
+    assert provider.calls == []
+    assert len(second) == len(first[first["date"] >= "2024-02-01"])
+
+    # Extending the range downloads only the new part
+    store.get_history(["AAPL"], "2024-01-01", "2024-04-30")
+    assert provider.calls == [(("AAPL",), D(2024, 4, 1), D(2024, 4, 30))]
+
+
+def test_empty_or_partial_download_is_not_covered(store, provider):
+    provider.failing = {"MSFT"}
+    store.get_history(["AAPL", "MSFT"], "2024-01-01", "2024-03-31")
+
+    provider.failing = set()
+    provider.calls.clear()
+    history = store.get_history(["AAPL", "MSFT"], "2024-01-01", "2024-03-31")
+    assert provider.calls == [(("MSFT",), D(2024, 1, 1), D(2024, 3, 31))]
+    assert set(history["ticker"]) == {"AAPL", "MSFT"}
+
+
+def test_weekend_only_range_is_covered_without_bars(store, provider):
+    assert store.get_history(["AAPL"], "2024-01-06", "2024-01-07").empty
+    provider.calls.clear()
+    store.get_history(["AAPL"], "2024-01-06", "2024-01-07")
+    assert provider.calls == []
+
+
+def test_todays_bar_is_reused_until_the_ttl_expires(store, provider, monkeypatch):
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=30)
+    store.get_history(["AAPL"], start, today)
+    assert len(provider.calls) == 1
+
+    provider.calls.clear()
+    store.get_history(["AAPL"], start, today)
+    assert provider.calls == []
+
+    monkeypatch.setattr(price_store, "PRICE_RECENT_TTL_SECONDS", -1)
+    store.get_history(["AAPL"], start, today)
+    assert provider.calls == [(("AAPL",), today, today)]
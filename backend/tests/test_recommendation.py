@@ -0,0 +1,139 @@
+# backend/tests/test_recommendation.py
+import importlib
+import json
+import threading
+
+import pytest
+import requests
+
+import config
+from modules import recommendation, recommendation_cache
+from modules.recommendation import LLMBusyError, stream_trade_recommendation
+from modules.recommendation_cache import RecommendationCache, recommendation_key
+from tools.llm_stub_server import CANNED_ADVICE, start_stub_server
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_stub_server(**kwargs)
+        servers.append(server)
+        monkeypatch.setattr(recommendation, "OLLAMA_URL", base_url)
+        return server
+
+    monkeypatch.setattr(recommendation, "_session", requests.Session())
+    monkeypatch.setattr(recommendation, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(recommendation, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(recommendation, "LLM_QUEUE_TIMEOUT", 0.2)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_advice_streams_chunk_by_chunk(llm):
+    server = llm()
+    chunks = list(stream_trade_recommendation("context"))
+
+    assert len(chunks) == len(CANNED_ADVICE.split())
+    assert "".join(chunks).strip() == CANNED_ADVICE
+    assert server.requests == 1
+
+
+def test_busy_slots_raise_llm_busy_error(llm):
+    server = llm(token_delay=0.01)
+    first = stream_trade_recommendation("context")
+    next(first)  # holds the only slot mid-generation
+
+    with pytest.raises(LLMBusyError):
+        next(stream_trade_recommendation("context"))
+    assert server.requests == 1
+
+    # Abandoning the first stream frees its slot
+    first.close()
+    assert "".join(stream_trade_recommendation("context")).strip() == CANNED_ADVICE
+
+
+def test_model_error_becomes_the_last_ndjson_line(llm, monkeypatch):
+    llm(error_after=3)
+    # app.py creates its tables on import, so point it at an in-memory database first
+    monkeypatch.setattr(config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+    app_module = importlib.import_module("app")
+
+    with app_module.app.test_request_context():
+        response = app_module.stream_analysis({"clusters": {}}, {}, {"AAPL": 100.0}, "context")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [line["type"] for line in lines] == ["analysis", "advice", "advice", "advice", "error"]
+    assert lines[0]["profit_by_ticker"] == {"AAPL": 100.0}
+    assert "".join(line["delta"] for line in lines[1:4]).split() == CANNED_ADVICE.split()[:3]
+    assert lines[-1]["message"] == "Error: model runner stopped"
+
+
+def test_key_ignores_float_noise_and_dict_order():
+    context = {"market": {"AAPL": {"close": 187.43, "volume": 51234567}}, "sentiment": {"AAPL": 0.1234}}
+    noisy = {"sentiment": {"AAPL": 0.12341}, "market": {"AAPL": {"volume": 51234567, "close": 187.4301}}}
+    assert recommendation_key(context, "m") == recommendation_key(noisy, "m")
+
+    # Integers are exact, and floats that differ in the third significant digit are not noise
+    assert recommendation_key({"volume": 51234567}, "m") != recommendation_key({"volume": 51234568}, "m")
+    assert recommendation_key({"close": 187.4}, "m") != recommendation_key({"close": 188.4}, "m")
+    # Whole floats hash like the integers they equal
+    assert recommendation_key({"trades": 12.0}, "m") == recommendation_key({"trades": 12}, "m")
+    # The model and the prompt template are part of the key
+    assert recommendation_key(context, "m") != recommendation_key(context, "other")
+    assert recommendation_key(context, "m", "prompt v2") != recommendation_key(context, "m")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(recommendation_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = RecommendationCache(str(tmp_path / "rec.sqlite3"), ttl=60, max_entries=10)
+    cache.put("k", "advice", gen_seconds=2.5)
+    clock[0] += 59
+    assert cache.get("k") == "advice"
+    clock[0] += 2
+    assert cache.get("k") is None
+
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "hit_rate": 0.5, "saved_seconds": 2.5}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = RecommendationCache(str(tmp_path / "rec.sqlite3"), ttl=3600, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, key.upper(), gen_seconds=1.0)
+        clock[0] += 1
+    assert cache.get("a") == "A"  # now more recent than b
+    clock[0] += 1
+    cache.put("c", "C", gen_seconds=1.0)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("b") is None
+    assert [cache.get("a"), cache.get("c")] == ["A", "C"]
+
+
+def test_only_finished_generations_are_cached(llm, tmp_path, monkeypatch):
+    cache = RecommendationCache(str(tmp_path / "rec.sqlite3"))
+    monkeypatch.setattr(recommendation, "get_recommendation_cache", lambda: cache)
+    server = llm(error_after=3)
+
+    with pytest.raises(RuntimeError):
+        list(stream_trade_recommendation("context", key="failed"))
+    abandoned = stream_trade_recommendation("context", key="abandoned")
+    next(abandoned)
+    abandoned.close()
+    assert cache.stats()["entries"] == 0
+
+    server.error_after = None
+    assert "".join(stream_trade_recommendation("context", key="done")).strip() == CANNED_ADVICE
+    requests_made = server.requests
+    assert "".join(stream_trade_recommendation("context", key="done")).strip() == CANNED_ADVICE
+    assert server.requests == requests_made
+    assert cache.stats()["hits"] == 1
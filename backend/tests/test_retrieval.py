@@ -0,0 +1,65 @@
+# backend/tests/test_retrieval.py
+import numpy as np
+import pytest
+
+from modules import retrieval
+from modules.article_store import ArticleStore
+from modules.retrieval import Retriever
+from modules.vector_store import EMBEDDING_DIM, VectorStore
+
+MODEL = "test-encoder"
+
+
+def unit(seed):
+    vec = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+@pytest.fixture
+def articles(tmp_path):
+    store = ArticleStore(str(tmp_path / "articles.sqlite3"))
+
+    def put(ticker, url, content, seed):
+        store.upsert_articles([{"Ticker": ticker, "Title": url, "Link": url, "Content": content}])
+        store.set_embeddings({url: unit(seed)}, MODEL)
+
+    store.put = put
+    return store
+
+
+@pytest.fixture
+def retriever(articles, monkeypatch):
+    # Each ticker's query embeds next to its first article
+    monkeypatch.setattr(retrieval, "embed_queries",
+                        lambda queries: np.vstack([unit(1 if "AAPL" in q else 2) for q in queries]))
+    return Retriever(VectorStore("flat"), articles, model=MODEL)
+
+
+def test_sync_adds_new_and_replaces_changed_articles(articles, retriever):
+    articles.put("AAPL", "https://news.example/a1", "Apple beats estimates", seed=1)
+    articles.put("MSFT", "https://news.example/m1", "Microsoft raises dividend", seed=2)
+    assert retriever.sync() == 2
+    assert retriever.sync() == 0
+
+    # Re-fetched with new text and re-embedded: the old document is replaced, not duplicated
+    articles.put("AAPL", "https://news.example/a1", "Apple beats estimates, raises guidance", seed=1)
+    assert retriever.sync() == 1
+    assert len(retriever.vector_store) == 2
+
+    hits = retriever.retrieve(["AAPL", "MSFT"], top_k=3)
+    assert [doc["Content"] for doc in hits["AAPL"]] == ["Apple beats estimates, raises guidance"]
+    assert [doc["Content"] for doc in hits["MSFT"]] == ["Microsoft raises dividend"]
+
+
+def test_search_runs_under_the_index_lock(articles, retriever, monkeypatch):
+    articles.put("AAPL", "https://news.example/a1", "Apple beats estimates", seed=1)
+    search_batch = retriever.vector_store.search_batch
+    held = []
+
+    def checked_search(*args, **kwargs):
+        held.append(retriever._index_lock.locked())
+        return search_batch(*args, **kwargs)
+
+    monkeypatch.setattr(retriever.vector_store, "search_batch", checked_search)
+    assert len(retriever.retrieve(["AAPL"])["AAPL"]) == 1
+    assert held == [True]
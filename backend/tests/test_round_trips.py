@@ -0,0 +1,94 @@
+# backend/tests/test_round_trips.py
+import gzip
+import importlib
+
+import pytest
+from flask import Response
+
+from modules.trade_ingestion import parse_robinhood_csv
+from trade_store import bulk_insert_trades
+
+HEADER = "Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount\n"
+# Five share round-trips: buy on the 2nd, sell on the 20th of each month
+CSV = (HEADER + "".join(
+    f"{month}/2/2024,{month}/2/2024,{month}/4/2024,AAPL,Apple,BTO,10,$100.00,($1000.00)\n"
+    f"{month}/20/2024,{month}/20/2024,{month}/22/2024,AAPL,Apple,STC,10,${100 + month}.00,${1000 + 10 * month}.00\n"
+    for month in range(1, 6)
+)).encode()
+
+
+@pytest.fixture
+def app_module(client):
+    with client.application.app_context():
+        bulk_insert_trades(1, parse_robinhood_csv(CSV))
+    return importlib.import_module("app")
+
+
+def test_pages_follow_the_cursor_to_the_end(client, app_module):
+    # No analysis has run: the first page brings the round-trips up to date
+    first = client.get("/round_trips?limit=2").get_json()
+    assert first["count"] == 2
+    assert [row["Profit"] for row in first["round_trips"]] == [10.0, 20.0]
+    assert [row["Cluster"] for row in first["round_trips"]] == [-1, -1]
+    assert first["next_cursor"] == first["round_trips"][-1]["TradeID"]
+
+    second = client.get(f"/round_trips?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [row["Profit"] for row in second["round_trips"]] == [30.0, 40.0]
+    # The last page is short, so there is nothing after it
+    last = client.get(f"/round_trips?limit=2&cursor={second['next_cursor']}").get_json()
+    assert [row["Profit"] for row in last["round_trips"]] == [50.0]
+    assert last["next_cursor"] is None
+
+
+def test_a_full_last_page_still_returns_a_cursor(client, app_module):
+    page = client.get("/round_trips?limit=5").get_json()
+    assert page["count"] == 5 and page["next_cursor"] is not None
+    after = client.get(f"/round_trips?limit=5&cursor={page['next_cursor']}").get_json()
+    assert after == {"round_trips": [], "count": 0, "next_cursor": None}
+
+
+def test_limit_is_clamped(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ROUND_TRIP_MAX_PAGE_SIZE", 3)
+    assert client.get("/round_trips?limit=100").get_json()["count"] == 3
+    assert client.get("/round_trips?limit=0").get_json()["count"] == 1
+
+
+def test_column_format(client, app_module):
+    page = client.get("/round_trips?format=columns").get_json()
+    columns = page["columns"]
+    assert page["count"] == 5 and page["next_cursor"] is None
+    assert columns["Profit"] == [10.0, 20.0, 30.0, 40.0, 50.0]
+    assert columns["Ticker"] == ["AAPL"] * 5
+    assert columns["BuyDate"][0].startswith("2024-01-02")
+    assert {len(values) for values in columns.values()} == {5}
+
+
+def test_large_json_is_gzipped_for_clients_that_accept_it(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "GZIP_MIN_BYTES", 100)
+    plain = client.get("/round_trips")
+    compressed = client.get("/round_trips", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    # Both variants tell caches the body depends on Accept-Encoding
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+
+
+def test_small_json_is_sent_as_is(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "GZIP_MIN_BYTES", 1_000_000)
+    response = client.get("/round_trips", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["count"] == 5
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_streamed_responses_pass_through(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "GZIP_MIN_BYTES", 1)
+    with app_module.app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        streamed = Response(iter([b'{"a": ', b"1}"]), mimetype="application/json")
+        response = app_module.gzip_response(streamed)
+    assert response.is_streamed
+    assert "Content-Encoding" not in response.headers
+    assert b"".join(response.response) == b'{"a": 1}'
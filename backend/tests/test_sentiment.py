@@ -0,0 +1,79 @@
+# backend/tests/test_sentiment.py
+import importlib.util
+import json
+import os
+
+import pytest
+
+from modules import sentiment
+
+
+def _fake_weights(path):
+    path.mkdir()
+    (path / "config.json").write_text("{}")
+    (path / "model.safetensors").write_bytes(b"v1")
+    return path
+
+
+def test_missing_packages_or_weights_raise_a_clear_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(sentiment.SentimentBackendError, match="onnxruntime"):
+        sentiment.check_backend("onnx", str(_fake_weights(tmp_path / "finbert")))
+
+    monkeypatch.undo()
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: object())
+    with pytest.raises(sentiment.SentimentBackendError, match="FINBERT_MODEL_PATH"):
+        sentiment.check_backend("torch", str(tmp_path / "missing"))
+
+
+def test_retrained_weights_get_new_cache_keys(tmp_path, monkeypatch):
+    weights = _fake_weights(tmp_path / "finbert")
+    monkeypatch.setattr(sentiment, "MODEL_NAME", str(weights))
+    before = sentiment._text_key("Apple beats estimates")
+    assert sentiment._text_key("Apple beats estimates") == before
+
+    (weights / "model.safetensors").write_bytes(b"retrained")
+    os.utime(weights / "model.safetensors", ns=(1, 1))
+    sentiment.weights_fingerprint.cache_clear()
+    assert sentiment._text_key("Apple beats estimates") != before
+
+    monkeypatch.setattr(sentiment, "BACKEND", "int8")
+    assert sentiment.model_id().endswith(":int8")
+
+
+def test_label_indices_follow_the_shipped_config():
+    # finbert-tone orders its classes Neutral, Positive, Negative
+    with open(os.path.join(sentiment.DEFAULT_MODEL_PATH, "config.json")) as f:
+        id2label = json.load(f)["id2label"]
+    assert sentiment._label_index(id2label, "positive", 2) == 1
+    assert sentiment._label_index(id2label, "negative", 0) == 2
+
+
+SENTENCES = [
+    "Apple shares surge after record quarterly earnings beat estimates.",
+    "The company warned of steep losses and announced mass layoffs.",
+    "The board will meet on Tuesday to review the quarterly report.",
+    "Revenue grew strongly and margins expanded across every segment.",
+    "Regulators opened a fraud investigation and the stock plunged.",
+]
+
+
+def test_every_backend_agrees_with_torch_on_labels(tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    for backend in sentiment.SENTIMENT_BACKENDS:
+        try:
+            sentiment.check_backend(backend)
+        except sentiment.SentimentBackendError as exc:
+            pytest.skip(str(exc))
+    monkeypatch.setattr(sentiment, "ONNX_CACHE_DIR", str(tmp_path / "onnx"))
+
+    labels = {}
+    for backend in sentiment.SENTIMENT_BACKENDS:
+        model = sentiment.SentimentModel(backend=backend)
+        probs = model.predict_proba(SENTENCES)
+        labels[backend] = probs.argmax(axis=1).tolist()
+        # Scores read the positive and negative columns the config names
+        scores = model.score(SENTENCES)
+        assert [s > 0 for s in scores[:2]] == [True, False]
+    assert labels["int8"] == labels["torch"]
+    assert labels["onnx"] == labels["torch"]
@@ -0,0 +1,54 @@
+# backend/tests/test_trade_analysis.py
+import numpy as np
+
+from benchmarks.synthetic import make_round_trips
+from modules.preprocessing import LotMatcher
+from modules.trade_analysis import FEATURE_NAMES, TradeClusterer, trade_features
+from modules.trade_ingestion import parse_robinhood_csv
+
+CSV = b"""Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount
+1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 2/16/2024 Call $190.00,BTO,2,$3.10,($620.00)
+1/10/2024,1/10/2024,1/12/2024,AAPL,AAPL 2/16/2024 Call $190.00,STC,2,$4.00,$800.00
+2/1/2024,2/1/2024,2/5/2024,MSFT,Microsoft,BTO,5,$400.00,"($2,000.00)"
+3/1/2024,3/1/2024,3/5/2024,MSFT,Microsoft,STC,5,$410.00,"$2,050.00"
+"""
+
+
+def test_is_option_comes_from_the_matched_contract():
+    round_trips = LotMatcher().match(parse_robinhood_csv(CSV))
+    assert list(round_trips["OptionType"]) == ["Call", None]
+
+    features, valid = trade_features(round_trips)
+    assert valid.all()
+    assert list(features[:, FEATURE_NAMES.index("IsOption")]) == [1.0, 0.0]
+
+
+def _features(n, seed=0):
+    features, valid = trade_features(make_round_trips(n, seed))
+    return features[valid]
+
+
+def test_warm_start_keeps_k_until_the_history_size_changes_a_lot():
+    clusterer = TradeClusterer(sample_size=500)
+    clusterer.fit_predict(_features(1000))
+    assert not clusterer.warm_started and clusterer.k_selected_on == 1000
+
+    warm = TradeClusterer.from_state(clusterer.to_state(), sample_size=500)
+    warm.fit_predict(_features(1500, seed=1))
+    assert warm.warm_started and warm.k == clusterer.k
+
+    grown = TradeClusterer.from_state(warm.to_state(), sample_size=500)
+    grown.fit_predict(_features(5000, seed=2))
+    assert not grown.warm_started and grown.k_selected_on == 5000
+
+
+def test_states_without_a_selection_size_reselect_once():
+    state = TradeClusterer(sample_size=500)
+    state.fit_predict(_features(1000))
+    legacy = {key: value for key, value in state.to_state().items() if key != "k_selected_on"}
+
+    clusterer = TradeClusterer.from_state(legacy, sample_size=500)
+    clusterer.fit_predict(_features(1000))
+    assert not clusterer.warm_started
+    assert clusterer.k_selected_on == 1000
+    assert np.isfinite(clusterer.centroids).all()
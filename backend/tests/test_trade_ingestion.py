@@ -0,0 +1,57 @@
+# backend/tests/test_trade_ingestion.py
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_trade_ingestion import legacy_parse_robinhood_csv
+from benchmarks.synthetic import make_robinhood_csv
+from modules.trade_ingestion import iter_robinhood_csv, parse_robinhood_csv
+
+CSV = b"""Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount
+1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 2/16/2024 Call $190.00,BTO,2,$3.10,($620.00)
+1/10/2024,1/10/2024,1/12/2024,AAPL,AAPL 2/16/2024 Call $190.00,stc ,2,$4.00,$800.00
+2/1/2024,2/1/2024,2/5/2024,MSFT,Microsoft,Buy,5,"$1,400.50","($7,002.50)"
+
+,,,,,,,,
+2/16/2024,2/16/2024,2/20/2024,TSLA,Option Expiration for TSLA 2/16/2024 Put $180.00,OEXP,1,,
+2/16/2024,2/16/2024,2/20/2024,SPY,Assigned SPY 2/16/2024 Call $500.50,OASGN,1,,$0.00
+3/1/2024,3/1/2024,3/5/2024,NVDA,NVDA 3/15/2024 Call $800.00,BTO,1,$12.00,
+"""
+
+
+def _values(df: pd.DataFrame) -> pd.DataFrame:
+    # Compare values only: the vectorized parser keeps NaN/NaT where the row parser used None
+    out = df.reset_index(drop=True).astype(object)
+    return out.where(pd.notna(out), None)
+
+
+@pytest.mark.parametrize("contents", [CSV, make_robinhood_csv(2000, seed=4)], ids=["edge-cases", "synthetic"])
+def test_vectorized_parser_matches_the_row_parser(contents):
+    pd.testing.assert_frame_equal(_values(parse_robinhood_csv(contents)),
+                                  _values(legacy_parse_robinhood_csv(contents)), check_dtype=False)
+
+
+def test_amounts_prices_and_options_are_parsed():
+    df = parse_robinhood_csv(CSV)
+    assert len(df) == 7  # the empty line is skipped, the row of commas is kept as all-missing
+
+    assert df["amount"].tolist()[:3] == [-620.0, 800.0, -7002.5]
+    assert df["price"].tolist()[:3] == [3.10, 4.00, 1400.50]
+    assert df["amount"].iloc[3:5].isna().all() and df["price"].iloc[3:5].isna().all()
+
+    assert df["parsed_action"].tolist() == [
+        "Buy to Open", "Sell to Close", "Unknown", "Unknown", "Expired", "Assigned", "Buy to Open",
+    ]
+    assert df["option_type"].tolist()[:2] == ["Call", "Call"]
+    assert df["strike_price"].iloc[5] == 500.50
+    assert df["option_expiration"].iloc[4] == "2/16/2024"
+    assert pd.isna(df["option_type"].iloc[2]) and pd.isna(df["strike_price"].iloc[2])
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 4, 100])
+def test_chunked_parse_matches_whole_file(chunksize):
+    chunks = list(iter_robinhood_csv(io.BytesIO(CSV), chunksize=chunksize))
+    assert all(len(chunk) <= chunksize for chunk in chunks)
+    pd.testing.assert_frame_equal(_values(pd.concat(chunks)), _values(parse_robinhood_csv(CSV)),
+                                  check_dtype=False)
@@ -0,0 +1,127 @@
+# backend/tests/test_trade_store.py
+import io
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from models import Trade
+from database import db
+from modules.trade_ingestion import iter_robinhood_csv, parse_robinhood_csv
+from trade_queries import load_trade_frame
+from trade_store import TRADE_COLUMNS, bulk_insert_trades, rehash_trades, trade_row_hashes, upgrade_trades_table
+
+CSV = b"""Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount
+1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 2/16/2024 Call $190.00,BTO,2,$3.10,($620.00)
+1/10/2024,1/10/2024,1/12/2024,AAPL,AAPL 2/16/2024 Call $190.00,STC,2,$4.00,$800.00
+2/1/2024,2/1/2024,2/5/2024,MSFT,Microsoft,Buy,5,$400.00,"($2,000.00)"
+2/1/2024,2/1/2024,2/5/2024,MSFT,Microsoft,Buy,5,$400.00,"($2,000.00)"
+3/4/2024,3/4/2024,3/6/2024,TSLA,TSLA 3/15/2024 Put $180.00,BTO,1,$2.50,($250.00)
+"""
+
+
+def test_bulk_insert_writes_every_row(app):
+    stats = bulk_insert_trades(1, parse_robinhood_csv(CSV))
+
+    assert stats["rows_written"] == 5
+    assert stats["rows_skipped"] == 0
+    assert db.session.query(Trade).filter_by(user_id=1).count() == 5
+    # Identical fills are kept apart by their occurrence number
+    assert db.session.query(Trade.row_hash).distinct().count() == 5
+
+
+def test_reupload_is_skipped_by_row_hash(app):
+    bulk_insert_trades(1, parse_robinhood_csv(CSV))
+    stats = bulk_insert_trades(1, parse_robinhood_csv(CSV))
+
+    assert stats["rows_written"] == 0
+    assert stats["rows_skipped"] == 5
+    assert db.session.query(Trade).filter_by(user_id=1).count() == 5
+    # Hashes are per user, so another user's identical upload is written
+    assert bulk_insert_trades(2, parse_robinhood_csv(CSV))["rows_written"] == 5
+
+
+def test_overlapping_upload_only_adds_new_rows(app):
+    lines = CSV.splitlines(keepends=True)
+    bulk_insert_trades(1, parse_robinhood_csv(b"".join(lines[:4])))
+    stats = bulk_insert_trades(1, parse_robinhood_csv(CSV))
+
+    assert stats["rows_written"] == 2
+    assert db.session.query(Trade).filter_by(user_id=1).count() == 5
+
+
+def test_load_trade_frame_date_range(app):
+    bulk_insert_trades(1, parse_robinhood_csv(CSV))
+
+    frame = load_trade_frame(1, start="2024-01-05", end="2024-02-28")
+    assert list(frame["activity_date"]) == [pd.Timestamp("2024-01-10")] + [pd.Timestamp("2024-02-01")] * 2
+    assert list(frame["ticker"]) == ["AAPL", "MSFT", "MSFT"]
+    assert frame["activity_date"].is_monotonic_increasing
+
+    options = load_trade_frame(1, columns=["id", "option_type", "strike_price"], options_only=True)
+    assert list(options.columns) == ["id", "option_type", "strike_price"]
+    assert sorted(options["option_type"]) == ["Call", "Call", "Put"]
+    assert load_trade_frame(3).empty
+
+
+def test_row_hash_ignores_dtype_and_missing_kind():
+    frame = parse_robinhood_csv(CSV)
+    as_float = frame.assign(quantity=frame["quantity"].astype("float64"))
+    as_int = frame.assign(quantity=frame["quantity"].astype("int64"))
+    assert list(trade_row_hashes(as_float)) == list(trade_row_hashes(as_int))
+
+    with_nan = frame.assign(description=np.nan).astype({"description": object})
+    with_none = frame.assign(description=None)
+    assert list(trade_row_hashes(with_nan)) == list(trade_row_hashes(with_none))
+    # A missing value does not hash like the empty string
+    assert list(trade_row_hashes(with_none)) != list(trade_row_hashes(frame.assign(description="")))
+
+
+def test_chunked_hashes_match_whole_file():
+    # The blank quantity makes the whole file's column float while the first
+    # chunks parse as int, which must not change any hash
+    csv = CSV + b"3/5/2024,3/5/2024,3/5/2024,,ACH Deposit,ACH,,,$500.00\n"
+    whole = trade_row_hashes(parse_robinhood_csv(csv))
+
+    seen = Counter()
+    chunked = pd.concat([
+        trade_row_hashes(chunk, seen) for chunk in iter_robinhood_csv(io.BytesIO(csv), chunksize=2)
+    ])
+    assert list(chunked) == list(whole)
+    assert whole.str.len().eq(32).all() and whole.is_unique
+
+
+def test_rehash_trades_keeps_reuploads_matching(app):
+    bulk_insert_trades(1, parse_robinhood_csv(CSV))
+    expected = sorted(h for (h,) in db.session.query(Trade.row_hash))
+    db.session.query(Trade).update({"row_hash": Trade.id.cast(db.String)})
+    db.session.commit()
+
+    assert rehash_trades() == 5
+    assert sorted(h for (h,) in db.session.query(Trade.row_hash)) == expected
+    assert bulk_insert_trades(1, parse_robinhood_csv(CSV))["rows_skipped"] == 5
+
+
+def test_upgrade_adds_row_hashes_and_indexes_to_an_old_table(app):
+    # A trades table as created before row hashing: no row_hash column, no composite indexes
+    db.session.execute(text("DROP TABLE trades"))
+    db.session.execute(text(
+        "CREATE TABLE trades (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, activity_date DATETIME, "
+        "process_date DATETIME, settle_date DATETIME, instrument VARCHAR(100), description VARCHAR(255), "
+        "trade_code VARCHAR(20), quantity FLOAT, price FLOAT, amount FLOAT, parsed_action VARCHAR(50), "
+        "option_type VARCHAR(10), strike_price FLOAT, option_expiration VARCHAR(20))"
+    ))
+    db.session.commit()
+    legacy = parse_robinhood_csv(CSV)[[col for col in TRADE_COLUMNS if col != "row_hash"]]
+    legacy.assign(user_id=1).to_sql("trades", db.engine, if_exists="append", index=False)
+
+    assert upgrade_trades_table() == 5
+    indexes = {index["name"]: index for index in inspect(db.engine).get_indexes("trades")}
+    assert indexes["ux_trades_user_row_hash"]["unique"]
+    assert "ix_trades_user_activity" in indexes
+
+    assert bulk_insert_trades(1, parse_robinhood_csv(CSV))["rows_skipped"] == 5
+    # Running it again changes nothing
+    assert upgrade_trades_table() == 5
+    assert db.session.query(Trade).count() == 5
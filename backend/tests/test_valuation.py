@@ -0,0 +1,57 @@
+# backend/tests/test_valuation.py
+import pandas as pd
+import pytest
+
+from modules.preprocessing import LotMatcher
+from modules.trade_ingestion import parse_robinhood_csv
+from modules.valuation import value_open_positions
+
+# Two identical call buys, one quoted and one with only its cash amount, plus shares
+CSV = b"""Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount
+1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 2/16/2024 Call $190.00,BTO,2,$3.10,($620.00)
+1/3/2024,1/3/2024,1/5/2024,AAPL,AAPL 2/16/2024 Call $190.00,BTO,2,,($620.00)
+1/4/2024,1/4/2024,1/8/2024,MSFT,Microsoft,BTO,5,$400.00,"($2,000.00)"
+"""
+
+PRICES = pd.DataFrame({
+    "ticker": ["AAPL", "MSFT"],
+    "date": pd.to_datetime(["2024-01-10", "2024-01-10"]),
+    "close": [195.0, 410.0],
+})
+
+
+@pytest.fixture
+def matcher():
+    matcher = LotMatcher()
+    matcher.match(parse_robinhood_csv(CSV))
+    return matcher
+
+
+def test_option_lot_prices_are_per_share_whatever_their_source(matcher):
+    lots = matcher.open_positions(as_of="2024-01-10").sort_values("LotID")
+    assert list(lots["Price"]) == pytest.approx([3.10, 3.10, 400.0])
+
+
+def test_option_values_are_in_dollars(matcher):
+    valuation = value_open_positions(matcher.open_positions(as_of="2024-01-10"), PRICES, as_of="2024-01-10")
+    quoted, derived, shares = valuation["positions"]
+
+    # 2 contracts x 100 shares, $190 strike on a $195 close
+    for call in (quoted, derived):
+        assert call["Mark"] == pytest.approx(5.0)
+        assert call["CostBasis"] == pytest.approx(620.0)
+        assert call["MarketValue"] == pytest.approx(1000.0)
+    assert shares["MarketValue"] == pytest.approx(2050.0)
+
+    portfolio = valuation["portfolio"]
+    assert portfolio["cost_basis"] == pytest.approx(620.0 * 2 + 2000.0)
+    assert portfolio["market_value"] == pytest.approx(1000.0 * 2 + 2050.0)
+    assert valuation["equity_curve"][-1]["market_value"] == pytest.approx(portfolio["market_value"])
+
+
+def test_realized_option_pnl_is_in_dollars(matcher):
+    closes = parse_robinhood_csv(b"""Activity Date,Process Date,Settle Date,Instrument,Description,Trans Code,Quantity,Price,Amount
+1/10/2024,1/10/2024,1/12/2024,AAPL,AAPL 2/16/2024 Call $190.00,STC,4,$4.00,"$1,600.00"
+""")
+    round_trips = matcher.match(closes)
+    assert list(round_trips["Profit"]) == pytest.approx([180.0, 180.0])
@@ -0,0 +1,66 @@
+# backend/tests/test_vector_store.py
+import numpy as np
+import pytest
+
+from modules.vector_store import EMBEDDING_DIM, VectorStore
+
+TICKERS = ["AAPL", "MSFT", "TSLA", "NVDA"]
+
+
+def corpus(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # TSLA is rare, so an HNSW search filtered to it can come back short of top_k
+    tickers = rng.choice(TICKERS, n, p=[0.4, 0.4, 0.02, 0.18])
+    metadatas = [{"Ticker": t, "Link": f"https://news.example/{i}"} for i, t in enumerate(tickers)]
+    return vectors, metadatas
+
+
+def exact_links(vectors, metadatas, query, ticker, top_k):
+    rows = [i for i, m in enumerate(metadatas) if ticker is None or m["Ticker"] == ticker]
+    order = np.argsort(((vectors[rows] - query) ** 2).sum(axis=1), kind="stable")[:top_k]
+    return [metadatas[rows[i]]["Link"] for i in order]
+
+
+@pytest.fixture
+def flat_store():
+    vectors, metadatas = corpus()
+    store = VectorStore("flat")
+    store.add_documents(vectors, metadatas)
+    return store, vectors, metadatas
+
+
+def test_query_tickers_match_exact_per_ticker_search(flat_store):
+    store, vectors, metadatas = flat_store
+    queries = np.random.default_rng(1).standard_normal((8, EMBEDDING_DIM)).astype(np.float32)
+    query_tickers = TICKERS * 2
+
+    results = store.search_batch(queries, top_k=5, query_tickers=query_tickers)
+    for query, ticker, hits in zip(queries, query_tickers, results):
+        assert [doc["Link"] for doc in hits] == exact_links(vectors, metadatas, query, ticker, 5)
+        assert {doc["Ticker"] for doc in hits} == {ticker}
+
+
+def test_missing_and_unknown_query_tickers(flat_store):
+    store, vectors, metadatas = flat_store
+    queries = vectors[:3]
+
+    results = store.search_batch(queries, top_k=4, query_tickers=["AAPL", None, "GOOG"])
+    assert [doc["Link"] for doc in results[1]] == exact_links(vectors, metadatas, queries[1], None, 4)
+    assert results[2] == []
+    assert results == store.search_batch(queries, top_k=4, query_tickers=np.array(["AAPL", np.nan, "GOOG"], object))
+    with pytest.raises(ValueError):
+        store.search_batch(queries, top_k=4, query_tickers=["AAPL"])
+
+
+def test_hnsw_results_never_include_padding(flat_store):
+    _, vectors, metadatas = flat_store
+    store = VectorStore("hnsw")
+    store.add_documents(vectors, metadatas)
+    n_tsla = sum(m["Ticker"] == "TSLA" for m in metadatas)
+
+    results = store.search_batch(vectors[:2], top_k=50, query_tickers=["TSLA", "TSLA"])
+    for hits in results:
+        assert 0 < len(hits) <= n_tsla
+        assert {doc["Ticker"] for doc in hits} == {"TSLA"}
@@ -0,0 +1,126 @@
+# backend/tools/llm_stub_server.py
+"""
+Local stand-in for the Ollama HTTP API: POST /api/generate streams a canned
+recommendation as NDJSON chunks (or returns it whole with "stream": false),
+so the recommendation client and /analyze?stream=1 can run without a model.
+
+    cd backend && python -m tools.llm_stub_server --port 11434 --token-delay 0.05
+    OLLAMA_URL=http://127.0.0.1:11434 python app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_ADVICE = (
+    "Your round-trips cluster into short holds with small losses and a few long holds with larger gains. "
+    "Consider sizing down on same-day option trades and letting winners run closer to your longer holds."
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # Pooled clients drop idle keep-alive connections
+            pass
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "llama3.2"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak_active = max(server.peak_active, server.active)
+        try:
+            tokens = [word + " " for word in CANNED_ADVICE.split()]
+            if not body.get("stream", True):
+                time.sleep(server.token_delay * len(tokens))
+                self._send_json(200, {"model": body.get("model"), "response": "".join(tokens), "done": True})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if server.error_after is not None and i == server.error_after:
+                    # How Ollama reports a failure mid-generation
+                    self._write_chunk({"error": "model runner stopped"})
+                    break
+                time.sleep(server.token_delay)
+                self._write_chunk({"model": body.get("model"), "response": token, "done": False})
+            else:
+                self._write_chunk({"model": body.get("model"), "response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _write_chunk(self, obj):
+        payload = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, obj):
+        payload = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0, token_delay: float = 0.0, error_after: int = None):
+    """
+    Start the stand-in on a daemon thread; returns (server, base_url). Port 0
+    picks a free port. With `error_after`, streams end with an error chunk
+    after that many tokens.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.token_delay = token_delay
+    server.error_after = error_after
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.active = 0
+    server.peak_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.token_delay)
+    print(f"Stub model server at {base_url}/api/generate")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
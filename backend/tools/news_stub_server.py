@@ -0,0 +1,125 @@
+# backend/tools/news_stub_server.py
+"""
+Local stand-in for news sites: serves canned article pages so the news
+pipeline can be exercised and benchmarked without network access.
+
+    cd backend && python -m tools.news_stub_server --port 8765 --latency 0.1
+
+Routes:
+    /article/<ticker>/<n>   an article page with a few <p> paragraphs
+    /flaky/<ticker>/<n>     503 for the first --fail-first requests per path, then the article
+    /missing/<ticker>/<n>   404
+Every response is delayed by --latency seconds.
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPHS = 8
+
+
+def article_html(ticker: str, n: str) -> str:
+    paragraphs = "".join(
+        f"<p>{ticker} article {n}, paragraph {i}: shares moved as analysts updated their outlook.</p>"
+        for i in range(PARAGRAPHS)
+    )
+    return (
+        f"<html><head><title>{ticker} news {n}</title></head><body>"
+        f"<div class='nav'><a href='/'>Home</a></div><article>{paragraphs}</article>"
+        "<footer>Copyright</footer></body></html>"
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.attempts[self.path] += 1
+            attempt = server.attempts[self.path]
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self._respond(attempt)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _respond(self, attempt: int):
+        time.sleep(self.server.latency)
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] not in ("article", "flaky"):
+            self._send(404, "<html><body>Not found</body></html>")
+            return
+        kind, ticker, n = parts
+        if kind == "flaky" and attempt <= self.server.fail_first:
+            self._send(503, "<html><body>Try again</body></html>")
+            return
+        self._send(200, article_html(ticker, n))
+
+    def _send(self, status: int, body: str):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        try:
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. its timeout fired first)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0, latency: float = 0.0, fail_first: int = 1):
+    """Start the stand-in on a daemon thread; returns (server, base_url). Port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_first = fail_first
+    # Requests per path, and the most requests handled at once (for per-host limit checks)
+    server.attempts = Counter()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stub_search(base_urls, route: str = "article"):
+    """
+    A `search(ticker, news_count)` for market_data.iter_news_articles that links
+    to the stand-in; several base URLs (one server per port) act as separate hosts.
+    """
+    if isinstance(base_urls, str):
+        base_urls = [base_urls]
+
+    def search(ticker, news_count=20):
+        return [
+            {"title": f"{ticker} headline {i}", "link": f"{base_urls[i % len(base_urls)]}/{route}/{ticker}/{i}"}
+            for i in range(news_count)
+        ]
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=1)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.fail_first)
+    print(f"Serving canned articles at {base_url}/article/<ticker>/<n>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# backend/trade_queries.py
+import pandas as pd
+from sqlalchemy import select
+from database import db
+from models import Trade
+
+# Frame column -> trades table column, as consumed by LotMatcher and /analyze
+TRADE_FRAME_COLUMNS = {
+    "id": Trade.id,
+    "activity_date": Trade.activity_date,
+    "parsed_action": Trade.parsed_action,
+    "price": Trade.price,
+    "quantity": Trade.quantity,
+    "amount": Trade.amount,
+    "ticker": Trade.instrument,
+    "option_type": Trade.option_type,
+    "strike_price": Trade.strike_price,
+    "option_expiration": Trade.option_expiration,
+}
+
+
+def load_trade_frame(user_id: int, columns=None, after_id: int = None, start=None, end=None,
+                     options_only: bool = False) -> pd.DataFrame:
+    """
+    Load a user's trades straight into a DataFrame with one column-restricted
+    query (no ORM object per row), ordered by activity date so the
+    (user_id, activity_date) index serves it as a range scan. `options_only`
+    keeps trades with an option type.
+    """
+    names = list(columns) if columns is not None else list(TRADE_FRAME_COLUMNS)
+    stmt = select(*(TRADE_FRAME_COLUMNS[name].label(name) for name in names)).where(Trade.user_id == user_id)
+    if after_id is not None:
+        stmt = stmt.where(Trade.id > after_id)
+    if start is not None:
+        stmt = stmt.where(Trade.activity_date >= start)
+    if end is not None:
+        stmt = stmt.where(Trade.activity_date <= end)
+    if options_only:
+        stmt = stmt.where(Trade.option_type.is_not(None))
+    stmt = stmt.order_by(Trade.activity_date, Trade.id)
+
+    result = db.session.execute(stmt)
+    frame = pd.DataFrame.from_records(result.fetchall(), columns=names, coerce_float=True)
+    if "activity_date" in frame.columns:
+        frame["activity_date"] = pd.to_datetime(frame["activity_date"])
+    return frame
+
+
+def user_has_trades(user_id: int) -> bool:
+    return db.session.execute(select(Trade.id).where(Trade.user_id == user_id).limit(1)).first() is not None
+
+
+def list_user_tickers(user_id: int) -> list:
+    stmt = select(Trade.instrument).where(Trade.user_id == user_id, Trade.instrument.is_not(None)).distinct()
+    return sorted(db.session.execute(stmt).scalars())
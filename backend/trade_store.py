@@ -0,0 +1,272 @@
+# backend/trade_store.py
+import os
+import time
+from collections import Counter
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db
+from models import Trade, UploadJob
+from config import INGEST_CHUNK_SIZE
+from metrics_cache import invalidate_trade_metrics
+from modules.trade_ingestion import iter_robinhood_csv
+
+# Columns of the parsed CSV frame that are persisted on the trades table
+TRADE_COLUMNS = [
+    "activity_date",
+    "process_date",
+    "settle_date",
+    "instrument",
+    "description",
+    "trade_code",
+    "quantity",
+    "price",
+    "amount",
+    "parsed_action",
+    "option_type",
+    "strike_price",
+    "option_expiration",
+    "row_hash",
+]
+DATE_COLUMNS = ("activity_date", "process_date", "settle_date")
+
+# Fields identifying a trade row across re-uploads of the same history (user_id is
+# part of the unique index, so it is not hashed)
+NATURAL_KEY_COLUMNS = ["activity_date", "instrument", "trade_code", "quantity", "amount", "description"]
+NUMERIC_KEY_COLUMNS = ("quantity", "amount")
+# Two independently keyed 64-bit row hashes, stored as 32 hex characters
+ROW_HASH_KEYS = ("trade-row-hash-a", "trade-row-hash-b")
+
+
+def _canonical_key_frame(parsed_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The natural key in a dtype-independent form: dates as int64 nanoseconds,
+    numbers as float64 (so a chunk parsed as int64 hashes like one parsed as
+    float64, and -0.0 like 0.0), text as str. Missing values of any kind
+    become one sentinel (a zero value plus a null flag).
+    """
+    columns = {}
+    for col in NATURAL_KEY_COLUMNS:
+        values = parsed_df[col] if col in parsed_df.columns else pd.Series(None, index=parsed_df.index, dtype=object)
+        if col in DATE_COLUMNS:
+            values = pd.to_datetime(values, errors="coerce").astype("datetime64[ns]")
+            missing = values.isna()
+            values = values.to_numpy().view("i8").copy()
+            values[missing.to_numpy()] = 0
+        elif col in NUMERIC_KEY_COLUMNS:
+            values = pd.to_numeric(values, errors="coerce").astype("float64")
+            missing = values.isna()
+            values = values.fillna(0.0).to_numpy() + 0.0
+        else:
+            missing = values.isna()
+            values = values.where(~missing, "").astype(str).to_numpy(dtype=object)
+        columns[col] = values
+        columns[f"{col}_missing"] = missing.to_numpy()
+    return pd.DataFrame(columns, index=parsed_df.index)
+
+
+def _hash_pairs(frame: pd.DataFrame) -> np.ndarray:
+    return np.column_stack([
+        hash_pandas_object(frame, index=False, hash_key=key).to_numpy() for key in ROW_HASH_KEYS
+    ])
+
+
+def trade_row_hashes(parsed_df: pd.DataFrame, seen: Counter = None) -> pd.Series:
+    """
+    Content hash of each row's natural key, computed from canonical values
+    (see _canonical_key_frame) so it does not depend on how a file was
+    chunked or which dtypes pandas inferred. Identical rows within an upload
+    (e.g. two fills at the same price) are told apart by their occurrence
+    number, so a re-upload maps every row onto the same hash again. Pass the
+    same `seen` counter for successive chunks of one file to keep occurrence
+    numbers global.
+    """
+    if parsed_df.empty:
+        return pd.Series([], index=parsed_df.index, dtype=object)
+    key = _canonical_key_frame(parsed_df)
+    base = _hash_pairs(key)
+    # The first 64 bits identify a key well enough for counting repeats
+    base_id = pd.Series(base[:, 0], index=parsed_df.index)
+    occurrence = base_id.groupby(base_id, sort=False).cumcount()
+    if seen is not None:
+        occurrence += base_id.map(seen).fillna(0).astype(int)
+        seen.update(base_id.to_numpy().tolist())
+
+    pairs = _hash_pairs(key.assign(occurrence=occurrence.to_numpy(dtype="int64")))
+    # Big-endian bytes -> one hex string -> fixed-width slices, without formatting row by row
+    hex_digits = pairs.astype(">u8").tobytes().hex().encode("ascii")
+    digests = np.frombuffer(hex_digits, dtype="S32").astype(str).astype(object)
+    return pd.Series(digests, index=parsed_df.index)
+
+
+def _existing_hashes(user_id: int, hashes: list) -> set:
+    rows = db.session.execute(
+        select(Trade.row_hash).where(Trade.user_id == user_id, Trade.row_hash.in_(hashes))
+    )
+    return {row[0] for row in rows}
+
+
+def _insert_ignoring_duplicates():
+    # Rows racing in from a concurrent upload of the same file are skipped by the unique index
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(Trade.__table__).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(Trade.__table__).on_conflict_do_nothing()
+    return Trade.__table__.insert()
+
+
+def _frame_to_columns(df: pd.DataFrame) -> dict:
+    """
+    Convert the parsed frame into plain Python column lists (NaN/NaT -> None)
+    so the DB driver receives native types without per-row pandas access.
+    """
+    columns = {}
+    for col in TRADE_COLUMNS:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if col in DATE_COLUMNS:
+            series = pd.to_datetime(series, errors="coerce")
+        values = series.astype(object).to_numpy()
+        mask = pd.isna(series).to_numpy()
+        values[mask] = None
+        columns[col] = values.tolist()
+    return columns
+
+
+def bulk_insert_trades(user_id: int, parsed_df: pd.DataFrame, chunk_size: int = INGEST_CHUNK_SIZE,
+                       seen: Counter = None) -> dict:
+    """
+    Write the parsed trades in fixed-size executemany batches instead of one
+    ORM object per row, skipping rows whose content hash the user already has.
+    Returns the number of rows written and skipped and the elapsed time.
+    """
+    start = time.perf_counter()
+    hashes = trade_row_hashes(parsed_df, seen)
+    columns = _frame_to_columns(parsed_df.assign(row_hash=hashes))
+    names = list(columns.keys())
+    n_rows = len(parsed_df)
+    insert_stmt = _insert_ignoring_duplicates().returning(Trade.id, Trade.activity_date)
+    written = 0
+    first_id = None
+    earliest_written = None
+
+    for offset in range(0, n_rows, chunk_size):
+        existing = _existing_hashes(user_id, columns["row_hash"][offset:offset + chunk_size])
+        batch = zip(*(columns[name][offset:offset + chunk_size] for name in names))
+        records = [
+            record for record in (dict(zip(names, row), user_id=user_id) for row in batch)
+            if record["row_hash"] not in existing
+        ]
+        if records:
+            # Only rows actually inserted come back (not ones lost to a concurrent upload)
+            inserted = db.session.execute(insert_stmt, records).all()
+            written += len(inserted)
+            ids = [row.id for row in inserted]
+            dates = [row.activity_date for row in inserted if row.activity_date is not None]
+            if ids and (first_id is None or min(ids) < first_id):
+                first_id = min(ids)
+            if dates and (earliest_written is None or min(dates) < earliest_written):
+                earliest_written = min(dates)
+    db.session.commit()
+
+    # Checked after commit, once the rows are visible to other sessions, so a
+    # metrics update that already passed these ids is caught by the id check
+    if written:
+        invalidate_trade_metrics(user_id, earliest_written, first_id)
+        db.session.commit()
+
+    return {
+        "rows_written": written,
+        "rows_skipped": n_rows - written,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def rehash_trades(user_id: int = None) -> int:
+    """
+    Recompute row_hash for stored trades (all users, or one), e.g. after a
+    change to the hashing scheme, so re-uploads keep matching existing rows.
+    Rows are numbered in id order, as a re-upload of the whole history would.
+    Returns the number of rows updated.
+    """
+    stmt = select(Trade.user_id, Trade.id, *(getattr(Trade, col) for col in NATURAL_KEY_COLUMNS))
+    if user_id is not None:
+        stmt = stmt.where(Trade.user_id == user_id)
+    rows = db.session.execute(stmt.order_by(Trade.user_id, Trade.id)).fetchall()
+    frame = pd.DataFrame.from_records(rows, columns=["user_id", "id"] + NATURAL_KEY_COLUMNS, coerce_float=True)
+    updated = 0
+    for _, trades in frame.groupby("user_id", sort=False):
+        hashes = trade_row_hashes(trades)
+        db.session.execute(update(Trade), [
+            {"id": trade_id, "row_hash": row_hash}
+            for trade_id, row_hash in zip(trades["id"].tolist(), hashes.tolist())
+        ])
+        updated += len(trades)
+    db.session.commit()
+    return updated
+
+
+def upgrade_trades_table() -> int:
+    """
+    Bring a trades table created before row hashing up to the current schema,
+    which db.create_all() never does for an existing table: add row_hash (or
+    resize it to the 32-character digests on Postgres), recompute every
+    stored hash, then create the missing indexes, including the
+    (user_id, row_hash) unique index that re-upload deduplication relies on.
+    Safe to run more than once. Returns the number of rows rehashed.
+    """
+    engine = db.engine
+    columns = {column["name"]: column for column in inspect(engine).get_columns(Trade.__tablename__)}
+    length = Trade.__table__.c.row_hash.type.length
+    if "row_hash" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {Trade.__tablename__} ADD COLUMN row_hash VARCHAR({length})"))
+
+    # Hash before resizing, so no stored digest is longer than the new column
+    rehashed = rehash_trades()
+
+    current = getattr(columns["row_hash"]["type"], "length", None) if "row_hash" in columns else length
+    if engine.dialect.name == "postgresql" and current != length:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {Trade.__tablename__} ALTER COLUMN row_hash TYPE VARCHAR({length})"))
+    for index in Trade.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    return rehashed
+
+
+def stream_trades_from_file(job_id: str, path: str, chunk_size: int = INGEST_CHUNK_SIZE) -> None:
+    """
+    Parse and persist a spooled upload one chunk at a time, committing each
+    chunk and recording progress on the UploadJob row so clients can poll it.
+    Peak memory is bounded by `chunk_size`, not by the file size.
+    Must run inside an application context; the spooled file is removed afterwards.
+    """
+    job = db.session.get(UploadJob, job_id)
+    job.status = "running"
+    job.bytes_total = os.path.getsize(path)
+    db.session.commit()
+
+    seen = Counter()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter_robinhood_csv(f, chunksize=chunk_size):
+                stats = bulk_insert_trades(job.user_id, chunk, chunk_size, seen)
+                job.rows_written += stats["rows_written"]
+                job.rows_skipped += stats["rows_skipped"]
+                job.bytes_read = f.tell()
+                db.session.commit()
+        job.status = "completed"
+        job.bytes_read = job.bytes_total
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        os.remove(path)
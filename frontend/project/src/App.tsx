@@ -50,6 +50,8 @@ function App() {
   const [analysisError, setAnalysisError] = useState<string | null>(null);
   const [showMore, setShowMore] = useState<boolean>(false);
   const [analysisResult, setAnalysisResult] = useState<any>(null);
+  // First page of trade-level rows (served separately from the analysis)
+  const [roundTrips, setRoundTrips] = useState<any>(null);
 
   // New state for fake loading progress
   const [fakeProgress, setFakeProgress] = useState<number>(0);
@@ -172,6 +174,7 @@ function App() {
     setIsAnalyzing(true);
     setAnalysisError(null);
     setAnalysisResult(null);
+    setRoundTrips(null);
     try {
       const resp = await axios.post(
         'http://localhost:8000/analyze',
@@ -180,6 +183,11 @@ function App() {
       );
       console.log('Analyze results:', resp.data);
       setAnalysisResult(resp.data);
+      const tripsResp = await axios.get(
+        'http://localhost:8000/round_trips',
+        { params: { limit: 500, format: 'columns' }, withCredentials: true }
+      );
+      setRoundTrips(tripsResp.data.columns);
     } catch (err: any) {
       console.error(err);
       setAnalysisError(err.response?.data || 'Analyze error');
@@ -197,21 +205,20 @@ function App() {
   // CHART #1: DURATION BY TRADE
   // -------------------------------
   const durationChartData = useMemo(() => {
-    const trades = analysisResult?.trade_patterns?.trade_data;
-    if (!trades) return null;
+    if (!roundTrips) return null;
     return {
-      labels: trades.map((t: any) => `Trade ${t.TradeID}`),
+      labels: roundTrips.TradeID.map((id: number) => `Trade ${id}`),
       datasets: [
         {
           label: 'Duration (days)',
-          data: trades.map((t: any) => t.Duration || 0),
+          data: roundTrips.Duration.map((d: number | null) => d || 0),
           borderColor: 'rgba(75,192,192,1)',
           backgroundColor: 'rgba(75,192,192,0.2)',
           tension: 0.2,
         },
       ],
     };
-  }, [analysisResult]);
+  }, [roundTrips]);
 
   // -------------------------------
   // CHART #2: PROFIT DISTRIBUTION BY TICKER 